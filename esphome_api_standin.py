@@ -0,0 +1,153 @@
+# ESPHome Studio native API stand-in.
+# Speaks just enough of the ESPHome native API (plaintext framing) to answer the GUI's
+# device info query: hello, connect, device info, ping and disconnect. Run it locally and
+# point the GUI (or fetch_device_info_api) at 127.0.0.1 to test without real hardware:
+#
+#     python esphome_api_standin.py --port 6053 --name kitchen --version 2024.6.1 [--password SECRET]
+#
+# --encrypted answers like a device with an API encryption key, so the log-scraping fallback
+# can be exercised too.
+
+import argparse
+import asyncio
+
+# Message types and framing - keep in sync with the client in the GUI
+HELLO_REQUEST, HELLO_RESPONSE = 1, 2
+CONNECT_REQUEST, CONNECT_RESPONSE = 3, 4
+DISCONNECT_REQUEST, DISCONNECT_RESPONSE = 5, 6
+PING_REQUEST, PING_RESPONSE = 7, 8
+DEVICE_INFO_REQUEST, DEVICE_INFO_RESPONSE = 9, 10
+
+def encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def encode_proto(fields):
+    """Protobuf bytes for [(field number, value)] - str length-delimited, int/bool as varints"""
+    out = bytearray()
+    for number, value in fields:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+            out += encode_varint(number << 3 | 2) + encode_varint(len(value)) + value
+        else:
+            out += encode_varint(number << 3) + encode_varint(int(value))
+    return bytes(out)
+
+def frame(msg_type, payload=b""):
+    return b"\x00" + encode_varint(len(payload)) + encode_varint(msg_type) + payload
+
+async def read_varint(reader):
+    result = shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result
+        shift += 7
+
+def password_from(payload):
+    """ConnectRequest.password (field 1) - the only field the request carries"""
+    if not payload or payload[0] != (1 << 3 | 2):
+        return ""
+    length, pos, shift = 0, 1, 0
+    while True:
+        byte = payload[pos]
+        pos += 1
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    return payload[pos:pos + length].decode("utf-8", errors="replace")
+
+class StandinDevice:
+    def __init__(self, name, version, mac, model, compilation_time, password="", encrypted=False):
+        self.name = name
+        self.version = version
+        self.mac = mac
+        self.model = model
+        self.compilation_time = compilation_time
+        self.password = password
+        self.encrypted = encrypted
+
+    def device_info(self):
+        return encode_proto([
+            (1, bool(self.password)),
+            (2, self.name),
+            (3, self.mac),
+            (4, self.version),
+            (5, self.compilation_time),
+            (6, self.model),
+            (12, "Espressif"),
+            (13, self.name.replace("-", " ").title()),
+        ])
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            if self.encrypted:
+                # A noise-encrypted device answers a plaintext hello with an encrypted-frame preamble
+                await reader.read(1)
+                writer.write(b"\x01\x00\x00")
+                await writer.drain()
+                return
+            while True:
+                if (await reader.readexactly(1)) != b"\x00":
+                    return
+                length = await read_varint(reader)
+                msg_type = await read_varint(reader)
+                payload = await reader.readexactly(length) if length else b""
+                if msg_type == HELLO_REQUEST:
+                    writer.write(frame(HELLO_RESPONSE, encode_proto([(1, 1), (2, 10), (3, f"{self.name} (ESPHome v{self.version})"), (4, self.name)])))
+                elif msg_type == CONNECT_REQUEST:
+                    invalid = bool(self.password) and password_from(payload) != self.password
+                    writer.write(frame(CONNECT_RESPONSE, encode_proto([(1, True)]) if invalid else b""))
+                elif msg_type == DEVICE_INFO_REQUEST:
+                    writer.write(frame(DEVICE_INFO_RESPONSE, self.device_info()))
+                elif msg_type == PING_REQUEST:
+                    writer.write(frame(PING_RESPONSE))
+                elif msg_type == DISCONNECT_REQUEST:
+                    writer.write(frame(DISCONNECT_RESPONSE))
+                    await writer.drain()
+                    return
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            print(f"[api-standin] {peer} disconnected")
+            writer.close()
+
+async def serve(device, host="0.0.0.0", port=6053):
+    """Serve the stand-in device until interrupted"""
+    server = await asyncio.start_server(device.handle, host, port)
+    print(f"Serving stand-in ESPHome device '{device.name}' on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer ESPHome native API device info queries like a real device")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=6053)
+    parser.add_argument("--name", default="standin-device")
+    parser.add_argument("--version", default="2024.6.1", help="ESPHome version to report")
+    parser.add_argument("--mac", default="AA:BB:CC:DD:EE:FF")
+    parser.add_argument("--model", default="esp32dev")
+    parser.add_argument("--compilation-time", default="Jun 10 2024, 12:00:00")
+    parser.add_argument("--password", default="", help="Require this API password")
+    parser.add_argument("--encrypted", action="store_true", help="Behave like a device with an encryption key")
+    args = parser.parse_args()
+    device = StandinDevice(args.name, args.version, args.mac, args.model, args.compilation_time,
+                           args.password, args.encrypted)
+    try:
+        asyncio.run(serve(device, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ import subprocess
 from subprocess import Popen, PIPE, TimeoutExpired
 import threading
 from threading import Lock
+import queue
+import asyncio
 import os
 import shutil
 import sys
@@ -21,16 +23,18 @@ import re
 import time
 import webbrowser
 import socket
+import ipaddress
 from packaging import version
 from datetime import datetime, timedelta
 from zeroconf import Zeroconf, ServiceBrowser, ServiceListener
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from datetime import datetime
 
 # NEW IMPORTS for version management
 import venv
 from pathlib import Path
 import glob
+import fnmatch
 import hashlib
 
 # Import ttkbootstrap
@@ -39,19 +43,236 @@ from ttkbootstrap.constants import *
 
 import schedule
 import tempfile
+import tarfile
+import contextlib
+import difflib
+import zlib
 import zipfile
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+
+# Shared with the helper that serves the share, so both sides pick the same files
+from esphome_sync_helper import SYNC_PATTERNS, is_sync_excluded, scan_sync_tree
+
+# NEW - Device discovery
+ESPHOME_SERVICE_TYPES = ("_esphomelib._tcp.local.", "_esphome._tcp.local.")
+
+DEVICE_REGISTRY_MAX_AGE_DAYS = 30  # Persisted devices not seen for this long are dropped at load
+
+class DeviceRegistry:
+    """Thread-safe map of device name -> addresses, TXT metadata and last-seen time
+
+    Fed by mDNS (and other probes) from background threads; the GUI reads it instantly.
+    A removed service stays listed as offline with its last known address. With a cache
+    file the registry survives restarts: loaded records are flagged stale until a probe
+    sees the device again this session. The cache is read on first use, so the
+    module-level instance costs nothing at import time.
+    """
+    def __init__(self, cache_file=None):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.records = {}
+        self.lock = Lock()
+        self.load_lock = Lock()
+        self.loaded = False
+        self.listeners = []
+        self.dirty = False
+
+    def _ensure_loaded(self):
+        if self.loaded:
+            return
+        with self.load_lock:
+            if not self.loaded:
+                self.load_cache()
+                self.loaded = True
+
+    def add_listener(self, callback):
+        """callback() runs (on the reporting thread) after every change"""
+        self.listeners.append(callback)
+
+    def _notify(self):
+        for callback in list(self.listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Device registry listener failed: {e}")
+
+    def update(self, name, addresses, txt=None, port=None, source="mdns"):
+        """Add or refresh a device seen just now"""
+        self._ensure_loaded()
+        with self.lock:
+            record = self.records.setdefault(name, {'name': name, 'addresses': [], 'txt': {}, 'port': None,
+                                                    'sources': []})
+            if addresses:
+                record['addresses'] = list(addresses)
+            if txt:
+                record['txt'].update(txt)
+            if port:
+                record['port'] = port
+            if source not in record['sources']:
+                record['sources'].append(source)
+            record['last_seen'] = time.time()
+            record['online'] = True
+            record['stale'] = False
+            self.dirty = True
+        self._notify()
+
+    def remove(self, name):
+        """Mark a device offline (its service went away); its last address stays known"""
+        self._ensure_loaded()
+        with self.lock:
+            record = self.records.get(name)
+            if not record or not record.get('online'):
+                return
+            record['online'] = False
+        self._notify()
+
+    def get(self, name):
+        self._ensure_loaded()
+        with self.lock:
+            record = self.records.get(name)
+            return dict(record) if record else None
+
+    def lookup(self, name):
+        """First known address of a device, or None"""
+        record = self.get(name)
+        return record['addresses'][0] if record and record['addresses'] else None
+
+    def snapshot(self):
+        """Copies of every record, sorted by name"""
+        self._ensure_loaded()
+        with self.lock:
+            return [dict(record, addresses=list(record['addresses']), txt=dict(record['txt']))
+                    for _, record in sorted(self.records.items())]
+
+    def devices(self, online_only=False):
+        """[(name, ip)] sorted by name - the shape discover_esphome_devices has always returned"""
+        return [(record['name'], record['addresses'][0]) for record in self.snapshot()
+                if record['addresses'] and (record.get('online') or not online_only)]
+
+    def ranked_devices(self):
+        """devices(), with the ones seen this session first and remembered (possibly moved) ones last"""
+        online = self.devices(online_only=True)
+        return online + [device for device in self.devices() if device not in online]
+
+    def name_for_address(self, address):
+        """Name of the device currently known at address, or None"""
+        self._ensure_loaded()
+        with self.lock:
+            for name, record in self.records.items():
+                if address in record['addresses']:
+                    return name
+        return None
+
+    def stale_count(self):
+        """Devices known from a previous session that nothing has confirmed yet"""
+        self._ensure_loaded()
+        with self.lock:
+            return sum(1 for record in self.records.values() if record.get('stale'))
+
+    def load_cache(self):
+        """Load devices seen in earlier sessions, flagged stale and offline until seen again"""
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            cutoff = time.time() - DEVICE_REGISTRY_MAX_AGE_DAYS * 86400
+            with self.lock:
+                for name, record in data.items():
+                    if record.get('last_seen', 0) < cutoff or not record.get('addresses') or name in self.records:
+                        continue
+                    self.records[name] = {'name': name, 'addresses': list(record['addresses']),
+                                          'txt': dict(record.get('txt') or {}), 'port': record.get('port'),
+                                          'sources': list(record.get('sources') or []),
+                                          'last_seen': record['last_seen'], 'online': False, 'stale': True}
+        except Exception as e:
+            print(f"Error loading device registry: {e}")
+
+    def save_cache(self):
+        """Persist name, addresses, TXT records and last-seen time for the next startup"""
+        if not self.cache_file:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {name: {key: record.get(key) for key in ('addresses', 'txt', 'port', 'sources', 'last_seen')}
+                    for name, record in self.records.items()}
+            self.dirty = False
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"Error saving device registry: {e}")
 
 class ESPHomeListener(ServiceListener):
-    def __init__(self):
-        self.devices = []  # List of (name, ip) tuples
+    """Zeroconf callbacks feeding a DeviceRegistry"""
+    def __init__(self, registry):
+        self.registry = registry
 
     def add_service(self, zeroconf, type, name):
-        info = zeroconf.get_service_info(type, name)
-        if info and info.addresses:
-            ip = ".".join(str(b) for b in info.addresses[0])
-            device_name = name.split('.')[0]  # Extract name from full mDNS name
-            self.devices.append((device_name, ip))
+        info = zeroconf.get_service_info(type, name, timeout=3000)
+        if not info:
+            return
+        addresses = info.parsed_addresses()
+        # Prefer IPv4 - OTA and the tools expect it
+        addresses = [a for a in addresses if '.' in a] + [a for a in addresses if '.' not in a]
+        txt = {}
+        for key, value in (info.properties or {}).items():
+            key = key.decode('utf-8', errors='replace') if isinstance(key, bytes) else str(key)
+            txt[key] = value.decode('utf-8', errors='replace') if isinstance(value, bytes) else value
+        device_name = name.split('.')[0]  # Extract name from full mDNS name
+        self.registry.update(device_name, addresses, txt, info.port)
+
+    def update_service(self, zeroconf, type, name):
+        self.add_service(zeroconf, type, name)
+
+    def remove_service(self, zeroconf, type, name):
+        self.registry.remove(name.split('.')[0])
+
+class DeviceDiscoveryService:
+    """One long-lived Zeroconf browser keeping a DeviceRegistry current in the background"""
+    def __init__(self, registry):
+        self.registry = registry
+        self.zeroconf = None
+        self.browsers = []
+        self.started_at = None
+        self.lock = Lock()
+
+    def start(self):
+        with self.lock:
+            if self.zeroconf:
+                return
+            try:
+                self.zeroconf = Zeroconf()
+                listener = ESPHomeListener(self.registry)
+                self.browsers = [ServiceBrowser(self.zeroconf, service_type, listener)
+                                 for service_type in ESPHOME_SERVICE_TYPES]
+                self.started_at = time.time()
+            except Exception as e:
+                print(f"mDNS discovery could not start: {e}")
+                self.zeroconf = None
+
+    def stop(self):
+        with self.lock:
+            if not self.zeroconf:
+                return
+            for browser in self.browsers:
+                try:
+                    browser.cancel()
+                except Exception:
+                    pass
+            try:
+                self.zeroconf.close()
+            except Exception as e:
+                print(f"Error closing mDNS discovery: {e}")
+            self.zeroconf = None
+            self.browsers = []
+
+device_registry = DeviceRegistry(Path.home() / ".esphome_studio" / "device_registry.json")
+discovery_service = DeviceDiscoveryService(device_registry)
 
 class ESPHomeDataManager:
     def __init__(self):
@@ -85,21 +306,33 @@ class ESPHomeDataManager:
         return {}
     
     def save_device_info(self, yaml_path, device_info):
-        """Save device information for a YAML file"""
+        """Save device information for a YAML file - returns the stored (merged) info, None on failure"""
+        return self.save_device_info_batch({yaml_path: device_info}).get(yaml_path)
+    
+    def save_device_info_batch(self, results):
+        """Save {yaml_path: device_info} with one read and one write of the store
+
+        Each field gets its own timestamp; fields a collection could not read keep their
+        stored value and age (see merge_device_info). Returns {yaml_path: stored info}.
+        """
+        if not results:
+            return {}
         try:
             data = self.load_devices_data()
-            key = self.get_yaml_key(yaml_path)
-            data[key] = {
-                'device_info': device_info,
-                'last_updated': datetime.now().isoformat(),
-                'yaml_file': os.path.basename(yaml_path)
-            }
+            now = datetime.now()
+            stored = {}
+            for yaml_path, device_info in results.items():
+                key = self.get_yaml_key(yaml_path)
+                entry = merge_device_info(data.get(key), device_info, now)
+                entry['yaml_file'] = os.path.basename(yaml_path)
+                data[key] = entry
+                stored[yaml_path] = entry['device_info']
             with open(self.devices_file, 'w') as f:
                 json.dump(data, f, indent=2)
-            return True
+            return stored
         except Exception as e:
             print(f"Error saving device info: {e}")
-            return False
+            return {}
     
     def save_upload_history(self, yaml_path, upload_history):
         """Save upload history for a YAML file"""
@@ -124,6 +357,11 @@ class ESPHomeDataManager:
         key = self.get_yaml_key(yaml_path)
         return data.get(key, {}).get('device_info', None)
     
+    def get_device_entry(self, yaml_path):
+        """Stored entry for a YAML file: device_info plus last_updated and per-field field_updated"""
+        data = self.load_devices_data()
+        return data.get(self.get_yaml_key(yaml_path))
+    
     def get_upload_history(self, yaml_path):
         """Get stored upload history for a YAML file"""
         data = self.load_history_data()
@@ -348,16 +586,7 @@ class DelayedUploadManager:
             firmware_path = None
             if success:
                 # Find the compiled firmware
-                project_name = os.path.splitext(os.path.basename(yaml_path))[0]
-                firmware_path = os.path.join(
-                    os.path.dirname(yaml_path),
-                    ".esphome",
-                    "build",
-                    project_name,
-                    ".pioenvs",
-                    project_name,
-                    "firmware.bin"
-                )
+                firmware_path = storage_reader.firmware_paths(yaml_path)['firmware_bin']
                 
                 if os.path.exists(firmware_path):
                     # Copy firmware to cache
@@ -740,12 +969,14 @@ class UploadScheduler:
             else:
                 esphome_cmd = 'esphome'
             
+            target = upload["target_device"]
             if upload['upload_mode'] == 'OTA':
-                # OTA upload
-                command = f'{esphome_cmd} upload --device {upload["target_device"]} "{upload["yaml_path"]}"'
+                # OTA upload - pass a known IP so esphome doesn't resolve the name again
+                target = host_resolver.resolve(target)
+                command = f'{esphome_cmd} upload --device {target} "{upload["yaml_path"]}"'
             else:
                 # COM upload
-                command = f'{esphome_cmd} upload --device {upload["target_device"]} "{upload["yaml_path"]}"'
+                command = f'{esphome_cmd} upload --device {target} "{upload["yaml_path"]}"'
             
             # Use the stored firmware if available
             firmware_path = upload.get('compiled_firmware_path')
@@ -762,47 +993,776 @@ class UploadScheduler:
                 timeout=300  # 5 minute timeout
             )
             
+            if upload['upload_mode'] == 'OTA':
+                host_resolver.record_upload(upload_device_name(upload["yaml_path"]), target, result.returncode == 0)
             return result.returncode == 0
             
         except Exception as e:
             print(f"Upload error: {e}")
             return False
 
-###############################
-def discover_esphome_devices():
-    listener = ESPHomeListener()
-    zeroconf = Zeroconf()
+def parse_pattern_list(text):
+    """Split a comma/semicolon separated pattern string into a tuple of glob patterns"""
+    if not text:
+        return ()
+    if isinstance(text, (list, tuple)):
+        return tuple(p.strip() for p in text if p and p.strip())
+    return tuple(p.strip() for p in re.split(r'[;,]', text) if p.strip())
+
+def filter_sync_listing(files, patterns=SYNC_PATTERNS, exclude=()):
+    """Apply include/exclude patterns to a {rel_path: stat} listing (e.g. one from the sync helper)
+
+    Paths that could land outside the local folder (absolute, '..', empty segments) are dropped.
+    """
+    patterns = tuple(p.lower() for p in patterns)
+    exclude = tuple(p.lower() for p in exclude)
+    unsafe = [rel for rel in files if not is_safe_sync_path(rel)]
+    if unsafe:
+        print(f"Ignoring {len(unsafe)} unsafe path(s) in sync listing, e.g. {unsafe[0]!r}")
+    return {
+        rel: stat for rel, stat in files.items()
+        if rel not in unsafe
+        and any(fnmatch.fnmatch(rel.rsplit('/', 1)[-1].lower(), p) for p in patterns)
+        and not any(is_sync_excluded(part, exclude) for part in _rel_prefixes(rel))
+    }
+
+def is_safe_sync_path(rel_path):
+    """True for a relative 'a/b/c.yaml' path that stays inside the folder it is joined to"""
+    if not isinstance(rel_path, str) or not rel_path or '\\' in rel_path or ':' in rel_path:
+        return False
+    if rel_path.startswith('/') or os.path.isabs(rel_path):
+        return False
+    return all(part not in ('', '.', '..') for part in rel_path.split('/'))
+
+def local_sync_target(local_path, rel_path):
+    """Local destination for a synced rel path - ValueError if it would resolve outside local_path"""
+    if not is_safe_sync_path(rel_path):
+        raise ValueError(f"Unsafe sync path: {rel_path!r}")
+    dst = os.path.join(local_path, *rel_path.split('/'))
+    root = os.path.realpath(local_path)
+    if os.path.commonpath([root, os.path.realpath(dst)]) != root:
+        raise ValueError(f"Sync path escapes {local_path}: {rel_path!r}")
+    return dst
+
+def _rel_prefixes(rel_path):
+    """'a/b/c.yaml' -> ['a', 'a/b', 'a/b/c.yaml'] so folder excludes also hide their contents"""
+    parts = rel_path.split('/')
+    return ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+class ChecksumService:
+    """Content digests cached by (path, size, mtime_ns) so unchanged files are never re-read
+
+    The persisted cache is read on first use, not at construction, so creating the
+    module-level instance costs nothing at import time.
+    """
+    def __init__(self, cache_file=None, chunk_size=1024 * 1024, max_workers=8):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.cache = {}  # normalized path -> (size, mtime_ns, digest)
+        self.lock = Lock()
+        self.load_lock = Lock()
+        self.loaded = False
+        self.dirty = False
+
+    def _ensure_loaded(self):
+        if self.loaded:
+            return
+        with self.load_lock:
+            if not self.loaded:
+                self.load_cache()
+                self.loaded = True
+
+    def _cache_key(self, file_path):
+        return os.path.normcase(os.path.abspath(str(file_path)))
+
+    def _hash_file(self, file_path):
+        """BLAKE2b over large unbuffered reads into a reused buffer"""
+        hasher = hashlib.blake2b(digest_size=20)
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        with open(file_path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                hasher.update(view[:n])
+        return hasher.hexdigest()
+
+    def checksum(self, file_path, stat_result=None):
+        """Return the digest of a file, hashing only if size or mtime changed since last time"""
+        try:
+            st = stat_result if stat_result is not None else os.stat(file_path)
+        except OSError:
+            return None
+
+        self._ensure_loaded()
+        key = self._cache_key(file_path)
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+
+        try:
+            digest = self._hash_file(file_path)
+        except OSError:
+            return None
+
+        # A file written within the last couple of seconds could change again without
+        # its mtime moving (coarse timestamps on FAT/SMB), so don't trust it yet
+        if time.time_ns() - st.st_mtime_ns > 2_000_000_000:
+            with self.lock:
+                self.cache[key] = (st.st_size, st.st_mtime_ns, digest)
+                self.dirty = True
+        return digest
+
+    def checksum_many(self, file_paths, max_workers=None):
+        """Hash many files concurrently - returns {path: digest or None}"""
+        file_paths = list(file_paths)
+        if not file_paths:
+            return {}
+        workers = min(max_workers or self.max_workers, len(file_paths))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = pool.map(self.checksum, file_paths)
+            return dict(zip(file_paths, digests))
+
+    def invalidate(self, file_path=None):
+        """Forget one cached digest, or all of them"""
+        self._ensure_loaded()
+        with self.lock:
+            if file_path is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(self._cache_key(file_path), None)
+            self.dirty = True
+
+    def load_cache(self):
+        """Load persisted digests from disk"""
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            with self.lock:
+                self.cache = {k: tuple(v) for k, v in data.items()}
+        except Exception as e:
+            print(f"Error loading checksum cache: {e}")
+
+    def save_cache(self):
+        """Persist digests so the next session starts warm"""
+        if not self.cache_file:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            data = dict(self.cache)
+            self.dirty = False
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"Error saving checksum cache: {e}")
+
+checksum_service = ChecksumService(Path.home() / ".esphome_studio" / "checksum_cache.json")
+
+class ESPHomeStorageReader:
+    """Reads the build record ESPHome writes to .esphome/storage/<config>.yaml.json
+
+    The record holds the device name, address, ESPHome version, platform, framework and
+    firmware/build paths from the last compile. Parsed records are cached by (mtime, size),
+    so asking again costs one stat.
+    """
+    def __init__(self):
+        self.cache = {}  # storage path -> (mtime_ns, size, parsed dict)
+        self.lock = Lock()
+
+    @staticmethod
+    def storage_path(yaml_path):
+        return os.path.join(os.path.dirname(os.path.abspath(yaml_path)), ".esphome", "storage",
+                            f"{os.path.basename(yaml_path)}.json")
+
+    def read(self, yaml_path):
+        """The parsed storage record for a config, or None if it has never been compiled here"""
+        path = self.storage_path(yaml_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.cache.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read ESPHome storage {path}: {e}")
+            return None
+        with self.lock:
+            self.cache[path] = (st.st_mtime_ns, st.st_size, record)
+        return record
+
+    def device_facts(self, yaml_path):
+        """What the build record says about the device, in the device_info shape (missing = 'N/A')"""
+        record = self.read(yaml_path) or {}
+        platform = record.get('target_platform') or record.get('esp_platform') or record.get('core_platform')
+        return {
+            'firmware_version': record.get('esphome_version') or 'N/A',
+            'host_name': record.get('name') or 'N/A',
+            'chip': platform.upper() if platform else 'N/A',
+            'framework': record.get('framework') or 'N/A',
+        }
+
+    def address(self, yaml_path):
+        """OTA address from the last build (e.g. kitchen.local or a static IP), or ''"""
+        return (self.read(yaml_path) or {}).get('address') or ""
+
+    def firmware_paths(self, yaml_path):
+        """{'build_dir', 'firmware_bin', 'firmware_elf'} for a config
+
+        Uses the build record's paths (the build folder is named after the device, which may
+        differ from the file name). Records copied from another machine are re-rooted under
+        the config's own .esphome/build, and without a record the file name is assumed.
+        """
+        record = self.read(yaml_path) or {}
+        base_dir = os.path.dirname(os.path.abspath(yaml_path))
+        project_name = os.path.splitext(os.path.basename(yaml_path))[0]
+        build_name = project_name
+        build_dir = record.get('build_path')
+        if build_dir:
+            build_name = os.path.basename(build_dir.replace('\\', '/').rstrip('/'))
+            if not os.path.isdir(build_dir):
+                build_dir = os.path.join(base_dir, ".esphome", "build", build_name)
+        else:
+            build_dir = os.path.join(base_dir, ".esphome", "build", project_name)
+        
+        firmware_bin = record.get('firmware_bin_path')
+        if not firmware_bin or not os.path.exists(firmware_bin):
+            firmware_bin = os.path.join(build_dir, ".pioenvs", build_name, "firmware.bin")
+        return {
+            'build_dir': build_dir,
+            'firmware_bin': firmware_bin,
+            'firmware_elf': os.path.join(os.path.dirname(firmware_bin), "firmware.elf"),
+        }
+
+storage_reader = ESPHomeStorageReader()
+
+# NEW - Upload target resolution
+HOST_RESOLVER_TTL = 900  # Seconds a learned name -> address mapping is trusted
+
+def is_ip_address(value):
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+def upload_device_name(yaml_path):
+    """The device's network name - from the last build record, else the file name"""
+    name = storage_reader.device_facts(yaml_path)['host_name']
+    return name if name != 'N/A' else os.path.splitext(os.path.basename(yaml_path))[0]
+
+class HostResolverCache:
+    """Resolves OTA upload targets (kitchen, kitchen.local) to IPs so esphome skips its mDNS lookup
+
+    Addresses come from the discovery registry (devices seen this session) and from
+    successful uploads, each trusted for ttl seconds; whichever was learned last wins. A
+    failed upload or reachability check forgets the mapping. Anything unknown is passed
+    through unchanged for esphome to resolve as before.
+    """
+    DROPDOWN_ENTRY = re.compile(r'(.+?) \(([^()]+)\)$')  # "kitchen (192.168.1.5)"
+    HOSTNAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]*(\.local\.?)?$')
+    SERIAL_PORT = re.compile(r'COM\d+$', re.IGNORECASE)
+
+    def __init__(self, registry=None, ttl=HOST_RESOLVER_TTL):
+        self.registry = registry
+        self.ttl = ttl
+        self.entries = {}  # name -> (address, learned_at, expires_at)
+        self.lock = Lock()
+
+    @staticmethod
+    def _key(name):
+        name = name.strip().lower().rstrip('.')
+        return name[:-len('.local')] if name.endswith('.local') else name
+
+    def remember(self, name, address, ttl=None, learned_at=None):
+        if not name or not is_ip_address(address):
+            return
+        learned_at = learned_at or time.time()
+        with self.lock:
+            self.entries[self._key(name)] = (address, learned_at, learned_at + (ttl or self.ttl))
+
+    def forget(self, name):
+        with self.lock:
+            self.entries.pop(self._key(name), None)
+
+    def _registry_address(self, key, now):
+        """(address, last_seen) of an online, recently seen registry record, or (None, 0)"""
+        if self.registry is None:
+            return None, 0
+        record = self.registry.get(key)
+        if (not record or not record.get('online') or not record['addresses']
+                or now - record.get('last_seen', 0) >= self.ttl):
+            return None, 0
+        # IPv4 first - esphome's OTA and a bare IPv6 link-local address don't mix
+        candidates = [a for a in record['addresses'] if is_ip_address(a)]
+        address = next((a for a in candidates if '.' in a), candidates[0] if candidates else None)
+        return address, record.get('last_seen', 0)
+
+    def lookup(self, name):
+        """(address, 'cache' or 'registry') for a device name, or (None, None)"""
+        key = self._key(name)
+        now = time.time()
+        # The registry goes first when it heard from the device after the cached entry was learned
+        registry_address, last_seen = self._registry_address(key, now)
+        with self.lock:
+            address, learned_at, expires_at = self.entries.get(key, (None, 0, 0))
+        if registry_address and (expires_at <= now or last_seen > learned_at):
+            self.remember(key, registry_address, learned_at=last_seen)
+            return registry_address, 'registry'
+        if address and expires_at > now:
+            return address, 'cache'
+        return None, None
+
+    def resolve(self, target):
+        """IP for an upload target where one is known, otherwise the target unchanged"""
+        target = (target or "").strip()
+        entry = self.DROPDOWN_ENTRY.match(target)
+        if entry and is_ip_address(entry.group(2)):
+            # A dropdown pick names its IP explicitly - only a live registry address overrides it
+            # (scheduled uploads may carry an old pick)
+            return self._registry_address(self._key(entry.group(1)), time.time())[0] or entry.group(2)
+        if is_ip_address(target) or self.SERIAL_PORT.match(target) or not self.HOSTNAME.match(target):
+            return target
+        address, _ = self.lookup(target)
+        return address or target
+
+    def record_upload(self, name, address, success):
+        """Learn from an upload: a working IP is remembered, a failure drops the mapping"""
+        if success:
+            self.remember(name, address)
+        else:
+            self.forget(name)
+
+host_resolver = HostResolverCache(device_registry)
+
+class ShareUnavailableError(OSError):
+    """Raised when the network share is (or has just been found to be) unreachable"""
+
+class ShareGuard:
+    """Filesystem access to a network share with per-operation timeouts.
+
+    Calls run on a small worker pool so a dead SMB host can only stall a worker, never
+    the caller. After a failure the share is considered offline and every call fails
+    immediately until an exponential backoff expires and a single probe is retried.
+    """
+    # Windows errors that mean the host/share is gone rather than a missing file
+    NETWORK_WINERRORS = {53, 59, 64, 67, 121, 1231, 1232}
+
+    def __init__(self, root, timeout=5.0, probe_timeout=2.0, copy_timeout=120.0,
+                 base_backoff=5.0, max_backoff=300.0):
+        self.root = root
+        self.timeout = timeout
+        self.probe_timeout = probe_timeout
+        self.copy_timeout = copy_timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="share-io")
+        self.lock = Lock()
+        self.state = 'unknown'  # 'unknown', 'online' or 'offline'
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+
+    def _mark_online(self):
+        with self.lock:
+            self.state = 'online'
+            self.failures = 0
+            self.retry_at = 0.0
+            self.last_error = None
+
+    def _mark_offline(self, reason):
+        with self.lock:
+            self.failures += 1
+            backoff = min(self.base_backoff * (2 ** (self.failures - 1)), self.max_backoff)
+            self.state = 'offline'
+            self.retry_at = time.monotonic() + backoff
+            self.last_error = reason
+        print(f"Share {self.root} unreachable ({reason}), retrying in {backoff:.0f}s")
+
+    def _submit(self, timeout, func, *args):
+        future = self.executor.submit(func, *args)
+        try:
+            result = future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            future.cancel()
+            self._mark_offline(f"{getattr(func, '__name__', 'operation')} timed out after {timeout:.1f}s")
+            raise ShareUnavailableError(f"Share operation timed out: {self.root}")
+        except OSError as e:
+            if getattr(e, 'winerror', None) in self.NETWORK_WINERRORS:
+                self._mark_offline(str(e))
+                raise ShareUnavailableError(str(e)) from e
+            raise
+        self._mark_online()
+        return result
+
+    def is_reachable(self, force=False):
+        """Cached reachability - only probes when unknown or when the backoff has expired"""
+        with self.lock:
+            state = self.state
+            retry_at = self.retry_at
+        if state == 'online' and not force:
+            return True
+        if state == 'offline' and not force and time.monotonic() < retry_at:
+            return False
+        try:
+            if self._submit(self.probe_timeout, os.path.isdir, self.root):
+                return True
+            self._mark_offline("path not found")
+            return False
+        except ShareUnavailableError:
+            return False
+
+    def describe(self):
+        """Human readable state for status bars"""
+        with self.lock:
+            if self.state == 'offline':
+                wait = max(0, self.retry_at - time.monotonic())
+                return f"offline, retry in {wait:.0f}s"
+            return self.state
+
+    def run(self, func, *args, timeout=None):
+        """Run a filesystem call against the share, failing fast while it is offline"""
+        if not self.is_reachable():
+            raise ShareUnavailableError(f"Share offline: {self.root}")
+        return self._submit(timeout or self.timeout, func, *args)
+
+    def exists(self, path):
+        return self.run(os.path.exists, path)
+
+    def isfile(self, path):
+        return self.run(os.path.isfile, path)
+
+    def isdir(self, path):
+        return self.run(os.path.isdir, path)
+
+    def listdir(self, path):
+        return self.run(os.listdir, path)
+
+    def glob(self, pattern):
+        return self.run(glob.glob, pattern)
+
+    def stat(self, path):
+        return self.run(os.stat, path)
+
+    def getmtime(self, path):
+        return self.run(os.path.getmtime, path)
+
+    def copy2(self, src, dst):
+        return self.run(shutil.copy2, src, dst, timeout=self.copy_timeout)
+
+_share_guards = {}
+_share_guards_lock = Lock()
+
+def get_share_guard(root):
+    """Shared ShareGuard per share root so reachability state is remembered across calls"""
+    key = os.path.normcase(os.path.normpath(str(root)))
+    with _share_guards_lock:
+        guard = _share_guards.get(key)
+        if guard is None:
+            guard = ShareGuard(str(root))
+            _share_guards[key] = guard
+        return guard
+
+class SyncManifest:
+    """Cached per-file sync state between the network share and the local mirror.
+
+    Each refresh only stats both trees; files whose size/mtime on both sides match the
+    cached entry reuse their previous status, so only changed files are ever hashed.
+    """
+    STATUSES = ('in_sync', 'stale', 'missing', 'local_modified', 'local_only')
+    LABELS = {
+        'in_sync': "In sync",
+        'stale': "Stale (share is newer)",
+        'missing': "Missing locally",
+        'local_modified': "Locally modified",
+        'local_only': "Local only",
+    }
+
+    def __init__(self, network_path, local_path, manifest_file=None, patterns=None, exclude=None):
+        self.network_path = network_path
+        self.local_path = local_path
+        self.manifest_file = Path(manifest_file) if manifest_file else None
+        self.patterns = tuple(p.lower() for p in (patterns or SYNC_PATTERNS))
+        self.exclude = tuple(p.lower() for p in (exclude or ()))
+        self.entries = {}  # rel_path -> entry dict
+        self.lock = Lock()
+        self.last_refresh = None
+        self.last_refresh_ms = None
+        self.offline = False
+        self.load()
+
+    def _scan(self, root):
+        return scan_sync_tree(root, self.patterns, self.exclude)
+
+    def _classify(self, entry, src_digest, dst_digest):
+        """Decide the status for an entry whose stat changed since the last refresh"""
+        if entry['src'] is None:
+            return 'local_only'
+        if entry['dst'] is None:
+            return 'missing'
+        if src_digest and src_digest == dst_digest:
+            entry['synced_digest'] = src_digest
+            return 'in_sync'
+        baseline = entry.get('synced_digest')
+        if baseline:
+            if src_digest == baseline and dst_digest != baseline:
+                return 'local_modified'
+            return 'stale'
+        # No known common version - fall back to whichever side was touched last
+        return 'local_modified' if entry['dst'][1] > entry['src'][1] else 'stale'
+
+    @staticmethod
+    def _last_known_sources(previous):
+        """Share stats from the previous refresh - used while the share is offline"""
+        return {rel: entry['src'] for rel, entry in previous.items() if entry['src']}
+
+    @staticmethod
+    def _diff(previous, src_files, dst_files):
+        """(entries, rel paths to rehash) - unchanged entries are carried over as they are"""
+        entries = {}
+        to_hash = []
+        for rel in set(src_files) | set(dst_files):
+            src = src_files.get(rel)
+            dst = dst_files.get(rel)
+            old = previous.get(rel)
+            if old and old['src'] == src and old['dst'] == dst:
+                entries[rel] = old
+                continue
+            entry = {
+                'src': src,
+                'dst': dst,
+                'synced_digest': old.get('synced_digest') if old else None,
+                'status': None,
+            }
+            entries[rel] = entry
+            to_hash.append(rel)
+        return entries, to_hash
+
+    def refresh(self):
+        """Re-stat both trees and reclassify only the files that changed - returns summary dict"""
+        start = time.perf_counter()
+        with self.lock:
+            previous = self.entries
+
+        share = get_share_guard(self.network_path)
+        self.offline = not share.is_reachable()
+        if self.offline:
+            # Keep the last known share state rather than reporting everything as local only
+            src_files = self._last_known_sources(previous)
+        else:
+            try:
+                src_files = share.run(self._scan, self.network_path, timeout=60)
+            except ShareUnavailableError:
+                self.offline = True
+                src_files = self._last_known_sources(previous)
+        dst_files = self._scan(self.local_path)
+        entries, to_hash = self._diff(previous, src_files, dst_files)
+
+        # Hash changed files on both sides in concurrent batches (the checksum cache makes
+        # files that only changed on one side cheap on the other). Share reads go through
+        # the guard; if the share drops mid-batch the refresh finishes offline instead.
+        both = [rel for rel in to_hash if entries[rel]['src'] and entries[rel]['dst']]
+        digests = {}
+        if both and not self.offline:
+            try:
+                digests = share.run(checksum_service.checksum_many,
+                                    [os.path.join(self.network_path, rel) for rel in both],
+                                    timeout=share.copy_timeout)
+            except ShareUnavailableError:
+                self.offline = True
+                entries, to_hash = self._diff(previous, self._last_known_sources(previous), dst_files)
+                both = [rel for rel in to_hash if entries[rel]['src'] and entries[rel]['dst']]
+        digests.update(checksum_service.checksum_many([os.path.join(self.local_path, rel) for rel in both]))
+
+        for rel in to_hash:
+            entry = entries[rel]
+            dst_digest = digests.get(os.path.join(self.local_path, rel))
+            if self.offline and entry['src'] and entry['dst']:
+                # Assume the share is as last seen - only local edits can be detected
+                old = previous.get(rel)
+                if entry.get('synced_digest') and dst_digest == entry['synced_digest']:
+                    entry['status'] = old['status'] if old and old['status'] == 'stale' else 'in_sync'
+                else:
+                    entry['status'] = 'local_modified'
+                continue
+            src_digest = digests.get(os.path.join(self.network_path, rel))
+            entry['status'] = self._classify(entry, src_digest, dst_digest)
+
+        with self.lock:
+            self.entries = entries
+            self.last_refresh = datetime.now()
+            self.last_refresh_ms = (time.perf_counter() - start) * 1000
+
+        if to_hash or len(entries) != len(previous):
+            self.save()
+        return self.summary()
+
+    def status_of(self, rel_path):
+        """Cached status for one file (None if unknown)"""
+        with self.lock:
+            entry = self.entries.get(rel_path.replace("\\", "/"))
+        return entry['status'] if entry else None
+
+    def rows(self):
+        """Snapshot of all entries as (rel_path, entry) sorted by path"""
+        with self.lock:
+            return sorted(self.entries.items())
+
+    def summary(self):
+        with self.lock:
+            counts = {status: 0 for status in self.STATUSES}
+            for entry in self.entries.values():
+                counts[entry['status']] = counts.get(entry['status'], 0) + 1
+            return {
+                'total': len(self.entries),
+                'counts': counts,
+                'refreshed': self.last_refresh,
+                'elapsed_ms': self.last_refresh_ms,
+                'offline': self.offline,
+            }
+
+    def load(self):
+        """Load the persisted manifest (ignored if it was built for different roots)"""
+        if not self.manifest_file or not self.manifest_file.exists():
+            return
+        try:
+            with open(self.manifest_file, 'r') as f:
+                data = json.load(f)
+            if data.get('network_path') != self.network_path or data.get('local_path') != self.local_path:
+                return
+            if tuple(data.get('patterns', self.patterns)) != self.patterns or tuple(data.get('exclude', ())) != self.exclude:
+                return  # Filters changed - rebuild from scratch
+            entries = {}
+            for rel, entry in data.get('entries', {}).items():
+                entry['src'] = tuple(entry['src']) if entry.get('src') else None
+                entry['dst'] = tuple(entry['dst']) if entry.get('dst') else None
+                entries[rel] = entry
+            with self.lock:
+                self.entries = entries
+        except Exception as e:
+            print(f"Error loading sync manifest: {e}")
+
+    def save(self):
+        if not self.manifest_file:
+            return
+        with self.lock:
+            data = {
+                'network_path': self.network_path,
+                'local_path': self.local_path,
+                'patterns': list(self.patterns),
+                'exclude': list(self.exclude),
+                'entries': dict(self.entries),
+            }
+        try:
+            self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.manifest_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.manifest_file)
+        except Exception as e:
+            print(f"Error saving sync manifest: {e}")
+
+class SyncRoot:
+    """One share -> local mirror pair with its own include/exclude patterns"""
+
+    def __init__(self, name, network_path, local_path, include=None, exclude=None, enabled=True, helper_url=""):
+        self.name = name
+        self.network_path = network_path
+        self.local_path = local_path
+        self.include = parse_pattern_list(include)
+        self.exclude = parse_pattern_list(exclude)
+        self.enabled = enabled
+        self.helper_url = helper_url or ""
+
+    @property
+    def patterns(self):
+        """Include patterns, or the standard YAML/resource set when none are configured"""
+        return self.include or SYNC_PATTERNS
+
+    @property
+    def key(self):
+        """Stable short id used for this root's manifest file"""
+        filters = f"{self.network_path}|{self.local_path}"
+        if self.include or self.exclude:
+            filters += f"|{','.join(self.include)}|{','.join(self.exclude)}"
+        return hashlib.blake2b(filters.encode('utf-8'), digest_size=6).hexdigest()
+
+    def relative_local_path(self, file_path):
+        """Path of file_path inside this root's local mirror ('/' separated), or None if outside it"""
+        if not self.local_path:
+            return None
+        try:
+            rel = os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.local_path))
+        except ValueError:
+            return None  # Different drive on Windows
+        if rel == '.' or rel.startswith('..'):
+            return None
+        return rel.replace('\\', '/')
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'network_path': self.network_path,
+            'local_path': self.local_path,
+            'include': list(self.include),
+            'exclude': list(self.exclude),
+            'enabled': self.enabled,
+            'helper_url': self.helper_url,
+        }
 
-    ServiceBrowser(zeroconf, "_esphome._tcp.local.", listener)
-    ServiceBrowser(zeroconf, "_esphomelib._tcp.local.", listener)
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('name') or data.get('network_path', ''), data.get('network_path', ''),
+                   data.get('local_path', ''), data.get('include'), data.get('exclude'),
+                   data.get('enabled', True), data.get('helper_url', ''))
+
+###############################
+def discover_esphome_devices(wait=3.0):
+    """[(name, ip)] of the devices seen this session, from the background registry
 
-    time.sleep(3)
-    zeroconf.close()
-    return listener.devices  # Returns list of (name, ip)
+    Starts discovery on first use; only when nothing has answered yet does it wait (up to wait
+    seconds, for worker threads) for the first answers to arrive. Records remembered from
+    earlier sessions are left out - their addresses may be out of date.
+    """
+    discovery_service.start()
+    deadline = time.time() + wait
+    while not device_registry.devices(online_only=True) and time.time() < deadline:
+        time.sleep(0.1)
+    return device_registry.devices(online_only=True)
 
 # NEW - Enhanced file sync function
-def sync_esphome_files(network_path, local_path, backup_path=None):
+def sync_esphome_files(network_path, local_path, backup_path=None, share=None):
     """Sync YAML files and resources (images, fonts, etc.) and return list of synced files"""
     synced_files = []
+    # All share access goes through the guard so a dead host fails fast instead of hanging
+    share = share or get_share_guard(network_path)
     try:
+        if not share.is_reachable():
+            print(f"Sync skipped: share {network_path} is {share.describe()}")
+            return []
+        
         # Create local directory if it doesn't exist
         os.makedirs(local_path, exist_ok=True)
         
-        # Define file patterns to sync
-        sync_patterns = [
-            "*.yaml",
-            "*.yml", 
-            "*.png", "*.jpg", "*.jpeg", "*.bmp", "*.gif",  # Images
-            "*.ttf", "*.otf",  # Fonts
-            "*.bin",  # Binary files
-            "*.txt", "*.md",  # Text files
-        ]
-        
         # Sync files matching patterns
-        for pattern in sync_patterns:
+        for pattern in SYNC_PATTERNS:
             pattern_path = os.path.join(network_path, pattern)
-            for src_file in glob.glob(pattern_path):
-                if os.path.isfile(src_file):
+            for src_file in share.glob(pattern_path):
+                if share.isfile(src_file):
                     filename = os.path.basename(src_file)
                     dst = os.path.join(local_path, filename)
                     
@@ -814,20 +1774,20 @@ def sync_esphome_files(network_path, local_path, backup_path=None):
                                 print(f"Backed up: {backup_file}")
 
                     # Only copy if source is newer or destination doesn't exist
-                    if not os.path.exists(dst) or os.path.getmtime(src_file) > os.path.getmtime(dst):
-                        shutil.copy2(src_file, dst)
+                    if not os.path.exists(dst) or share.getmtime(src_file) > os.path.getmtime(dst):
+                        share.copy2(src_file, dst)
                         synced_files.append(filename)
                         print(f"Synced: {filename}")
         
         # Also sync subdirectories (for organized resources)
-        for item in os.listdir(network_path):
+        for item in share.listdir(network_path):
             item_path = os.path.join(network_path, item)
-            if os.path.isdir(item_path):
+            if share.isdir(item_path):
                 local_subdir = os.path.join(local_path, item)
                 os.makedirs(local_subdir, exist_ok=True)
                 
                 # Recursively sync subdirectory contents
-                subdir_synced = sync_esphome_files(item_path, local_subdir, backup_path)
+                subdir_synced = sync_esphome_files(item_path, local_subdir, backup_path, share)
                 synced_files.extend([f"{item}/{f}" for f in subdir_synced])
         
         return synced_files
@@ -835,10 +1795,25 @@ def sync_esphome_files(network_path, local_path, backup_path=None):
         print(f"Sync failed: {e}")
         return []
 
-def sync_esphome_files_fast(network_path, local_path, backup_path=None, yaml_file=None):
-    """Fast sync - only sync files needed for the current YAML"""
+def sync_esphome_files_fast(network_path, local_path, backup_path=None, yaml_file=None,
+                            patterns=SYNC_PATTERNS, exclude=()):
+    """Fast sync - only sync files needed for the current YAML, honouring the root's include/exclude"""
     synced_files = []
+    share = get_share_guard(network_path)
+    filtered = tuple(patterns) != SYNC_PATTERNS or bool(exclude)
+    
+    def full_sync():
+        # The classic walk knows nothing about per-root filters - plan with them instead
+        if filtered:
+            return execute_sync_plan(plan_sync(network_path, local_path, backup_path,
+                                               patterns=patterns, exclude=exclude))
+        return sync_esphome_files(network_path, local_path, backup_path)
+    
     try:
+        if not share.is_reachable():
+            print(f"Fast sync skipped: share {network_path} is {share.describe()}")
+            return []
+        
         os.makedirs(local_path, exist_ok=True)
         
         # If we have a specific YAML file, only sync referenced files
@@ -851,14 +1826,17 @@ def sync_esphome_files_fast(network_path, local_path, backup_path=None, yaml_fil
             common_dirs = ['images', 'fonts', 'binaries', 'scripts']
             for dir_name in common_dirs:
                 dir_path = os.path.join(network_path, dir_name)
-                if os.path.exists(dir_path):
+                if share.exists(dir_path):
                     # Add all files from common directories (they're usually small)
-                    for file in os.listdir(dir_path):
+                    for file in share.listdir(dir_path):
                         if any(file.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.bmp', '.gif', '.ttf', '.otf', '.bin']):
                             referenced_files.append(os.path.join(dir_name, file))
             
-            # Remove duplicates
-            referenced_files = list(set(referenced_files))
+            # Remove duplicates, and anything the root's patterns leave out (the main YAML always syncs)
+            main_yaml = os.path.basename(yaml_file)
+            allowed = filter_sync_listing({ref.replace(os.sep, '/'): None for ref in referenced_files}, patterns, exclude)
+            referenced_files = [ref for ref in set(referenced_files)
+                                if ref == main_yaml or ref.replace(os.sep, '/') in allowed]
             
             for file_ref in referenced_files:
                 # Handle files in subdirectories
@@ -868,7 +1846,7 @@ def sync_esphome_files_fast(network_path, local_path, backup_path=None, yaml_fil
                 # Create destination directory if needed
                 os.makedirs(os.path.dirname(dst), exist_ok=True)
                 
-                if os.path.exists(src) and os.path.isfile(src):
+                if share.isfile(src):
                     # Create backup if it's a YAML file and backup is enabled
                     if (backup_path and 
                         file_ref.lower().endswith(('.yaml', '.yml')) and 
@@ -878,20 +1856,286 @@ def sync_esphome_files_fast(network_path, local_path, backup_path=None, yaml_fil
                             print(f"Backed up: {backup_file}")
                     
                     # Only copy if source is newer or destination doesn't exist
-                    if not os.path.exists(dst) or os.path.getmtime(src) > os.path.getmtime(dst):
-                        shutil.copy2(src, dst)
+                    if not os.path.exists(dst) or share.getmtime(src) > os.path.getmtime(dst):
+                        share.copy2(src, dst)
                         synced_files.append(file_ref)
                         print(f"Synced: {file_ref}")
             
             return synced_files
         
         # Fallback to full sync if no specific YAML
-        return sync_esphome_files(network_path, local_path, backup_path)
+        return full_sync()
         
+    except ShareUnavailableError as e:
+        # No point falling back to a full sync against a share that just went away
+        print(f"Fast sync aborted, share unreachable: {e}")
+        return synced_files
     except Exception as e:
         print(f"Fast sync failed: {e}")
         # Fallback to full sync
-        return sync_esphome_files(network_path, local_path, backup_path)
+        try:
+            return full_sync()
+        except Exception as e:
+            print(f"Fallback sync failed: {e}")
+            return synced_files
+
+# Transports for whole-workspace syncs. All of them run a SyncPlan; the classic
+# sync_esphome_files() walk is kept as the fallback if a transport fails
+SYNC_TRANSPORTS = ("Per-file", "Pipelined batch", "Bundle helper")
+SYNC_METRICS_FILE = Path.home() / ".esphome_studio" / "sync_metrics.jsonl"
+
+class SyncPlan:
+    """Planned sync operations (copy, delta, skip, backup) with byte counts and per-stage timings.
+
+    'copy' is a file missing locally, 'delta' replaces an existing local file with a newer
+    source, 'backup' is the local YAML saved before a delta and 'skip' is already up to date.
+    """
+    ACTIONS = ('copy', 'delta', 'backup', 'skip')
+    STAGES = ('scan', 'compare', 'backup', 'copy')
+
+    def __init__(self, network_path, local_path, backup_path=None):
+        self.network_path = network_path
+        self.local_path = local_path
+        self.backup_path = backup_path
+        self.operations = []  # dicts: action, path, bytes, reason
+        self.timings = {}  # stage -> seconds
+        self.executed = False
+        self.synced_files = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a stage (accumulates if the stage runs more than once)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, action, rel_path, size, reason=""):
+        self.operations.append({'action': action, 'path': rel_path, 'bytes': size, 'reason': reason})
+
+    def ops(self, *actions):
+        return [op for op in self.operations if op['action'] in actions]
+
+    def totals(self):
+        totals = {action: {'count': 0, 'bytes': 0} for action in self.ACTIONS}
+        for op in self.operations:
+            totals[op['action']]['count'] += 1
+            totals[op['action']]['bytes'] += op['bytes']
+        return totals
+
+    def transfer_bytes(self):
+        return sum(op['bytes'] for op in self.ops('copy', 'delta'))
+
+    def metrics(self, transport=None):
+        """Structured summary suitable for logging/JSON"""
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'transport': transport,
+            'network_path': self.network_path,
+            'local_path': self.local_path,
+            'dry_run': not self.executed,
+            'timings_ms': {stage: round(self.timings[stage] * 1000, 1) for stage in self.STAGES if stage in self.timings},
+            'totals': self.totals(),
+            'synced': len(self.synced_files),
+        }
+
+    def describe_timings(self):
+        """One-line stage timing summary, e.g. 'scan 120 ms, compare 2 ms, copy 1.4 s'"""
+        parts = []
+        for stage in self.STAGES:
+            if stage in self.timings:
+                seconds = self.timings[stage]
+                parts.append(f"{stage} {seconds * 1000:.0f} ms" if seconds < 1 else f"{stage} {seconds:.1f} s")
+        return ", ".join(parts) or "no stages run"
+
+def plan_sync(network_path, local_path, backup_path=None, rel_paths=None, scanner=None,
+              patterns=SYNC_PATTERNS, exclude=()):
+    """Build a SyncPlan without touching any files.
+
+    scanner() may supply the source listing ({rel_path: (size, mtime_ns)}); by default
+    the share is scanned through its ShareGuard. rel_paths limits the plan to those files.
+    """
+    plan = SyncPlan(network_path, local_path, backup_path)
+    with plan.stage('scan'):
+        if scanner is None:
+            share = get_share_guard(network_path)
+            if not share.is_reachable():
+                raise ShareUnavailableError(f"Share {network_path} is {share.describe()}")
+            remote_files = share.run(scan_sync_tree, network_path, patterns, exclude, timeout=60)
+        else:
+            remote_files = filter_sync_listing(scanner(), patterns, exclude)
+        local_files = scan_sync_tree(local_path, patterns, exclude)
+    
+    with plan.stage('compare'):
+        wanted = set(rel_paths) if rel_paths is not None else None
+        for rel, (size, mtime_ns) in sorted(remote_files.items()):
+            if wanted is not None and rel not in wanted:
+                continue
+            local = local_files.get(rel)
+            if local is None:
+                plan.add('copy', rel, size, "missing locally")
+            elif mtime_ns > local[1]:
+                if backup_path and rel.lower().endswith(('.yaml', '.yml')):
+                    plan.add('backup', rel, local[0], "local copy replaced")
+                plan.add('delta', rel, size, "source newer")
+            else:
+                plan.add('skip', rel, size, "up to date")
+    plan.remote_files = remote_files
+    return plan
+
+def _run_plan_backups(plan):
+    """Back up existing local YAMLs that the plan is about to replace"""
+    with plan.stage('backup'):
+        for op in plan.ops('backup'):
+            dst = os.path.join(plan.local_path, *op['path'].split('/'))
+            backup_file = create_backup(dst, plan.backup_path, os.path.basename(op['path']))
+            if backup_file:
+                print(f"Backed up: {backup_file}")
+
+def execute_sync_plan(plan, max_workers=1):
+    """Run the backup and copy stages of a plan against the share - returns synced paths"""
+    share = get_share_guard(plan.network_path)
+    _run_plan_backups(plan)
+    
+    def copy_one(rel):
+        dst = local_sync_target(plan.local_path, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        share.copy2(os.path.join(plan.network_path, *rel.split('/')), dst)
+        return rel
+    
+    to_copy = [op['path'] for op in plan.ops('copy', 'delta')]
+    with plan.stage('copy'):
+        if max_workers > 1 and len(to_copy) > 1:
+            # Several reads in flight hide the per-file open/close latency of the share
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(to_copy))) as pool:
+                for rel in pool.map(copy_one, to_copy):
+                    plan.synced_files.append(rel)
+                    print(f"Synced: {rel}")
+        else:
+            for rel in to_copy:
+                plan.synced_files.append(copy_one(rel))
+                print(f"Synced: {rel}")
+    plan.executed = True
+    return plan.synced_files
+
+def plan_bundle_sync(helper_url, network_path, local_path, backup_path=None, token=None, timeout=30,
+                     patterns=SYNC_PATTERNS, exclude=()):
+    """Plan a sync from the esphome_sync_helper.py manifest instead of scanning the share"""
+    headers = {'X-Sync-Token': token} if token else {}
+    
+    def fetch_manifest():
+        response = requests.get(f"{helper_url.rstrip('/')}/manifest", headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return {rel: tuple(stat) for rel, stat in response.json()['files'].items()}
+    
+    return plan_sync(network_path, local_path, backup_path, scanner=fetch_manifest,
+                     patterns=patterns, exclude=exclude)
+
+def execute_bundle_plan(plan, helper_url, token=None, timeout=30):
+    """Fetch all planned files as one streamed tar.gz from esphome_sync_helper.py"""
+    _run_plan_backups(plan)
+    headers = {'X-Sync-Token': token} if token else {}
+    wanted = [op['path'] for op in plan.ops('copy', 'delta')]
+    
+    with plan.stage('copy'):
+        if wanted:
+            wanted_set = set(wanted)
+            with requests.post(f"{helper_url.rstrip('/')}/bundle", json={'files': wanted}, headers=headers,
+                               stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                with tarfile.open(fileobj=response.raw, mode='r|gz') as tar:
+                    for member in tar:
+                        # Only accept plain files we asked for - never trust archive paths
+                        if not member.isfile() or member.name not in wanted_set:
+                            continue
+                        dst = local_sync_target(plan.local_path, member.name)
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        tmp_dst = dst + ".synctmp"
+                        with tar.extractfile(member) as src, open(tmp_dst, 'wb') as out:
+                            shutil.copyfileobj(src, out, 1024 * 1024)
+                        os.replace(tmp_dst, dst)
+                        mtime_ns = plan.remote_files[member.name][1]
+                        os.utime(dst, ns=(mtime_ns, mtime_ns))
+                        plan.synced_files.append(member.name)
+                        print(f"Synced: {member.name}")
+    plan.executed = True
+    return plan.synced_files
+
+def record_sync_metrics(metrics, metrics_file=SYNC_METRICS_FILE):
+    """Append one sync's structured metrics as a JSON line"""
+    try:
+        metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(metrics_file, 'a') as f:
+            f.write(json.dumps(metrics) + "\n")
+    except Exception as e:
+        print(f"Error recording sync metrics: {e}")
+
+def sync_workspace(network_path, local_path, backup_path=None, transport="Per-file", helper_url=None,
+                   helper_token=None, metrics_callback=None, patterns=SYNC_PATTERNS, exclude=(), root_name=None):
+    """Full workspace sync with the selected transport, falling back to the classic walk on any failure"""
+    start = time.perf_counter()
+    plan = None
+    try:
+        if transport == "Bundle helper" and helper_url:
+            plan = plan_bundle_sync(helper_url, network_path, local_path, backup_path, helper_token,
+                                    patterns=patterns, exclude=exclude)
+            synced_files = execute_bundle_plan(plan, helper_url, helper_token)
+        else:
+            plan = plan_sync(network_path, local_path, backup_path, patterns=patterns, exclude=exclude)
+            synced_files = execute_sync_plan(plan, max_workers=8 if transport == "Pipelined batch" else 1)
+        metrics = plan.metrics(transport)
+    except ShareUnavailableError as e:
+        print(f"Sync skipped: {e}")
+        return []
+    except Exception as e:
+        if tuple(patterns) != SYNC_PATTERNS or exclude:
+            # The classic walk knows nothing about per-root filters - don't pull in excluded files
+            print(f"{transport} sync failed for filtered root {root_name or network_path}: {e}")
+            return []
+        print(f"{transport} sync failed, falling back to classic sync: {e}")
+        synced_files = sync_esphome_files(network_path, local_path, backup_path)
+        metrics = plan.metrics(transport) if plan else SyncPlan(network_path, local_path).metrics(transport)
+        metrics['fallback'] = str(e)
+        metrics['synced'] = len(synced_files)
+    
+    metrics['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    if root_name:
+        metrics['root'] = root_name
+    record_sync_metrics(metrics)
+    if metrics_callback:
+        metrics_callback(metrics, plan)
+    return synced_files
+
+def sync_roots(roots, backup_path=None, transport="Per-file", helper_token=None, metrics_callback=None,
+               root_callback=None, max_parallel=4):
+    """Sync several SyncRoots concurrently - returns {root name: synced files}.
+
+    Each root has its own ShareGuard, so a slow or offline share only delays its own
+    worker. root_callback(root, synced_files) fires as soon as each root finishes.
+    """
+    roots = [root for root in roots if root.enabled and root.network_path and root.local_path]
+    results = {}
+    if not roots:
+        return results
+    
+    def sync_one(root):
+        return sync_workspace(root.network_path, root.local_path, backup_path, transport,
+                              root.helper_url, helper_token, metrics_callback,
+                              patterns=root.patterns, exclude=root.exclude, root_name=root.name)
+    
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(roots))) as pool:
+        futures = {pool.submit(sync_one, root): root for root in roots}
+        for future in as_completed(futures):
+            root = futures[future]
+            try:
+                results[root.name] = future.result()
+            except Exception as e:
+                print(f"Sync of root {root.name} failed: {e}")
+                results[root.name] = []
+            if root_callback:
+                root_callback(root, results[root.name])
+    return results
 
 def get_referenced_files(yaml_file):
     """Extract referenced files from YAML configuration"""
@@ -931,154 +2175,1075 @@ def get_referenced_files(yaml_file):
         return []
 
 # NEW - Backup functionality
-def create_backup(file_path, backup_dir, original_name=None):
-    """Create a timestamped backup of a YAML file inside its own subfolder"""
-    try:
-        os.makedirs(backup_dir, exist_ok=True)
+BACKUP_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+BACKUP_TAGS = ("daily", "weekly", "monthly", "yearly", "baseline")
+BACKUP_REF_PREFIX = "store:"
+# Object encodings: a zlib'd full snapshot, or a zlib'd line delta against a base object.
+# Objects without a magic header are raw contents written before compression existed.
+BACKUP_FULL_MAGIC = b"EBS1F"
+BACKUP_DELTA_MAGIC = b"EBS1D"
+BACKUP_SNAPSHOT_INTERVAL = 10  # Longest delta chain before the next version is stored in full
+BACKUP_BASE_CACHE_BYTES = 8 * 1024 * 1024  # Newest contents kept in memory as delta bases (LRU)
+BACKUP_OBJECT_LOCK_STRIPES = 64  # Per-digest write locks, striped so the table stays small
+# Pack entries: b"EBP1 <digest> <length>\n" followed by the object payload, so a pack is self-describing
+BACKUP_PACK_MAGIC = b"EBP1"
+BACKUP_PACK_AFTER_DAYS = 30  # Default age at which loose objects are rolled into monthly packs
+
+def encode_line_delta(base, data):
+    """Line-level delta turning base into data: ops are ["c", i1, i2] (copy base lines) or ["i", [lines]]"""
+    base_lines = base.splitlines(keepends=True)
+    new_lines = data.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+    for opcode, i1, i2, j1, j2 in matcher.get_opcodes():
+        if opcode == 'equal':
+            ops.append(["c", i1, i2])
+        elif opcode in ('replace', 'insert'):
+            # latin-1 maps bytes 1:1 so any encoding survives the JSON round trip
+            ops.append(["i", [line.decode('latin-1') for line in new_lines[j1:j2]]])
+    return json.dumps(ops, separators=(',', ':')).encode('ascii')
+
+def apply_line_delta(base, delta):
+    """Rebuild contents from a base and an encode_line_delta() payload"""
+    base_lines = base.splitlines(keepends=True)
+    out = []
+    for op in json.loads(delta):
+        if op[0] == "c":
+            out.extend(base_lines[op[1]:op[2]])
+        else:
+            out.extend(line.encode('latin-1') for line in op[1])
+    return b"".join(out)
+
+class BackupStore:
+    """Content-addressed backup store: one blob per distinct file content plus a version index.
+
+    Layout under the backup dir: .store/objects/<2 hex>/<digest> holds the contents and
+    .store/index.db lists every version (name, time, digest, size, retention tag). A backup
+    of unchanged content costs a (cached) hash; a revert to older content reuses its blob.
+    Objects are compressed; most are line deltas against the file's previous version, with a
+    full snapshot every BACKUP_SNAPSHOT_INTERVAL versions to keep reconstruction chains short.
+    Old objects are rolled into per-month pack files (.store/packs/<YYYY-MM>.pack) so the store
+    does not grow into tens of thousands of tiny files; the objects table records where each lives.
+    """
+    def __init__(self, backup_dir):
+        self.backup_dir = Path(backup_dir)
+        self.store_dir = self.backup_dir / ".store"
+        self.objects_dir = self.store_dir / "objects"
+        self.db_file = self.store_dir / "index.db"
+        self.packs_dir = self.store_dir / "packs"
+        self.lock = Lock()
+        self.pack_lock = Lock()  # One packer/compactor at a time
+        self.object_locks = [Lock() for _ in range(BACKUP_OBJECT_LOCK_STRIPES)]  # Striped by digest
+        self.last_contents = OrderedDict()  # name -> (digest, bytes) of the newest version, the usual delta base
+        self.last_contents_bytes = 0
+        self.last_contents_lock = Lock()
+        self.init_database()
 
-        if original_name is None:
-            original_name = os.path.basename(file_path)
+    def init_database(self):
+        """Create the version index"""
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS versions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    tag TEXT,
+                    source_path TEXT
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_versions_name ON versions (name, created_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_versions_digest ON versions (digest)")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS objects (
+                    digest TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,  -- 'full' or 'delta'
+                    base TEXT,  -- digest the delta applies to
+                    depth INTEGER NOT NULL DEFAULT 0,  -- deltas between this object and a full snapshot
+                    stored_size INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_objects_base ON objects (base)")
+            # Packed objects: pack name (NULL while loose) and the payload's offset inside it
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(objects)").fetchall()}
+            if 'pack' not in columns:
+                cursor.execute("ALTER TABLE objects ADD COLUMN pack TEXT")
+                cursor.execute("ALTER TABLE objects ADD COLUMN pack_offset INTEGER")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_objects_pack ON objects (pack, pack_offset)")
+            # Objects from before compression are plain full copies
+            cursor.execute("INSERT OR IGNORE INTO objects (digest, kind, base, depth, stored_size) "
+                           "SELECT DISTINCT digest, 'full', NULL, 0, size FROM versions")
+            self._init_catalog(cursor)
+            self._init_search(cursor)
+            conn.commit()
+            conn.close()
 
-        # Create subfolder for this file (e.g. backup_dir/light.yaml/)
-        subdir = os.path.join(backup_dir, original_name)
-        os.makedirs(subdir, exist_ok=True)
+    def _init_catalog(self, cursor):
+        """Per-file and store-wide totals kept current by triggers, so the Backup tab never aggregates"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS name_stats (
+                name TEXT PRIMARY KEY,
+                version_count INTEGER NOT NULL DEFAULT 0,
+                logical_size INTEGER NOT NULL DEFAULT 0,
+                latest_at TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version_count INTEGER NOT NULL DEFAULT 0,
+                logical_size INTEGER NOT NULL DEFAULT 0,
+                object_count INTEGER NOT NULL DEFAULT 0,
+                stored_size INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_versions_insert AFTER INSERT ON versions BEGIN
+                INSERT OR IGNORE INTO name_stats (name) VALUES (NEW.name);
+                UPDATE name_stats SET version_count = version_count + 1, logical_size = logical_size + NEW.size,
+                    latest_at = MAX(COALESCE(latest_at, ''), NEW.created_at) WHERE name = NEW.name;
+                UPDATE catalog_totals SET version_count = version_count + 1, logical_size = logical_size + NEW.size;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_versions_delete AFTER DELETE ON versions BEGIN
+                UPDATE name_stats SET version_count = version_count - 1, logical_size = logical_size - OLD.size,
+                    latest_at = (SELECT MAX(created_at) FROM versions WHERE name = OLD.name) WHERE name = OLD.name;
+                DELETE FROM name_stats WHERE name = OLD.name AND version_count <= 0;
+                UPDATE catalog_totals SET version_count = version_count - 1, logical_size = logical_size - OLD.size;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_objects_insert AFTER INSERT ON objects BEGIN
+                UPDATE catalog_totals SET object_count = object_count + 1, stored_size = stored_size + NEW.stored_size;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_objects_delete AFTER DELETE ON objects BEGIN
+                UPDATE catalog_totals SET object_count = object_count - 1, stored_size = stored_size - OLD.stored_size;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_objects_update AFTER UPDATE OF stored_size ON objects BEGIN
+                UPDATE catalog_totals SET stored_size = stored_size - OLD.stored_size + NEW.stored_size;
+            END
+        ''')
+        if not cursor.execute("SELECT 1 FROM catalog_totals WHERE id = 1").fetchone():
+            cursor.execute("INSERT INTO catalog_totals (id) VALUES (1)")
+            self._rebuild_catalog(cursor)
+
+    def _init_search(self, cursor):
+        """Full-text index with one document per distinct content; falls back to scanning without FTS5"""
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS contents_fts USING fts5(content)")
+            cursor.execute("CREATE TABLE IF NOT EXISTS search_docs (digest TEXT PRIMARY KEY, doc_id INTEGER NOT NULL)")
+            self.fts_available = True
+        except sqlite3.OperationalError as e:
+            print(f"SQLite FTS5 unavailable, backup search will scan contents: {e}")
+            self.fts_available = False
+
+    def _rebuild_catalog(self, cursor):
+        """Recompute the catalog tables from versions/objects"""
+        cursor.execute("DELETE FROM name_stats")
+        cursor.execute("INSERT INTO name_stats (name, version_count, logical_size, latest_at) "
+                       "SELECT name, COUNT(*), SUM(size), MAX(created_at) FROM versions GROUP BY name")
+        cursor.execute('''
+            UPDATE catalog_totals SET
+                version_count = (SELECT COUNT(*) FROM versions),
+                logical_size = (SELECT COALESCE(SUM(size), 0) FROM versions),
+                object_count = (SELECT COUNT(*) FROM objects),
+                stored_size = (SELECT COALESCE(SUM(stored_size), 0) FROM objects)
+            WHERE id = 1
+        ''')
+
+    @staticmethod
+    def digest_bytes(data):
+        """Same BLAKE2b digest the checksum service produces for a file"""
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    def object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest
+
+    def object_lock(self, digest):
+        """The lock serialising writers of one digest (full_backup adds files from a thread pool)"""
+        return self.object_locks[int(digest[:8], 16) % len(self.object_locks)]
+
+    def pack_path(self, pack):
+        return self.packs_dir / f"{pack}.pack"
+
+    @staticmethod
+    def _pack_header(digest, length):
+        return BACKUP_PACK_MAGIC + f" {digest} {length}\n".encode('ascii')
+
+    def _object_info(self, digest):
+        rows = self._query("SELECT kind, base, depth, stored_size FROM objects WHERE digest = ?", (digest,))
+        return rows[0] if rows else None
+
+    def _write_object(self, digest, data, base=None):
+        """Write a blob's file once, as a delta against base (digest, bytes) when that is smaller
+
+        Existing content is never rewritten. Returns the (kind, base, depth, stored_size) row
+        for the caller to index in the same transaction as its version, or None if it existed.
+        """
+        if self._object_info(digest):
+            return None
+        
+        payload = BACKUP_FULL_MAGIC + zlib.compress(data, 9)
+        kind, base_digest, depth = 'full', None, 0
+        if base:
+            base_info = self._object_info(base[0])
+            if base_info and base_info[2] + 1 < BACKUP_SNAPSHOT_INTERVAL:
+                delta = (BACKUP_DELTA_MAGIC + base[0].encode('ascii') + b"\n" +
+                         zlib.compress(encode_line_delta(base[1], data), 9))
+                if len(delta) < len(payload):
+                    payload, kind, base_digest, depth = delta, 'delta', base[0], base_info[2] + 1
+        
+        path = self.object_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=digest[:12] + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        return (kind, base_digest, depth, len(payload))
+
+    def read_object(self, digest):
+        """Reconstruct an object's contents, following its delta chain back to a full snapshot"""
+        chain = []
+        current = digest
+        while True:
+            payload = self._read_payload(current)
+            if payload.startswith(BACKUP_DELTA_MAGIC):
+                header_end = payload.index(b"\n")
+                chain.append(zlib.decompress(payload[header_end + 1:]))
+                current = payload[len(BACKUP_DELTA_MAGIC):header_end].decode('ascii')
+                if len(chain) > BACKUP_SNAPSHOT_INTERVAL * 4:
+                    raise ValueError(f"Backup object {digest} has a broken delta chain")
+                continue
+            if payload.startswith(BACKUP_FULL_MAGIC):
+                data = zlib.decompress(payload[len(BACKUP_FULL_MAGIC):])
+            else:
+                data = payload  # Raw object from before compression
+            break
+        for delta in reversed(chain):
+            data = apply_line_delta(data, delta)
+        if self.digest_bytes(data) != digest:
+            raise ValueError(f"Backup object {digest} failed its integrity check")
+        return data
+
+    def _read_payload(self, digest):
+        """Stored bytes of one object, from its loose file or from the pack it was rolled into"""
+        try:
+            with open(self.object_path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        # Under the lock so a pack being compacted can't move the entry between lookup and read
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            row = conn.execute("SELECT pack, pack_offset, stored_size FROM objects WHERE digest = ?",
+                               (digest,)).fetchone()
+            conn.close()
+            if not row or row[0] is None:
+                raise FileNotFoundError(f"Backup object {digest} not found")
+            with open(self.pack_path(row[0]), 'rb') as f:
+                f.seek(row[1])
+                payload = f.read(row[2])
+        if len(payload) != row[2]:
+            raise ValueError(f"Backup pack {row[0]} is truncated at object {digest}")
+        return payload
+
+    def pack_old_objects(self, older_than_days=BACKUP_PACK_AFTER_DAYS):
+        """Roll loose objects older than the threshold into per-month packs - returns a summary dict
+
+        An object's month is that of its oldest version (its file time if no version uses it any
+        more, e.g. a delta base). Payloads are appended and synced before the index points at
+        them, and loose files are removed last, so an interruption leaves every object readable.
+        Packs left mostly dead by garbage collection are compacted afterwards.
+        """
+        summary = {'packed': 0, 'packs': [], 'loose_before': 0, 'compacted': 0}
+        cutoff = time.time() - older_than_days * 86400
+        rows = self._query("SELECT o.digest, MIN(v.created_at) FROM objects o "
+                           "LEFT JOIN versions v ON v.digest = o.digest WHERE o.pack IS NULL GROUP BY o.digest")
+        summary['loose_before'] = len(rows)
+        by_month = defaultdict(list)
+        for digest, created_at in rows:
+            try:
+                written = os.path.getmtime(self.object_path(digest))
+            except OSError:
+                continue  # Removed by garbage collection meanwhile
+            when = datetime.fromisoformat(created_at).timestamp() if created_at else written
+            if max(when, written) < cutoff:
+                by_month[datetime.fromtimestamp(when).strftime("%Y-%m")].append(digest)
+        
+        with self.pack_lock:
+            self.packs_dir.mkdir(parents=True, exist_ok=True)
+            for month, digests in sorted(by_month.items()):
+                entries = []
+                with open(self.pack_path(month), 'ab') as pack:
+                    for digest in digests:
+                        try:
+                            with open(self.object_path(digest), 'rb') as f:
+                                payload = f.read()
+                        except FileNotFoundError:
+                            continue
+                        if not payload.startswith((BACKUP_FULL_MAGIC, BACKUP_DELTA_MAGIC)):
+                            payload = BACKUP_FULL_MAGIC + zlib.compress(payload, 9)  # Raw pre-compression blob
+                        pack.write(self._pack_header(digest, len(payload)))
+                        entries.append((month, pack.tell(), len(payload), digest))
+                        pack.write(payload)
+                    pack.flush()
+                    os.fsync(pack.fileno())
+                if not entries:
+                    continue
+                with self.lock:
+                    conn = sqlite3.connect(self.db_file)
+                    cursor = conn.cursor()
+                    cursor.executemany("UPDATE objects SET pack = ?, pack_offset = ?, stored_size = ? "
+                                       "WHERE digest = ? AND pack IS NULL", entries)
+                    conn.commit()
+                    conn.close()
+                for _, _, _, digest in entries:
+                    try:
+                        self.object_path(digest).unlink()
+                    except OSError as e:
+                        print(f"Could not remove packed backup object {digest}: {e}")
+                summary['packed'] += len(entries)
+                summary['packs'].append(month)
+            summary['compacted'] = self._compact_packs()
+        return summary
+
+    def _compact_packs(self, max_dead_ratio=0.5):
+        """Rewrite packs whose entries are mostly garbage-collected - caller holds pack_lock
+
+        Live entries are copied into a new pack and the index is switched over in one commit
+        before the old pack is removed, so an interruption never leaves an entry unreachable.
+        """
+        compacted = 0
+        for pack_file in sorted(self.packs_dir.glob("*.pack")):
+            pack = pack_file.stem
+            live = self._query("SELECT digest, pack_offset, stored_size FROM objects WHERE pack = ? "
+                               "ORDER BY pack_offset", (pack,))
+            live_bytes = sum(len(self._pack_header(digest, size)) + size for digest, _, size in live)
+            try:
+                total_bytes = pack_file.stat().st_size
+            except OSError:
+                continue
+            if total_bytes == 0 or (total_bytes - live_bytes) <= total_bytes * max_dead_ratio:
+                continue
+            
+            moved = []
+            stamp = time.strftime('%Y%m%d%H%M%S')
+            new_pack = f"{pack.split('.')[0]}.{stamp}"
+            suffix = 1
+            while self.pack_path(new_pack).exists():
+                suffix += 1
+                new_pack = f"{pack.split('.')[0]}.{stamp}{suffix}"
+            if live:
+                with open(pack_file, 'rb') as src, open(self.pack_path(new_pack), 'wb') as dst:
+                    for digest, offset, size in live:
+                        src.seek(offset)
+                        dst.write(self._pack_header(digest, size))
+                        moved.append((new_pack, dst.tell(), digest, pack))
+                        dst.write(src.read(size))
+                    dst.flush()
+                    os.fsync(dst.fileno())
+            with self.lock:
+                conn = sqlite3.connect(self.db_file)
+                cursor = conn.cursor()
+                cursor.executemany("UPDATE objects SET pack = ?, pack_offset = ? WHERE digest = ? AND pack = ?", moved)
+                conn.commit()
+                conn.close()
+                try:
+                    pack_file.unlink()
+                except OSError as e:
+                    print(f"Could not remove compacted backup pack {pack_file.name}: {e}")
+            compacted += 1
+        return compacted
+
+    VERSION_FIELDS = "v.id, v.name, v.created_at, v.digest, v.size, v.tag, v.source_path, o.kind, o.stored_size"
+    VERSION_COLUMNS = VERSION_FIELDS + " FROM versions v LEFT JOIN objects o ON o.digest = v.digest"
+
+    def _row_to_version(self, row):
+        version_id, name, created_at, digest, size, tag, source_path, kind, stored_size = row
+        created = datetime.fromisoformat(created_at)
+        return {
+            'id': version_id,
+            'name': name,
+            'created_at': created,
+            'digest': digest,
+            'size': size,
+            'tag': tag,
+            'source_path': source_path,
+            'kind': kind or 'full',
+            'stored_size': stored_size if stored_size is not None else size,
+            'label': f"{name}.{created.strftime(BACKUP_TIMESTAMP_FORMAT)}",
+            'ref': f"{BACKUP_REF_PREFIX}{version_id}",
+        }
 
-        # Create backup filename with original_name + timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{original_name}.{timestamp}"  # e.g. light.yaml.20251002_093344
-        backup_path = os.path.join(subdir, backup_name)
+    def _query(self, sql, params=()):
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            conn.close()
+        return rows
+
+    def latest(self, name):
+        rows = self._query(f"SELECT {self.VERSION_COLUMNS} WHERE v.name = ? "
+                           "ORDER BY v.created_at DESC, v.id DESC LIMIT 1", (name,))
+        return self._row_to_version(rows[0]) if rows else None
+
+    def latest_digests(self):
+        """{name: digest of its newest version} for every file, in one indexed query"""
+        return dict(self._query(
+            "SELECT v.name, v.digest FROM versions v JOIN name_stats n ON n.name = v.name AND v.created_at = n.latest_at "
+            "ORDER BY v.id"))
+
+    def add(self, file_path, name=None, created_at=None, tag=None):
+        """Record a version of file_path - returns the version dict (existing one if content is unchanged)"""
+        name = name or os.path.basename(file_path)
+        latest = self.latest(name)
+        
+        # Cheap check first: the checksum cache answers for files untouched since the last hash
+        if latest and created_at is None and checksum_service.checksum(file_path) == latest['digest']:
+            return dict(latest, unchanged=True)
+        
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        digest = self.digest_bytes(data)
+        if latest and created_at is None and digest == latest['digest']:
+            return dict(latest, unchanged=True)
+        
+        # The previous version of the same file is the natural delta base
+        base = None
+        if latest and latest['digest'] != digest:
+            cached = self._cached_contents(name)
+            try:
+                base_data = cached[1] if cached and cached[0] == latest['digest'] else self.read_object(latest['digest'])
+                base = (latest['digest'], base_data)
+            except (OSError, ValueError) as e:
+                print(f"Delta base for {name} unreadable, storing a full snapshot: {e}")
+        created = (created_at or datetime.now()).replace(microsecond=0)
+        # Two files with the same content can be added at once; holding the digest's lock from
+        # the existence check to the commit means only one of them writes and indexes the object.
+        # The object's row and the version that uses it go in together - a crash before the
+        # commit leaves at most an unindexed file, never a row without its version
+        with self.object_lock(digest):
+            object_row = self._write_object(digest, data, base)
+            with self.lock:
+                conn = sqlite3.connect(self.db_file)
+                cursor = conn.cursor()
+                if object_row:
+                    cursor.execute("INSERT OR IGNORE INTO objects (digest, kind, base, depth, stored_size) VALUES (?, ?, ?, ?, ?)",
+                                   (digest,) + object_row)
+                cursor.execute("INSERT INTO versions (name, created_at, digest, size, tag, source_path) VALUES (?, ?, ?, ?, ?, ?)",
+                               (name, created.isoformat(sep=' '), digest, len(data), tag, str(file_path)))
+                version_id = cursor.lastrowid
+                conn.commit()
+                conn.close()
+        if object_row:
+            self._index_contents(digest, data)
+        self._remember_contents(name, digest, data)
+        return dict(self.get(version_id), unchanged=False)
+
+    def _cached_contents(self, name):
+        """(digest, bytes) of a file's newest version if still cached - misses are read from the store"""
+        with self.last_contents_lock:
+            cached = self.last_contents.get(name)
+            if cached:
+                self.last_contents.move_to_end(name)
+            return cached
+
+    def _remember_contents(self, name, digest, data):
+        """Cache a file's newest contents, evicting the least recently used past BACKUP_BASE_CACHE_BYTES"""
+        with self.last_contents_lock:
+            old = self.last_contents.pop(name, None)
+            if old:
+                self.last_contents_bytes -= len(old[1])
+            if len(data) > BACKUP_BASE_CACHE_BYTES:
+                return
+            self.last_contents[name] = (digest, data)
+            self.last_contents_bytes += len(data)
+            while self.last_contents_bytes > BACKUP_BASE_CACHE_BYTES:
+                _, (_, evicted) = self.last_contents.popitem(last=False)
+                self.last_contents_bytes -= len(evicted)
+
+    def get(self, version_id):
+        rows = self._query(f"SELECT {self.VERSION_COLUMNS} WHERE v.id = ?", (int(version_id),))
+        return self._row_to_version(rows[0]) if rows else None
+
+    def versions(self, name=None):
+        """Versions newest first, for one file name or for all of them"""
+        sql = f"SELECT {self.VERSION_COLUMNS}"
+        params = ()
+        if name is not None:
+            sql += " WHERE v.name = ?"
+            params = (name,)
+        sql += " ORDER BY v.name, v.created_at DESC, v.id DESC"
+        return [self._row_to_version(row) for row in self._query(sql, params)]
+
+    # Typed sort keys for the Backup tab - whitelisted so they can go straight into ORDER BY
+    NAME_SORT_KEYS = {'name': "name", 'date': "latest_at", 'size': "logical_size", 'count': "version_count"}
+    VERSION_SORT_KEYS = {'date': "v.created_at", 'size': "v.size", 'tag': "COALESCE(v.tag, '')"}
+
+    def name_rows(self, order_by='name', reverse=False):
+        """Catalog rows [{'name', 'count', 'size', 'latest_at'}] sorted on a typed column"""
+        column = self.NAME_SORT_KEYS.get(order_by, "name")
+        direction = "DESC" if reverse else "ASC"
+        rows = self._query(f"SELECT name, version_count, logical_size, latest_at FROM name_stats "
+                           f"ORDER BY {column} {direction}, name ASC")
+        return [{'name': name, 'count': count, 'size': size,
+                 'latest_at': datetime.fromisoformat(latest_at) if latest_at else None}
+                for name, count, size, latest_at in rows]
+
+    def versions_page(self, name, offset=0, limit=200, order_by='date', reverse=True):
+        """One page of a file's versions, sorted on a typed column by the index"""
+        column = self.VERSION_SORT_KEYS.get(order_by, "v.created_at")
+        direction = "DESC" if reverse else "ASC"
+        rows = self._query(f"SELECT {self.VERSION_COLUMNS} WHERE v.name = ? "
+                           f"ORDER BY {column} {direction}, v.id {direction} LIMIT ? OFFSET ?",
+                           (name, int(limit), int(offset)))
+        return [self._row_to_version(row) for row in rows]
+
+    def names(self):
+        """[(name, version count, total size)] for every backed-up file, from the catalog"""
+        return self._query("SELECT name, version_count, logical_size FROM name_stats ORDER BY name")
+
+    def read(self, version_id):
+        """Contents of a version as bytes"""
+        version = self.get(version_id)
+        if not version:
+            raise FileNotFoundError(f"Backup version {version_id} not found")
+        return self.read_object(version['digest'])
+
+    def restore(self, version_id, dest_path):
+        """Write a version's contents to dest_path"""
+        data = self.read(version_id)
+        tmp_path = f"{dest_path}.restoretmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, dest_path)
+        return dest_path
+
+    def set_tags(self, tags):
+        """Apply {version_id: tag or None} in one transaction"""
+        if not tags:
+            return
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            cursor.executemany("UPDATE versions SET tag = ? WHERE id = ?",
+                               [(tag, version_id) for version_id, tag in tags.items()])
+            conn.commit()
+            conn.close()
 
-        shutil.copy2(file_path, backup_path)
-        return backup_path
-    except Exception as e:
-        print(f"Backup failed for {file_path}: {e}")
-        return None
+    def delete(self, version_ids):
+        """Remove versions, then any objects neither a version nor a delta chain still needs - returns count removed"""
+        version_ids = [int(v) for v in version_ids]
+        if not version_ids:
+            return 0
+        placeholders = ",".join("?" * len(version_ids))
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT DISTINCT digest FROM versions WHERE id IN ({placeholders})", version_ids)
+            candidates = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"DELETE FROM versions WHERE id IN ({placeholders})", version_ids)
+            removed = cursor.rowcount
+            conn.commit()
+            conn.close()
+        self.collect_garbage(candidates)
+        return removed
 
-def cleanup_old_backups(backup_dir, max_backups=10):
-    """
-    Cleanup tiered backups in subdirectories per YAML file:
-      - Keep last N most recent
-      - Keep first of each day (suffix .daily)
-      - Keep first of each week (suffix .weekly)
-      - Keep first of each month (suffix .monthly)
-      - Keep first of each year (suffix .yearly)
-      - Always keep the oldest backup (suffix .baseline)
-    """
-    tags = {"daily", "weekly", "monthly", "yearly", "baseline"}
+    def collect_garbage(self, candidates=None):
+        """Drop objects unreachable from any version (bases of live deltas stay) - returns count dropped
 
-    try:
-        if not os.path.exists(backup_dir):
+        With candidates only those digests (and the delta bases they release) are checked, so
+        deleting a few versions costs a few indexed lookups; without, the whole store is swept.
+        """
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            if candidates is None:
+                bases = dict(cursor.execute("SELECT digest, base FROM objects").fetchall())
+                live = set()
+                for (digest,) in cursor.execute("SELECT DISTINCT digest FROM versions").fetchall():
+                    while digest and digest not in live:
+                        live.add(digest)
+                        digest = bases.get(digest)
+                dead = [digest for digest in bases if digest not in live]
+            else:
+                dead = []
+                pending = list(candidates)
+                while pending:
+                    digest = pending.pop()
+                    if digest in dead:
+                        continue
+                    if cursor.execute("SELECT 1 FROM versions WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                        continue
+                    if cursor.execute("SELECT 1 FROM objects WHERE base = ? AND digest NOT IN (%s) LIMIT 1"
+                                      % ",".join("?" * (len(dead) + 1)), [digest, digest] + dead).fetchone():
+                        continue
+                    dead.append(digest)
+                    row = cursor.execute("SELECT base FROM objects WHERE digest = ?", (digest,)).fetchone()
+                    if row and row[0]:
+                        pending.append(row[0])  # Its base may now be unreferenced too
+            if self.fts_available:
+                cursor.executemany("DELETE FROM contents_fts WHERE rowid = (SELECT doc_id FROM search_docs WHERE digest = ?)",
+                                   [(digest,) for digest in dead])
+                cursor.executemany("DELETE FROM search_docs WHERE digest = ?", [(digest,) for digest in dead])
+            cursor.executemany("DELETE FROM objects WHERE digest = ?", [(digest,) for digest in dead])
+            conn.commit()
+            conn.close()
+        for digest in dead:
+            try:
+                self.object_path(digest).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Could not remove backup object {digest}: {e}")
+        with self.last_contents_lock:
+            for name, (digest, data) in list(self.last_contents.items()):
+                if digest in dead:
+                    del self.last_contents[name]
+                    self.last_contents_bytes -= len(data)
+        return len(dead)
+
+    def _index_contents(self, digest, data):
+        """Add one object's text to the full-text index"""
+        if not self.fts_available:
             return
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            if not cursor.execute("SELECT 1 FROM search_docs WHERE digest = ?", (digest,)).fetchone():
+                cursor.execute("INSERT INTO contents_fts (content) VALUES (?)", (data.decode('utf-8', errors='replace'),))
+                cursor.execute("INSERT INTO search_docs (digest, doc_id) VALUES (?, ?)", (digest, cursor.lastrowid))
+            conn.commit()
+            conn.close()
 
-        for subdir in os.listdir(backup_dir):
-            subpath = os.path.join(backup_dir, subdir)
-            if not os.path.isdir(subpath):
-                continue
+    def index_pending(self):
+        """Index objects stored before search existed (or missed by a crash) - returns count indexed"""
+        if not self.fts_available:
+            return 0
+        pending = self._query("SELECT digest FROM objects WHERE digest NOT IN (SELECT digest FROM search_docs)")
+        indexed = 0
+        for (digest,) in pending:
+            try:
+                self._index_contents(digest, self.read_object(digest))
+                indexed += 1
+            except (OSError, ValueError) as e:
+                print(f"Could not index backup object {digest}: {e}")
+        return indexed
+
+    @staticmethod
+    def fts_query(text):
+        """Turn free text into an FTS5 query: every word must appear, quoted so punctuation is literal"""
+        terms = [term.replace('"', '""') for term in text.split()]
+        return " ".join(f'"{term}"' for term in terms)
+
+    def search(self, text, name=None, limit=200):
+        """Versions whose contents contain every word of text, newest first - each with a 'snippet'"""
+        if not text.strip():
+            return []
+        name_filter = " AND v.name = ?" if name else ""
+        if self.fts_available:
+            params = [self.fts_query(text)] + ([name] if name else []) + [int(limit)]
+            rows = self._query(
+                f"SELECT {self.VERSION_FIELDS}, snippet(contents_fts, 0, '[', ']', '…', 12) "
+                "FROM contents_fts f JOIN search_docs d ON d.doc_id = f.rowid JOIN versions v ON v.digest = d.digest "
+                "LEFT JOIN objects o ON o.digest = v.digest "
+                f"WHERE contents_fts MATCH ?{name_filter} ORDER BY v.created_at DESC, v.id DESC LIMIT ?", params)
+            results = []
+            for row in rows:
+                version = self._row_to_version(row[:-1])
+                version['snippet'] = " ".join(row[-1].split())
+                results.append(version)
+            return results
+        
+        # No FTS5: decode each distinct content once and match the words case-insensitively
+        words = [word.lower() for word in text.split()]
+        matches = {}
+        results = []
+        for version in (self.versions(name) if name else self.versions()):
+            if version['digest'] not in matches:
+                try:
+                    content = self.read_object(version['digest']).decode('utf-8', errors='replace')
+                except (OSError, ValueError):
+                    content = ""
+                lowered = content.lower()
+                hit = all(word in lowered for word in words)
+                snippet = ""
+                if hit:
+                    line = next((l for l in content.splitlines() if words[0] in l.lower()), "")
+                    snippet = " ".join(line.split())
+                matches[version['digest']] = (hit, snippet)
+            hit, snippet = matches[version['digest']]
+            if hit:
+                results.append(dict(version, snippet=snippet))
+        results.sort(key=lambda v: (v['created_at'], v['id']), reverse=True)
+        return results[:limit]
+
+    def storage_stats(self):
+        """(logical bytes of all versions, bytes actually stored in objects) - read from the catalog"""
+        logical, stored = self._query("SELECT logical_size, stored_size FROM catalog_totals WHERE id = 1")[0]
+        return logical, stored
+
+    def catalog_summary(self):
+        """Catalog totals plus the on-disk size of the index itself"""
+        version_count, logical, object_count, stored = self._query(
+            "SELECT version_count, logical_size, object_count, stored_size FROM catalog_totals WHERE id = 1")[0]
+        try:
+            index_size = os.path.getsize(self.db_file)
+        except OSError:
+            index_size = 0
+        return {
+            'versions': version_count,
+            'files': self._query("SELECT COUNT(*) FROM name_stats")[0][0],
+            'logical_size': logical,
+            'objects': object_count,
+            'stored_size': stored,
+            'disk_size': stored + index_size,
+        }
 
-            backups = []
-            for file in os.listdir(subpath):
-                parts = file.split(".")
-                if len(parts) < 3:
+    def verify_catalog(self, remove_orphans=False):
+        """Re-scan the object files and recount the catalog, fixing index drift - returns a findings dict
+
+        Meant to run in the background: it lists the objects directory once and
+        compares it to the index, so it costs a full walk the Backup tab no longer needs.
+        Files and packs nothing points at are only counted; they are deleted only when
+        remove_orphans is set (an explicit repair).
+        """
+        findings = {'missing_objects': [], 'orphan_files': 0, 'size_fixes': 0, 'totals_fixed': False}
+        on_disk = {}
+        try:
+            for prefix_dir in self.objects_dir.iterdir():
+                if not prefix_dir.is_dir():
+                    continue
+                with os.scandir(prefix_dir) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            st = entry.stat()
+                            on_disk[entry.name] = (entry.path, st.st_size, st.st_mtime)
+        except OSError as e:
+            print(f"Backup catalog scan failed: {e}")
+            return findings
+        
+        with self.lock:
+            conn = sqlite3.connect(self.db_file)
+            cursor = conn.cursor()
+            before = cursor.execute("SELECT version_count, logical_size, object_count, stored_size "
+                                    "FROM catalog_totals WHERE id = 1").fetchone()
+            pack_sizes = {}
+            for digest, stored_size, pack, offset in cursor.execute(
+                    "SELECT digest, stored_size, pack, pack_offset FROM objects").fetchall():
+                if pack is not None:
+                    # A loose copy of a packed object is left over from an interrupted packing run
+                    if pack not in pack_sizes:
+                        try:
+                            pack_sizes[pack] = os.path.getsize(self.pack_path(pack))
+                        except OSError:
+                            pack_sizes[pack] = -1
+                    if offset + stored_size > pack_sizes[pack]:
+                        findings['missing_objects'].append(digest)
                     continue
-                # Handle files that may already have a tag suffix
-                ts_part = parts[-1]
-                if ts_part in tags and len(parts) >= 4:
-                    ts_part = parts[-2]
+                disk = on_disk.pop(digest, None)
+                if disk is None:
+                    findings['missing_objects'].append(digest)
+                elif disk[1] != stored_size:
+                    cursor.execute("UPDATE objects SET stored_size = ? WHERE digest = ?", (disk[1], digest))
+                    findings['size_fixes'] += 1
+            self._rebuild_catalog(cursor)
+            after = cursor.execute("SELECT version_count, logical_size, object_count, stored_size "
+                                   "FROM catalog_totals WHERE id = 1").fetchone()
+            findings['totals_fixed'] = before != after
+            live_packs = {row[0] for row in cursor.execute("SELECT DISTINCT pack FROM objects WHERE pack IS NOT NULL")}
+            conn.commit()
+            conn.close()
+        
+        # Packs no object points at any more (fully collected, or left by an interrupted compaction)
+        if self.packs_dir.exists():
+            for pack_file in self.packs_dir.glob("*.pack"):
                 try:
-                    dt = datetime.strptime(ts_part, "%Y%m%d_%H%M%S")
-                except ValueError:
+                    if pack_file.stem not in live_packs and time.time() - pack_file.stat().st_mtime >= 300:
+                        findings['orphan_files'] += 1
+                        if remove_orphans:
+                            pack_file.unlink()
+                except OSError as e:
+                    print(f"Could not remove orphan backup pack {pack_file.name}: {e}")
+        
+        # Files nothing in the index points at (e.g. a crash between writing a blob and indexing it,
+        # or a .tmp it never renamed). Recent ones may belong to a backup being written right now
+        for name, (path, _, mtime) in on_disk.items():
+            if time.time() - mtime < 300:
+                continue
+            findings['orphan_files'] += 1
+            if remove_orphans:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Could not remove orphan backup object {name}: {e}")
+        return findings
+
+    def export_plain(self, dest_dir, names=None):
+        """Write versions out in the readable <name>/<name>.<timestamp>[.tag] layout - returns files written"""
+        written = 0
+        for backup_version in self.versions():
+            if names is not None and backup_version['name'] not in names:
+                continue
+            folder = os.path.join(dest_dir, backup_version['name'])
+            os.makedirs(folder, exist_ok=True)
+            file_name = backup_version['label'] + (f".{backup_version['tag']}" if backup_version['tag'] else "")
+            dest_path = os.path.join(folder, file_name)
+            try:
+                self.restore(backup_version['id'], dest_path)
+                timestamp = backup_version['created_at'].timestamp()
+                os.utime(dest_path, (timestamp, timestamp))
+                written += 1
+            except (OSError, ValueError) as e:
+                print(f"Could not export {backup_version['label']}: {e}")
+        return written
+
+    def find_legacy_backups(self):
+        """[(created, name, tag, path)] of plain <name>/<name>.<timestamp>[.tag] backups, oldest first"""
+        legacy = []
+        try:
+            for subdir in self.backup_dir.iterdir():
+                if not subdir.is_dir() or subdir.name.startswith('.'):
                     continue
-                backups.append((os.path.join(subpath, file), dt))
+                for backup_file in subdir.iterdir():
+                    parts = backup_file.name.split(".")
+                    if not backup_file.is_file() or len(parts) < 3:
+                        continue
+                    tag = None
+                    ts_part = parts[-1]
+                    if ts_part in BACKUP_TAGS and len(parts) >= 4:
+                        tag, ts_part = ts_part, parts[-2]
+                    try:
+                        created = datetime.strptime(ts_part, BACKUP_TIMESTAMP_FORMAT)
+                    except ValueError:
+                        continue
+                    legacy.append((created, subdir.name, tag, backup_file))
+        except OSError as e:
+            print(f"Could not scan legacy backups: {e}")
+        return sorted(legacy, key=lambda item: item[0])
 
-            if not backups:
-                continue
+    def import_legacy_backups(self, remove_originals=False):
+        """Copy plain backups into the store, oldest first - returns a summary dict
 
-            backups.sort(key=lambda x: x[1], reverse=True)
-            keep = {}
-
-            # Keep rolling N
-            for p, _ in backups[:max_backups]:
-                keep[p] = None
-
-            oldest_first = sorted(backups, key=lambda x: x[1])
-
-            # Daily
-            seen_days = set()
-            for path, dt in oldest_first:
-                day_key = dt.strftime("%Y-%m-%d")
-                if day_key not in seen_days:
-                    seen_days.add(day_key)
-                    keep[path] = "daily"
-
-            # Weekly
-            seen_weeks = set()
-            for path, dt in oldest_first:
-                y, w, _ = dt.isocalendar()
-                week_key = f"{y}-W{w:02d}"
-                if week_key not in seen_weeks:
-                    seen_weeks.add(week_key)
-                    keep[path] = "weekly"
-
-            # Monthly
-            seen_months = set()
-            for path, dt in oldest_first:
-                month_key = dt.strftime("%Y-%m")
-                if month_key not in seen_months:
-                    seen_months.add(month_key)
-                    keep[path] = "monthly"
-
-            # Yearly
-            seen_years = set()
-            for path, dt in oldest_first:
-                year_key = dt.strftime("%Y")
-                if year_key not in seen_years:
-                    seen_years.add(year_key)
-                    keep[path] = "yearly"
-
-            # Oldest baseline
-            keep[oldest_first[0][0]] = "baseline"
-
-            # Delete non-kept
-            for path, _ in backups:
-                if path not in keep:
-                    try:
-                        os.remove(path)
-                    except Exception as e:
-                        print(f"[{subdir}] Failed to delete {os.path.basename(path)}: {e}")
+        Originals stay where they are unless remove_originals, and even then a file is only
+        deleted once its version reads back from the store with the same content. Files
+        already imported (same name, time and content) are skipped, so it can be re-run.
+        """
+        legacy = self.find_legacy_backups()
+        summary = {'found': len(legacy), 'imported': 0, 'skipped': 0, 'removed': 0, 'failed': 0}
+        for created, name, tag, backup_file in legacy:
+            try:
+                with open(backup_file, 'rb') as f:
+                    digest = self.digest_bytes(f.read())
+                existing = self._query("SELECT id FROM versions WHERE name = ? AND created_at = ? AND digest = ? LIMIT 1",
+                                       (name, created.replace(microsecond=0).isoformat(sep=' '), digest))
+                if existing:
+                    version_id = existing[0][0]
+                    summary['skipped'] += 1
+                else:
+                    version = self.add(backup_file, name, created_at=created, tag=tag)
+                    if version['digest'] != digest:
+                        raise ValueError("file changed while it was imported")
+                    version_id = version['id']
+                    summary['imported'] += 1
+                if remove_originals and self.digest_bytes(self.read(version_id)) == digest:
+                    backup_file.unlink()
+                    summary['removed'] += 1
+            except Exception as e:
+                summary['failed'] += 1
+                print(f"Could not import legacy backup {backup_file}: {e}")
+        if remove_originals:
+            for subdir in {backup_file.parent for _, _, _, backup_file in legacy}:
+                try:
+                    subdir.rmdir()  # Only succeeds once the folder is empty
+                except OSError:
+                    pass
+        if summary['imported']:
+            print(f"Imported {summary['imported']} legacy backup(s) into {self.store_dir}")
+        return summary
+
+_backup_stores = {}
+_backup_stores_lock = Lock()
+
+def get_backup_store(backup_dir):
+    """Shared BackupStore per backup directory"""
+    key = os.path.normcase(os.path.abspath(str(backup_dir)))
+    with _backup_stores_lock:
+        store = _backup_stores.get(key)
+        if store is None:
+            store = BackupStore(backup_dir)
+            _backup_stores[key] = store
+        return store
+
+def parse_backup_ref(value):
+    """Version id from a tree FullPath value like 'store:12' (None for folders/other values)"""
+    value = str(value)
+    if value.startswith(BACKUP_REF_PREFIX):
+        try:
+            return int(value[len(BACKUP_REF_PREFIX):])
+        except ValueError:
+            return None
+    return None
+
+def full_backup(file_paths, backup_dir, max_workers=8):
+    """Back up many files at once, storing only those whose content differs from their latest backup
+
+    Files are hashed concurrently through the checksum cache and compared with the store's
+    latest digests in one query; only changed files are read and stored. Returns a summary
+    dict with the backed-up names, counts and throughput.
+    """
+    start = time.perf_counter()
+    store = get_backup_store(backup_dir)
+    summary = {'backed_up': [], 'unchanged': 0, 'failed': [], 'skipped_duplicates': [], 'scanned': 0,
+               'hashed_bytes': 0, 'stored_bytes': 0}
+    
+    # The store keys versions by file name - the first path wins if two folders share one
+    by_name = {}
+    for path in sorted(file_paths, key=lambda p: (len(Path(p).parts), str(p))):
+        name = os.path.basename(path)
+        if name in by_name:
+            summary['skipped_duplicates'].append(str(path))
+        else:
+            by_name[name] = path
+    summary['scanned'] = len(by_name)
+    
+    digests = checksum_service.checksum_many(by_name.values(), max_workers)
+    latest = store.latest_digests()
+    changed = []
+    for name, path in by_name.items():
+        digest = digests.get(path)
+        try:
+            summary['hashed_bytes'] += os.path.getsize(path)
+        except OSError:
+            pass
+        if digest is None:
+            summary['failed'].append(name)
+        elif latest.get(name) == digest:
+            summary['unchanged'] += 1
+        else:
+            changed.append((name, path))
+    
+    if changed:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(changed))) as pool:
+            futures = {pool.submit(store.add, path, name): name for name, path in changed}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    version = future.result()
+                except Exception as e:
+                    print(f"Full backup failed for {name}: {e}")
+                    summary['failed'].append(name)
+                    continue
+                if version.get('unchanged'):
+                    summary['unchanged'] += 1
+                else:
+                    summary['backed_up'].append(name)
+                    summary['stored_bytes'] += version['size']
+    
+    elapsed = time.perf_counter() - start
+    summary['elapsed'] = elapsed
+    summary['files_per_sec'] = summary['scanned'] / elapsed if elapsed > 0 else 0.0
+    summary['mb_per_sec'] = summary['hashed_bytes'] / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    return summary
+
+def create_backup(file_path, backup_dir, original_name=None):
+    """Record a backup of a YAML file in the backup store - returns its version label"""
+    try:
+        if original_name is None:
+            original_name = os.path.basename(file_path)
+
+        version = get_backup_store(backup_dir).add(file_path, original_name)
+        return version['label']  # e.g. light.yaml.20251002_093344
+    except Exception as e:
+        print(f"Backup failed for {file_path}: {e}")
+        return None
 
-            # Rename kept anchors with suffix (strip old tags first)
-            for path, tag in keep.items():
-                if not tag:
-                    continue
-                dirname, fname = os.path.split(path)
+def plan_backup_retention(versions, max_backups=10):
+    """Single pass over one file's versions - returns ({version_id: tag or None} to keep, [ids to delete])
 
-                # Remove any old tag suffix
-                for t in tags:
-                    if fname.endswith(f".{t}"):
-                        fname = fname[:-(len(t) + 1)]
+    Keeps the newest max_backups plus the first version of each day/week/month/year
+    (tagged with the coarsest tier it opens) and always the oldest (baseline).
+    """
+    oldest_first = sorted(versions, key=lambda v: (v['created_at'], v['id']))
+    newest_ids = {v['id'] for v in oldest_first[-max_backups:]} if max_backups > 0 else set()
+    seen_day = seen_week = seen_month = seen_year = None
+    keep = {}
+    delete = []
+    for index, backup_version in enumerate(oldest_first):
+        dt = backup_version['created_at']
+        day_key = dt.date()
+        week_key = dt.isocalendar()[:2]
+        month_key = (dt.year, dt.month)
+        tag = None
+        # Versions are visited oldest first, so a key change means this is the first of that bucket
+        if day_key != seen_day:
+            seen_day, tag = day_key, "daily"
+        if week_key != seen_week:
+            seen_week, tag = week_key, "weekly"
+        if month_key != seen_month:
+            seen_month, tag = month_key, "monthly"
+        if dt.year != seen_year:
+            seen_year, tag = dt.year, "yearly"
+        if index == 0:
+            tag = "baseline"
+        
+        if tag or backup_version['id'] in newest_ids:
+            keep[backup_version['id']] = tag
+        else:
+            delete.append(backup_version['id'])
+    return keep, delete
 
-                new_name = f"{fname}.{tag}"
-                new_path = os.path.join(dirname, new_name)
+def cleanup_old_backups(backup_dir, max_backups=10, names=None):
+    """
+    Cleanup tiered backups per YAML file in the backup store:
+      - Keep last N most recent
+      - Keep first of each day (tag daily)
+      - Keep first of each week (tag weekly)
+      - Keep first of each month (tag monthly)
+      - Keep first of each year (tag yearly)
+      - Always keep the oldest backup (tag baseline)
+    names limits the work to the files that just changed; tags live in the
+    version index and only changed tags are written.
+    """
+    try:
+        if not os.path.exists(backup_dir):
+            return
 
-                if new_path != path:  # only rename if different
-                    try:
-                        os.rename(path, new_path)
-                    except Exception as e:
-                        print(f"[{subdir}] Failed to rename {os.path.basename(path)}: {e}")
+        store = get_backup_store(backup_dir)
+        if names is None:
+            names = [name for name, _, _ in store.names()]
+        for name in names:
+            versions = store.versions(name)
+            if not versions:
+                continue
+            keep, delete = plan_backup_retention(versions, max_backups)
+            tag_changes = {v['id']: keep[v['id']] for v in versions if v['id'] in keep and v['tag'] != keep[v['id']]}
+            if delete:
+                store.delete(delete)
+            store.set_tags(tag_changes)
 
     except Exception as e:
         print(f"Backup cleanup failed: {e}")
 
 def get_file_checksum(file_path):
-    """Calculate MD5 checksum of a file"""
-    try:
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    except Exception:
-        return None
+    """Calculate checksum of a file (cached BLAKE2 digest from the checksum service)"""
+    return checksum_service.checksum(file_path)
 
 def is_ota_device_available(ip, port=3232, timeout=2):
     try:
@@ -1087,18 +3252,716 @@ def is_ota_device_available(ip, port=3232, timeout=2):
     except Exception:
         return False
     
-def get_device_info_with_progress(yaml_path, ip, progress_callback, max_wait=20):
-    """Get device info using the reliable log parsing method"""
+# NEW - ESPHome native API (plaintext framing: 0x00, varint length, varint message type, protobuf)
+ESPHOME_API_PORT = 6053
+API_HELLO_REQUEST = 1
+API_HELLO_RESPONSE = 2
+API_CONNECT_REQUEST = 3
+API_CONNECT_RESPONSE = 4
+API_DISCONNECT_REQUEST = 5
+API_DISCONNECT_RESPONSE = 6
+API_PING_REQUEST = 7
+API_PING_RESPONSE = 8
+API_DEVICE_INFO_REQUEST = 9
+API_DEVICE_INFO_RESPONSE = 10
+# DeviceInfoResponse field numbers we read
+API_DEVICE_INFO_FIELDS = {
+    1: 'uses_password', 2: 'name', 3: 'mac_address', 4: 'esphome_version', 5: 'compilation_time',
+    6: 'model', 8: 'project_name', 9: 'project_version', 12: 'manufacturer', 13: 'friendly_name',
+}
+
+class ESPHomeAPIError(Exception):
+    """The device refused or broke the native API conversation"""
+
+def encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def decode_varint(data, pos=0):
+    """(value, next position) of the varint at data[pos]"""
+    result = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("Varint too long")
+
+def encode_proto(fields):
+    """Protobuf bytes for [(field number, value)] - str/bytes length-delimited, int/bool as varints"""
+    out = bytearray()
+    for number, value in fields:
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if isinstance(value, (bytes, bytearray)):
+            out += encode_varint(number << 3 | 2) + encode_varint(len(value)) + value
+        else:
+            out += encode_varint(number << 3) + encode_varint(int(value))
+    return bytes(out)
+
+def decode_proto(data):
+    """{field number: value} - varints as int, length-delimited as bytes, fixed-width fields skipped"""
+    fields = {}
+    pos = 0
+    while pos < len(data):
+        key, pos = decode_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            fields[number], pos = decode_varint(data, pos)
+        elif wire_type == 2:
+            length, pos = decode_varint(data, pos)
+            if pos + length > len(data):
+                raise ValueError("Truncated field")
+            fields[number] = bytes(data[pos:pos + length])
+            pos += length
+        elif wire_type in (1, 5):
+            pos += 8 if wire_type == 1 else 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+    return fields
+
+def api_frame(msg_type, payload=b""):
+    return b"\x00" + encode_varint(len(payload)) + encode_varint(msg_type) + payload
+
+async def read_api_frame(reader):
+    """(message type, payload) of the next plaintext frame"""
+    preamble = await reader.readexactly(1)
+    if preamble != b"\x00":
+        if preamble == b"\x01":
+            raise ESPHomeAPIError("Device requires API encryption")
+        raise ESPHomeAPIError(f"Unexpected frame preamble {preamble!r}")
+    
+    async def read_varint():
+        raw = bytearray()
+        while True:
+            raw += await reader.readexactly(1)
+            if not raw[-1] & 0x80:
+                return decode_varint(raw)[0]
+            if len(raw) > 9:
+                raise ESPHomeAPIError("Malformed frame header")
+    
+    length = await read_varint()
+    msg_type = await read_varint()
+    payload = await reader.readexactly(length) if length else b""
+    return msg_type, payload
+
+class ESPHomeAPIClient:
+    """Minimal asyncio client for the ESPHome native API: hello, connect and device info"""
+    def __init__(self, host, port=ESPHOME_API_PORT, password="", timeout=5.0, client_info="ESPHome Studio"):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.client_info = client_info
+        self.reader = None
+        self.writer = None
+        self.server_info = ""
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        hello = await self.request(API_HELLO_REQUEST,
+                                   encode_proto([(1, self.client_info), (2, 1), (3, 10)]), API_HELLO_RESPONSE)
+        self.server_info = hello.get(3, b"").decode('utf-8', errors='replace')
+        response = await self.request(API_CONNECT_REQUEST,
+                                      encode_proto([(1, self.password)]) if self.password else b"",
+                                      API_CONNECT_RESPONSE)
+        if response.get(1):
+            raise ESPHomeAPIError("Invalid API password")
+
+    async def request(self, msg_type, payload, response_type):
+        """Send one message and return the decoded fields of the expected reply"""
+        self.writer.write(api_frame(msg_type, payload))
+        await self.writer.drain()
+        return await asyncio.wait_for(self._wait_for(response_type), self.timeout)
+
+    async def _wait_for(self, response_type):
+        while True:
+            msg_type, payload = await read_api_frame(self.reader)
+            if msg_type == response_type:
+                return decode_proto(payload)
+            if msg_type == API_PING_REQUEST:
+                self.writer.write(api_frame(API_PING_RESPONSE))
+            elif msg_type == API_DISCONNECT_REQUEST:
+                self.writer.write(api_frame(API_DISCONNECT_RESPONSE))
+                raise ESPHomeAPIError("Device closed the API connection")
+            # Anything else (time requests, state pushes) is not for us
+
+    async def device_info(self):
+        """{name, mac_address, esphome_version, compilation_time, model, ...} as strings/bools"""
+        fields = await self.request(API_DEVICE_INFO_REQUEST, b"", API_DEVICE_INFO_RESPONSE)
+        info = {}
+        for number, key in API_DEVICE_INFO_FIELDS.items():
+            value = fields.get(number)
+            if isinstance(value, bytes):
+                info[key] = value.decode('utf-8', errors='replace')
+            elif key == 'uses_password':
+                info[key] = bool(value)
+            else:
+                info[key] = ""
+        return info
+
+    async def close(self):
+        if not self.writer:
+            return
+        try:
+            self.writer.write(api_frame(API_DISCONNECT_REQUEST))
+            await asyncio.wait_for(self.writer.drain(), 1.0)
+            self.writer.close()
+            await asyncio.wait_for(self.writer.wait_closed(), 1.0)
+        except (OSError, asyncio.TimeoutError):
+            pass
+        self.writer = None
+
+def fetch_device_info_api(host, port=ESPHOME_API_PORT, password="", timeout=3.0):
+    """Blocking: device info over the native API, or raise (ESPHomeAPIError, OSError, timeouts)"""
+    async def run():
+        async with ESPHomeAPIClient(host, port, password, timeout) as client:
+            return await client.device_info()
+    return asyncio.run(asyncio.wait_for(run(), timeout * 2))
+
+def read_api_settings(yaml_path):
+    """Port, password and encryption of a config's api: block - a line scan, no YAML parser needed"""
+    settings = {'port': ESPHOME_API_PORT, 'password': "", 'encrypted': False}
+    try:
+        with open(yaml_path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return settings
+    in_api = False
+    api_indent = None
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        indent = len(line) - len(line.lstrip())
+        if indent == 0:
+            in_api = line.startswith('api:')
+            continue
+        if not in_api:
+            continue
+        api_indent = indent if api_indent is None else api_indent
+        if indent != api_indent:
+            continue  # Nested keys, e.g. encryption: key:
+        key, _, value = line.strip().partition(':')
+        value = value.strip().strip('"\'')
+        if key == 'port' and value.isdigit():
+            settings['port'] = int(value)
+        elif key == 'encryption':
+            settings['encrypted'] = True
+        elif key == 'password':
+            settings['password'] = resolve_yaml_secret(yaml_path, value)
+    return settings
+
+def resolve_yaml_secret(yaml_path, value):
+    """Look up '!secret name' in the secrets.yaml next to the config; other values pass through"""
+    if not value.startswith('!secret'):
+        return value
+    name = value[len('!secret'):].strip()
+    try:
+        with open(os.path.join(os.path.dirname(yaml_path), "secrets.yaml"), 'r', encoding='utf-8') as f:
+            for line in f:
+                key, _, secret = line.partition(':')
+                if key.strip() == name:
+                    return secret.split(' #')[0].strip().strip('"\'')
+    except OSError:
+        pass
+    return ""
+
+def device_info_from_api(info):
+    """Native API device info in the GUI's device_info shape (fields the API lacks are 'N/A')"""
+    return {
+        'firmware_version': info.get('esphome_version') or 'N/A',
+        'host_name': info.get('name') or 'N/A',
+        'wifi_ssid': 'N/A',
+        'local_mac': info.get('mac_address') or 'N/A',
+        'wifi_signal': 'N/A',
+        'chip': info.get('model') or 'N/A',
+        'frequency': 'N/A',
+        'framework': 'N/A',
+        'psram_size': 'N/A',
+        'flash_size': 'N/A',
+        'compile_time': info.get('compilation_time') or 'N/A',
+    }
+
+# NEW - Subnet sweep for devices that don't advertise over mDNS
+SWEEP_PORTS = (3232, 8266, ESPHOME_API_PORT)  # ESP32 OTA, ESP8266 OTA, native API
+SWEEP_MAX_HOSTS = 65536
+OTA_MAGIC = bytes([0x6C, 0x26, 0xF7, 0x5C, 0x45])  # First bytes of an ESPHome OTA session
+OTA_RESPONSE_OK = 0x00
+OTA_VERSIONS = (1, 2)
+
+def sweep_targets(networks):
+    """Host addresses for a comma/space separated list of IPv4 CIDRs or single addresses"""
+    hosts = []
+    seen = set()
+    for spec in re.split(r'[,\s]+', networks.strip()):
+        if not spec:
+            continue
+        network = ipaddress.ip_network(spec, strict=False)
+        if network.version != 4:
+            raise ValueError(f"Only IPv4 networks can be swept: {spec}")
+        if network.num_addresses > SWEEP_MAX_HOSTS:
+            raise ValueError(f"{spec} has {network.num_addresses} addresses - sweep at most a /16 at a time")
+        for address in list(network.hosts()) or [network.network_address]:
+            address = str(address)
+            if address not in seen:
+                seen.add(address)
+                hosts.append(address)
+    return hosts
+
+def local_subnet():
+    """The /24 around this machine's LAN address, e.g. '192.168.1.0/24' ('' if unknown)"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(("8.8.8.8", 80))  # UDP connect only picks a route, nothing is sent
+            address = sock.getsockname()[0]
+        return str(ipaddress.ip_network(f"{address}/24", strict=False))
+    except OSError:
+        return ""
+
+async def probe_port(host, port, timeout):
+    """True when a TCP connection to host:port succeeds within timeout"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await asyncio.wait_for(writer.wait_closed(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        pass
+    return True
+
+async def api_hello(host, port=ESPHOME_API_PORT, timeout=2.0):
+    """{'name', 'version'} from an API hello - no password needed; None if the device won't say"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write(api_frame(API_HELLO_REQUEST, encode_proto([(1, "ESPHome Studio"), (2, 1), (3, 10)])))
+        await writer.drain()
+        msg_type, payload = await asyncio.wait_for(read_api_frame(reader), timeout)
+        if msg_type != API_HELLO_RESPONSE:
+            return None
+        fields = decode_proto(payload)
+        server_info = fields.get(3, b"").decode('utf-8', errors='replace')  # "kitchen (ESPHome v2024.6.1)"
+        name = fields.get(4, b"").decode('utf-8', errors='replace') or server_info.split(' (')[0]
+        version_match = re.search(r'ESPHome v?(\S+?)\)?$', server_info)
+        return {'name': name, 'version': version_match.group(1) if version_match else ""}
+    except (ESPHomeAPIError, ValueError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        return None
+    finally:
+        writer.close()
+
+async def ota_handshake(host, port, timeout=2.0):
+    """OTA protocol version from the start of an ESPHome OTA session, None if host doesn't speak it
+
+    Only the magic bytes are sent; closing right after the device's OK ends the session
+    before anything is flashed.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write(OTA_MAGIC)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.readexactly(2), timeout)
+        if response[0] == OTA_RESPONSE_OK and response[1] in OTA_VERSIONS:
+            return response[1]
+        return None
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        return None
+    finally:
+        writer.close()
+
+async def sweep_hosts(hosts, ports=SWEEP_PORTS, timeout=0.5, max_in_flight=256, found_callback=None,
+                      progress_callback=None, stop_event=None):
+    """Probe ports on every host with at most max_in_flight connection attempts open at once
+
+    Returns [(ip, open_ports, hello)] for hosts with any port open. hello is the device's
+    answer - api_hello's dict, or {'name': '', 'version': '', 'ota_version': n} from an OTA
+    handshake - and None when nothing answered like ESPHome (some other service on the port).
+    Callbacks run on the event loop thread.
+    """
+    pending = iter(hosts)  # Shared by the workers - each host is taken exactly once
+    found = []
+    checked = 0
+
+    async def worker():
+        nonlocal checked
+        for host in pending:
+            if stop_event and stop_event.is_set():
+                return
+            results = await asyncio.gather(*(probe_port(host, port, timeout) for port in ports))
+            open_ports = [port for port, is_open in zip(ports, results) if is_open]
+            if open_ports:
+                hello = await api_hello(host, timeout=max(timeout, 2.0)) if ESPHOME_API_PORT in open_ports else None
+                for port in open_ports:
+                    if hello or port == ESPHOME_API_PORT:
+                        continue
+                    ota_version = await ota_handshake(host, port, timeout=max(timeout, 2.0))
+                    if ota_version:
+                        hello = {'name': "", 'version': "", 'ota_version': ota_version}
+                found.append((host, open_ports, hello))
+                if found_callback:
+                    found_callback(host, open_ports, hello)
+            checked += 1
+            if progress_callback:
+                progress_callback(checked, len(hosts))
+
+    workers = max(1, min(len(hosts), max_in_flight // max(1, len(ports))))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return found
+
+def sweep_subnet(networks, registry=None, ports=SWEEP_PORTS, timeout=0.5, max_in_flight=256,
+                 found_callback=None, progress_callback=None, stop_event=None):
+    """Blocking sweep of the given CIDR(s); verified hits are merged into registry with source 'sweep'
+
+    Only hosts that answered the API hello or an OTA handshake are registered - an open port
+    alone is reported to found_callback but not recorded. A host the registry already knows
+    by address keeps its name; otherwise the API hello name is used, falling back to the address.
+    """
+    hosts = sweep_targets(networks)
+
+    def on_found(host, open_ports, hello):
+        if registry is not None and hello:
+            name = (hello or {}).get('name') or registry.name_for_address(host) or host
+            txt = {'version': hello['version']} if hello and hello.get('version') else None
+            port = ESPHOME_API_PORT if ESPHOME_API_PORT in open_ports else None
+            registry.update(name, [host], txt, port, source="sweep")
+        if found_callback:
+            found_callback(host, open_ports, hello)
+
+    return asyncio.run(sweep_hosts(hosts, ports, timeout, max_in_flight, on_found, progress_callback, stop_event))
+
+# NEW - Device info freshness
+DEVICE_INFO_TTL_HOURS = 24
+# Hardware facts change only with the hardware, so they may be this many TTLs old
+DEVICE_INFO_STATIC_FIELDS = ('chip', 'frequency', 'framework', 'psram_size', 'flash_size')
+DEVICE_INFO_STATIC_TTL_FACTOR = 30
+DEVICE_INFO_KEY_FIELDS = ('firmware_version', 'host_name', 'local_mac')
+DEVICE_INFO_PLACEHOLDERS = ('N/A', 'Error', 'Refreshing...', 'Checking...', '')
+DEVICE_INFO_HARDWARE_EXPIRED = "hardware details expired"  # Only the logs report these, so skip the API
+
+def merge_device_info(entry, device_info, now):
+    """Store entry for a new reading over the previous entry, with per-field timestamps
+
+    Fields the reading has a value for are stamped now. Fields it lacks (e.g. the SSID when
+    the native API answered) keep their stored value and timestamp - unless the MAC shows
+    it is a different device.
+    """
+    entry = entry or {}
+    old_info = entry.get('device_info') or {}
+    old_updated = entry.get('field_updated') or {}
+    legacy_stamp = entry.get('last_updated')
+    same_device = (old_info.get('local_mac') in DEVICE_INFO_PLACEHOLDERS + (None,) or
+                   device_info.get('local_mac') in DEVICE_INFO_PLACEHOLDERS + (None,) or
+                   old_info.get('local_mac') == device_info.get('local_mac'))
+    stamp = now.isoformat()
+    merged, updated = {}, {}
+    fields = list(device_info) + [field for field in old_info if field not in device_info and same_device]
+    for field in fields:
+        value = device_info.get(field, 'N/A')
+        if value not in DEVICE_INFO_PLACEHOLDERS:
+            merged[field], updated[field] = value, stamp
+        elif same_device and old_info.get(field) not in DEVICE_INFO_PLACEHOLDERS + (None,):
+            merged[field] = old_info[field]
+            if old_updated.get(field, legacy_stamp):
+                updated[field] = old_updated.get(field, legacy_stamp)
+        else:
+            merged[field] = value
+    return {'device_info': merged, 'last_updated': stamp, 'field_updated': updated}
+
+def device_info_age(entry, fields=DEVICE_INFO_KEY_FIELDS, now=None):
+    """Seconds since the oldest of fields was read (entries from before per-field stamps use last_updated)"""
+    now = now or datetime.now()
+    updated = entry.get('field_updated') or {}
+    ages = []
+    for field in fields:
+        stamp = updated.get(field, entry.get('last_updated'))
+        try:
+            ages.append((now - datetime.fromisoformat(stamp)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    return max(ages) if ages else None
+
+def device_info_staleness(entry, ttl_seconds, last_upload=None, now=None):
+    """Why a stored device info entry should be revalidated - '' while it is fresh"""
+    now = now or datetime.now()
+    info = entry.get('device_info') or {}
+    if any(info.get(field) in DEVICE_INFO_PLACEHOLDERS + (None,) for field in DEVICE_INFO_KEY_FIELDS):
+        return "incomplete"
+    age = device_info_age(entry, now=now)
+    if age is None:
+        return "no timestamp"
+    if age > ttl_seconds:
+        return f"{format_age(age)} old"
+    static_fields = [field for field in DEVICE_INFO_STATIC_FIELDS if field in (entry.get('field_updated') or {})]
+    static_age = device_info_age(entry, static_fields, now) if static_fields else None
+    if static_age is not None and static_age > ttl_seconds * DEVICE_INFO_STATIC_TTL_FACTOR:
+        return DEVICE_INFO_HARDWARE_EXPIRED
+    
+    # An upload after the firmware version was read means the device now runs something newer
+    if last_upload:
+        upload_version = last_upload.get('version', 'N/A')
+        if upload_version not in DEVICE_INFO_PLACEHOLDERS and upload_version != info.get('firmware_version'):
+            return f"last upload used {upload_version}"
+        try:
+            uploaded = datetime.strptime(last_upload.get('timestamp', ''), "%Y-%m-%d %H:%M:%S")
+            firmware_read = datetime.fromisoformat(
+                (entry.get('field_updated') or {}).get('firmware_version', entry.get('last_updated')))
+            if uploaded > firmware_read:
+                return "uploaded since last read"
+        except (TypeError, ValueError):
+            pass
+    return ""
+
+def format_age(seconds):
+    """Compact age like 45s, 12m, 3h or 2d"""
+    if seconds is None:
+        return "unknown"
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.0f}{unit}"
+    return f"{max(seconds, 0):.0f}s"
+
+class DeviceLogParser:
+    """Streaming classifier for `esphome logs` boot output: feed lines, then read result()
+
+    Patterns are compiled once and each is guarded by a cheap substring - the log tag such as
+    "[D][debug:" for the debug component - so most lines cost a few `in` checks. A field
+    leaves the active set as soon as it is found (first match wins, as before).
+    """
+    ESSENTIAL_FIELDS = ('firmware_version', 'host_name', 'wifi_ssid', 'local_mac',
+                        'chip', 'frequency', 'framework', 'partition_table')
+    RESULT_FIELDS = ('firmware_version', 'host_name', 'wifi_ssid', 'local_mac', 'wifi_signal',
+                     'chip', 'frequency', 'framework', 'psram_size', 'flash_size')
+    # Dispatch key -> {field: compiled pattern}; a None pattern means the key itself is the marker
+    FIELD_PATTERNS = {
+        'ESPHome version': {'firmware_version': re.compile(r'ESPHome version *?([\d\.]+)')},
+        'Hostname:': {'host_name': re.compile(r"Hostname:\s*'([^']+)'")},
+        'SSID:': {'wifi_ssid': re.compile(r"SSID:\s*'([^']+)'")},
+        'Local MAC:': {'local_mac': re.compile(r"Local MAC:\s*([0-9A-Fa-f:]{17})")},
+        'Signal strength:': {'wifi_signal': re.compile(r"Signal strength:\s*(-?\d+)\s*dB")},
+        '[D][debug:': {
+            'chip': re.compile(r'\[D\]\[debug:\d+\]: Chip:\s*Model=([^,]+)'),
+            'frequency': re.compile(r'\[D\]\[debug:\d+\]: CPU Frequency:\s*(\d+)\s*MHz'),
+            'framework': re.compile(r'\[D\]\[debug:\d+\]: Framework:\s*([^\s,]+)'),
+        },
+        '[C][psram:': {'psram_size': re.compile(r'\[C\]\[psram:\d+\]:\s*Size:\s*(\d+)\s*KB')},
+        'Partition table:': {'partition_table': None},
+        'Flash Chip:': {'flash_size': re.compile(r'Size=(\d+kB)')},
+    }
+    PARTITION_PATTERN = re.compile(r'\b(\w+)\s+\d+\s+\d+\s+0x[0-9A-Fa-f]+\s+0x([0-9A-Fa-f]+)')
+    COMMON_FLASH_SIZES = {4194304: "4.0 MB", 8388608: "8.0 MB", 16777216: "16.0 MB", 33554432: "32.0 MB"}
+
+    def __init__(self):
+        self.active = {key: dict(fields) for key, fields in self.FIELD_PATTERNS.items()}
+        self.values = {}
+        self.found = set()
+        self.partition_sizes = []
+        self.line_count = 0
+
+    def feed(self, line):
+        """Classify one line - returns the fields it completed"""
+        self.line_count += 1
+        found_now = []
+        for key, fields in list(self.active.items()):
+            if key not in line:
+                continue
+            for name, pattern in list(fields.items()):
+                if pattern is None:
+                    value = True
+                else:
+                    match = pattern.search(line)
+                    if not match:
+                        continue
+                    value = self._convert(name, match.group(1))
+                self.values[name] = value
+                self.found.add(name)
+                found_now.append(name)
+                del fields[name]
+            if not fields:
+                del self.active[key]
+        
+        # Partition rows repeat, so this one stays active
+        if '0x' in line:
+            match = self.PARTITION_PATTERN.search(line)
+            if match:
+                self.partition_sizes.append(int(match.group(2), 16))
+        return found_now
+
+    @staticmethod
+    def _convert(name, raw):
+        if name == 'psram_size':
+            psram_kb = int(raw)
+            return f"{psram_kb / 1024:.1f} MB" if psram_kb >= 1024 else f"{psram_kb} KB"
+        if name == 'flash_size':
+            return f"{int(raw.replace('kB', '')) / 1024:.1f} MB"
+        return raw
+
+    def has_essentials(self):
+        return all(name in self.found for name in self.ESSENTIAL_FIELDS)
+
+    def flash_size(self):
+        """Reported flash size, else the nearest common size to the partition total"""
+        if 'flash_size' in self.values:
+            return self.values['flash_size']
+        if not self.partition_sizes:
+            return "N/A"
+        total_bytes = sum(self.partition_sizes)
+        closest_size = min(self.COMMON_FLASH_SIZES, key=lambda size: abs(size - total_bytes))
+        if abs(total_bytes - closest_size) / closest_size < 0.55:
+            return self.COMMON_FLASH_SIZES[closest_size]
+        if total_bytes >= 1024 * 1024:
+            return f"{total_bytes / (1024 * 1024):.1f} MB"
+        return f"{total_bytes / 1024:.0f} KB"
+
+    def result(self):
+        """Collected info in the GUI's device_info shape ('N/A' for anything not seen)"""
+        result = {name: self.values.get(name, 'N/A') for name in self.RESULT_FIELDS}
+        result['flash_size'] = self.flash_size()
+        return result
+
+def refresh_devices(targets, device_callback=None, max_parallel=8, stop_event=None):
+    """Collect device info for many (yaml_path, ip, previous_info) targets at once
+
+    At most max_parallel collections run together; device_callback(yaml_path, percent, status)
+    reports each one's progress. Targets not yet started when stop_event is set are skipped.
+    Returns {yaml_path: device_info or None}.
+    """
+    results = {}
+    if not targets:
+        return results
+    
+    def collect(yaml_path, ip, _previous):
+        if stop_event is not None and stop_event.is_set():
+            if device_callback:
+                device_callback(yaml_path, 0, "Skipped")
+            return None
+        
+        def progress(percent, status):
+            if device_callback:
+                device_callback(yaml_path, percent, status)
+        return get_device_info_with_progress(yaml_path, ip, progress)
+    
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(targets))) as pool:
+        futures = {pool.submit(collect, *target): target[0] for target in targets}
+        for future in as_completed(futures):
+            yaml_path = futures[future]
+            try:
+                results[yaml_path] = future.result()
+            except Exception as e:
+                print(f"Device refresh failed for {yaml_path}: {e}")
+                results[yaml_path] = None
+            if device_callback:
+                device_callback(yaml_path, 100, "Done" if results[yaml_path] else
+                                ("Skipped" if stop_event is not None and stop_event.is_set() else "Failed"))
+    return results
+
+def benchmark_log_parser(log_paths, repeat=20):
+    """Time DeviceLogParser against per-line re.search of every pattern on recorded boot logs"""
+    lines = []
+    for log_path in log_paths:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            lines.extend(line.rstrip() for line in f)
+    if not lines:
+        print("No log lines to benchmark")
+        return None
+    
+    legacy_patterns = [pattern.pattern for fields in DeviceLogParser.FIELD_PATTERNS.values()
+                       for pattern in fields.values() if pattern is not None]
+    partition_pattern = DeviceLogParser.PARTITION_PATTERN.pattern
+    
+    def legacy():
+        # What the capture loop used to do: every pattern, every line, found or not
+        for line in lines:
+            re.search(partition_pattern, line)
+            for pattern in legacy_patterns:
+                re.search(pattern, line)
+    
+    def streaming():
+        parser = DeviceLogParser()
+        for line in lines:
+            parser.feed(line)
+        return parser.result()
+    
+    timings = {}
+    for label, func in (("legacy", legacy), ("streaming", streaming)):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        timings[label] = best
+    
+    result = streaming()
+    print(f"{len(lines)} lines from {len(log_paths)} log(s), best of {repeat}:")
+    for label, elapsed in timings.items():
+        print(f"  {label:<10} {elapsed * 1000:8.2f} ms  ({len(lines) / elapsed:,.0f} lines/s)")
+    print(f"  speedup    {timings['legacy'] / timings['streaming']:.1f}x")
+    print(f"  parsed     {result}")
+    return timings
+
+def pump_process_output(stream, line_queue):
+    """Reader thread body: forward every line of stream to line_queue, then None at EOF"""
+    try:
+        for line in iter(stream.readline, ''):
+            line_queue.put(line)
+    except (OSError, ValueError):
+        pass  # Pipe closed underneath us
+    finally:
+        line_queue.put(None)
+
+def get_device_info_with_progress(yaml_path, ip, progress_callback, max_wait=20, idle_timeout=3.0, use_api=True):
+    """Get device info over the native API, falling back to the reliable log parsing method
+
+    The API does not report Wi-Fi or hardware details; those come back as 'N/A' and the store
+    keeps their earlier values. Log parsing stops at EOF, after idle_timeout seconds without
+    output once the essentials are in, or at max_wait overall.
+    """
+    if use_api:
+        api_settings = read_api_settings(yaml_path)
+        if api_settings['encrypted']:
+            print("DEBUG: API encryption configured, using log parsing")
+        else:
+            progress_callback(5, "Querying native API...")
+            try:
+                start = time.perf_counter()
+                info = fetch_device_info_api(ip, api_settings['port'], api_settings['password'])
+                result = device_info_from_api(info)
+                progress_callback(100, f"Complete! (native API, {time.perf_counter() - start:.2f}s)")
+                return result
+            except (ESPHomeAPIError, OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                print(f"DEBUG: Native API failed ({e or type(e).__name__}), falling back to log parsing")
+    
     cmd = ["esphome", "logs", yaml_path, "--device", ip]
     
     print(f"DEBUG: Starting device info collection")
     
+    proc = None
     try:
-        import os
-        # === NEW IMPORTS ===
-        import threading
-        # === END NEW IMPORTS ===
-        
         env = os.environ.copy()
         env['PYTHONIOENCODING'] = 'utf-8'
         
@@ -1113,44 +3976,14 @@ def get_device_info_with_progress(yaml_path, ip, progress_callback, max_wait=20)
             env=env,
             encoding='utf-8',
             errors='replace',
-            bufsize=0,  # Line buffered
-            creationflags=subprocess.HIGH_PRIORITY_CLASS
+            bufsize=1,  # Line buffered
+            creationflags=getattr(subprocess, 'HIGH_PRIORITY_CLASS', 0)  # Windows only
         )
 
         print(f"DEBUG: Subprocess started with PID: {proc.pid}")
         
         start_time = time.time()
-        line_count = 0
-        
-        found_info = {
-            'firmware_version': False,
-            'host_name': False, 
-            'wifi_ssid': False,
-            'local_mac': False,
-            'wifi_signal': False,
-            'chip': False,
-            'frequency': False,
-            'framework': False,
-            'psram': False,
-            'partition_table': False,
-            'got_partition_data': False,
-        }
-        
-        patterns = {
-            'firmware_version': r'ESPHome version *?([\d\.]+)',   #'firmware_version': r'ESPHome version ([\d\.]+)',
-            'host_name': r"Hostname:\s*'([^']+)'", 
-            'wifi_ssid': r"SSID:\s*'([^']+)'",
-            'local_mac': r"Local MAC:\s*([0-9A-Fa-f:]{17})",
-            'wifi_signal': r"Signal strength:\s*(-?\d+)\s*dB",
-            'chip': r'\[D\]\[debug:\d+\]: Chip:\s*Model=([^,]+)',
-            'frequency': r'\[D\]\[debug:\d+\]: CPU Frequency:\s*(\d+)\s*MHz',
-            'framework': r'\[D\]\[debug:\d+\]: Framework:\s*([^\s,]+)',
-            'psram': r'\[C\]\[psram:\d+\]:\s*Size:\s*(\d+)\s*KB',
-            'partition_table': r'Partition table:',
-        }
-        
-        collected_values = {}
-        partition_sizes = []
+        parser = DeviceLogParser()
         last_line_time = time.time()
         
         # Initial progress
@@ -1158,116 +3991,52 @@ def get_device_info_with_progress(yaml_path, ip, progress_callback, max_wait=20)
         
         print(f"DEBUG: Entering main loop")
         
-        # === SIMPLE HYBRID APPROACH ===
-        while time.time() - start_time < max_wait:
-            import threading
+        # One reader thread drains the pipe into a queue; the loop below waits on the queue
+        # with deadlines, so a quiet device never leaves blocked reader threads behind
+        lines = queue.Queue()
+        reader = threading.Thread(target=pump_process_output, args=(proc.stdout, lines), daemon=True)
+        reader.start()
+        deadline = start_time + max_wait
+        
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print(f"DEBUG: ⚠ FORCE EXIT: Overall timeout")
+                progress_callback(95, "Timeout reached, finishing...")
+                break
+            try:
+                line = lines.get(timeout=min(0.5, remaining))
+            except queue.Empty:
+                time_since_last_line = time.time() - last_line_time
+                if time_since_last_line > idle_timeout and parser.has_essentials():
+                    print(f"DEBUG: ✓ EXIT: Has all essentials + {idle_timeout:.0f}s idle")
+                    progress_callback(95, "No more output, finishing...")
+                    break
+                continue
+            if line is None:
+                print("DEBUG: Log output ended (process exited)")
+                progress_callback(95, "Log stream closed, finishing...")
+                break
             
-            def read_with_timeout(timeout=2.0):
-                """Read a line with 2-second timeout"""
-                result = [None]
-                
-                def read_line():
-                    try:
-                        result[0] = proc.stdout.readline()
-                    except:
-                        result[0] = None
-                
-                reader = threading.Thread(target=read_line, daemon=True)
-                reader.start()
-                reader.join(timeout)
-                
-                if reader.is_alive():
-                    # readline() is blocking - no data available
-                    return None
-                else:
-                    return result[0]
+            line = line.rstrip()
+            last_line_time = time.time()
+            found_now = parser.feed(line)
             
-            line = read_with_timeout(2.0)  # 2 second timeout
-            # === END NEW CODE ===
+            print(f"DEBUG: Processing line {parser.line_count}: {line[:80]}{'...' if len(line) > 80 else ''}")
             
-            if line:
-                line_count += 1
-                line = line.rstrip()
-                last_line_time = time.time()
-                
-                print(f"DEBUG: Processing line {line_count}: {line[:80]}{'...' if len(line) > 80 else ''}")
-                
-                progress_percent = min(10 + (line_count / 2), 90)
-                progress_callback(progress_percent, f"Reading logs... ({line_count} lines)")
-                
-                # Check for partition table
-                if 'Partition table:' in line:
-                    found_info['partition_table'] = True
+            progress_percent = min(10 + (parser.line_count / 2), 90)
+            progress_callback(progress_percent, f"Reading logs... ({parser.line_count} lines)")
+            for name in found_now:
+                if name == 'partition_table':
                     progress_callback(70, "Reading partition table...")
-                    print(f"DEBUG: ✓ Found partition table marker")
-                
-                # Collect partition sizes
-                partition_match = re.search(r'\b(\w+)\s+\d+\s+\d+\s+0x[0-9A-Fa-f]+\s+0x([0-9A-Fa-f]+)', line)
-                if partition_match:
-                    try:
-                        partition_name = partition_match.group(1)
-                        size_hex = partition_match.group(2)
-                        size_bytes = int(size_hex, 16)
-                        partition_sizes.append(size_bytes)
-                        found_info['got_partition_data'] = True
-                        print(f"DEBUG: ✓ Found partition: {partition_name}, size={size_bytes} bytes (total partitions: {len(partition_sizes)})")
-                    except ValueError:
-                        print(f"DEBUG: ✗ Failed to parse partition size from: {line}")
-                
-                # Check other patterns
-                for pattern_name, pattern in patterns.items():
-                    if pattern_name != 'partition_table':
-                        match = re.search(pattern, line)
-                        if match and not found_info[pattern_name]:
-                            found_info[pattern_name] = True
-                            print(f"DEBUG: ✓ Found {pattern_name}: {match.group(1)}")
-                            
-                            if pattern_name in ['firmware_version', 'host_name', 'wifi_ssid', 'local_mac', 'chip', 'frequency', 'framework', 'wifi_signal']:
-                                collected_values[pattern_name] = match.group(1)
-                                progress_callback(progress_percent, f"Found {pattern_name}...")
-                            
-                            elif pattern_name == 'psram':
-                                psram_kb = int(match.group(1))
-                                if psram_kb >= 1024:
-                                    psram_mb = psram_kb / 1024
-                                    collected_values['psram_size'] = f"{psram_mb:.1f} MB"
-                                else:
-                                    collected_values['psram_size'] = f"{psram_kb} KB"
-                                progress_callback(progress_percent, "Found PSRAM...")
-
-                # Check for direct flash size reporting
-                if 'Flash Chip:' in line and 'Size=' in line and collected_values.get('flash_size', 'N/A') == 'N/A':
-                    flash_match = re.search(r'Size=(\d+kB)', line)
-                    if flash_match:
-                        flash_size_kb = flash_match.group(1)
-                        flash_size_mb = int(flash_size_kb.replace('kB', '')) / 1024
-                        collected_values['flash_size'] = f"{flash_size_mb:.1f} MB"
-                        found_info['got_partition_data'] = True
-                        progress_callback(80, "Found flash size...")
-                        print(f"DEBUG: ✓ Found direct flash size: {flash_size_mb:.1f} MB")
-            
-            else:
-                # No line available - check timeout
-                #time_since_last_line = time.time() - last_line_time
-                #print(f"DEBUG: No line available, time since last line: {time_since_last_line:.1f}s")
-                
-                essential_info = [
-                    'firmware_version', 'host_name', 'wifi_ssid', 'local_mac',
-                    'chip', 'frequency', 'framework', 'partition_table'
-                ]
-                has_all_essential = all(found_info[item] for item in essential_info)
-                
-                if has_all_essential and time_since_last_line > 3.0:
-                    print(f"DEBUG: ✓ EXIT: Has all essentials + 3s timeout")
-                    progress_callback(95, "No more output, finishing...")
-                    break
-                    
-                if time.time() - start_time > max_wait - 2:
-                    print(f"DEBUG: ⚠ FORCE EXIT: Overall timeout")
-                    progress_callback(95, "Timeout reached, finishing...")
-                    break
-        
-        # Clean up
+                elif name == 'flash_size':
+                    progress_callback(80, "Found flash size...")
+                elif name == 'psram_size':
+                    progress_callback(progress_percent, "Found PSRAM...")
+                else:
+                    progress_callback(progress_percent, f"Found {name}...")
+
+        # Clean up - once the process is gone the pipe hits EOF and the reader thread exits
         if proc.poll() is None:
             print(f"DEBUG: Process still running, terminating...")
             proc.terminate()
@@ -1277,51 +4046,10 @@ def get_device_info_with_progress(yaml_path, ip, progress_callback, max_wait=20)
             except:
                 print(f"DEBUG: Process didn't terminate, killing...")
                 proc.kill()
+        reader.join(timeout=2)
         
-        # Final processing
-        print(f"DEBUG: Final processing - partition_sizes={partition_sizes}")
-        print(f"DEBUG: Final processing - collected_values keys: {list(collected_values.keys())}")
-        
-        if collected_values.get('flash_size', 'N/A') != 'N/A':
-            print(f"DEBUG: Using direct flash size: {collected_values['flash_size']}")
-        elif partition_sizes:
-            total_bytes = sum(partition_sizes)
-            common_sizes = {
-                4194304: "4.0 MB",
-                8388608: "8.0 MB",  
-                16777216: "16.0 MB",
-                33554432: "32.0 MB",
-            }
-            closest_size = min(common_sizes.keys(), key=lambda x: abs(x - total_bytes))
-            if abs(total_bytes - closest_size) / closest_size < 0.55:
-                collected_values['flash_size'] = common_sizes[closest_size]
-            else:
-                if total_bytes >= 1024 * 1024:
-                    collected_values['flash_size'] = f"{total_bytes / (1024 * 1024):.1f} MB"
-                else:
-                    collected_values['flash_size'] = f"{total_bytes / 1024:.0f} KB"
-            print(f"DEBUG: Calculated flash size from partitions: {collected_values['flash_size']} (total_bytes={total_bytes})")
-        else:
-            collected_values['flash_size'] = "N/A"
-            print(f"DEBUG: No flash size data available")
-
-        expected_keys = {
-            'firmware_version': 'firmware_version',
-            'host_name': 'host_name', 
-            'wifi_ssid': 'wifi_ssid',
-            'local_mac': 'local_mac',
-            'wifi_signal': 'wifi_signal',
-            'chip': 'chip',
-            'frequency': 'frequency',
-            'framework': 'framework',
-            'psram_size': 'psram_size',
-            'flash_size': 'flash_size'
-        }
-        
-        final_result = {}
-        for gui_key, data_key in expected_keys.items():
-            final_result[gui_key] = collected_values.get(data_key, 'N/A')
-            
+        print(f"DEBUG: Final processing - partition_sizes={parser.partition_sizes}")
+        final_result = parser.result()
         print(f"DEBUG: Final result: {final_result}")
         progress_callback(100, "Complete!")
         print(f"DEBUG: ✓ Device info collection completed successfully")
@@ -1331,9 +4059,82 @@ def get_device_info_with_progress(yaml_path, ip, progress_callback, max_wait=20)
         print(f"DEBUG: ✗ ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+        if proc and proc.poll() is None:
+            proc.kill()  # Never leave an esphome logs process streaming in the background
+            proc.wait()
         progress_callback(0, f"Error: {str(e)}")
         return None
 
+# NEW - Batched log output
+LOG_FLUSH_INTERVAL_MS = 50
+
+class LogSink:
+    """Buffers log lines from any thread and writes them to a Text widget in batches
+
+    Lines keep their order and tags; each flush is one insert and one scroll instead of an
+    insert, see() and redraw per line. A line written with replace_previous overwrites the
+    last one (upload progress bars) and collapses in the buffer when both are still pending.
+    """
+    def __init__(self, root, widget, interval_ms=LOG_FLUSH_INTERVAL_MS):
+        self.root = root
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.pending = []  # [(text, tag, replace_previous)]
+        self.lock = Lock()
+        self.scheduled = False
+
+    def write(self, text, tag, replace_previous=False):
+        with self.lock:
+            if replace_previous and self.pending:
+                # The line being replaced never reached the widget - drop it, keep its own flag
+                replace_previous = self.pending.pop()[2]
+            self.pending.append((text, tag, replace_previous))
+            if self.scheduled:
+                return
+            self.scheduled = True
+        try:
+            self.root.after(self.interval_ms, self.flush)
+        except (RuntimeError, tk.TclError):
+            # Tk is gone (closing) - nothing left to draw on
+            pass
+
+    def flush(self):
+        """Write everything pending to the widget (Tk thread only)"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+            self.scheduled = False
+        if not batch:
+            return
+        # Only the first line can still replace a widget line - later ones collapsed in write()
+        chunks = []
+        for text, tag, _ in batch:
+            if chunks and chunks[-1] == tag:
+                chunks[-2] += text + "\n"
+            else:
+                chunks += [text + "\n", tag]
+        try:
+            if batch[0][2]:
+                self.widget.delete("end-2l", "end-1l")
+            self.widget.insert(tk.END, *chunks)
+            self.widget.see(tk.END)
+        except tk.TclError as e:
+            print(f"Log flush failed: {e}")
+
+    def clear(self):
+        """Drop pending lines and empty the widget"""
+        with self.lock:
+            self.pending = []
+        self.widget.delete(1.0, tk.END)
+
+    def contents(self):
+        """Widget text plus lines not flushed yet"""
+        with self.lock:
+            batch = list(self.pending)
+        shown = self.widget.get(1.0, "end-1c")
+        if batch and batch[0][2]:
+            shown = shown[:shown.rstrip("\n").rfind("\n") + 1]
+        return shown + "".join(text + "\n" for text, _, _ in batch)
+
 class ModernESPHomeGUI:
     def __init__(self, root):
         self.root = root
@@ -1378,6 +4179,13 @@ class ModernESPHomeGUI:
         self.setup_menu()
         self.setup_status_bar()
         
+        # Browse for ESPHome devices in the background for the whole session; devices known
+        # from the last session are offered right away and confirmed as mDNS answers arrive
+        device_registry.add_listener(self.on_registry_changed)
+        discovery_service.start()
+        self.refresh_ip_choices()
+        self.root.after(15000, self.report_registry_reconcile)
+
         # Populate initial data
         self.scan_ports()
         self.get_current_versions()
@@ -1388,20 +4196,27 @@ class ModernESPHomeGUI:
 
         # FULL SYNC AT STARTUP IN BACKGROUND
         self.startup_full_sync()
+        
+        # Check the backup catalog against disk once the UI is up
+        if self.backup_verify_on_startup.get():
+            self.root.after(5000, lambda: self.verify_backup_catalog(quiet=True))
+        if self.backup_pack_after_days.get() > 0:
+            self.root.after(15000, lambda: self.pack_old_backups(quiet=True))
 
     def startup_full_sync(self):
         """Perform full sync of all files at application startup"""
         def startup_sync_thread():
+            if self.offline_mode.get():
+                self.sync_status_var.set("Sync: Offline mode")
+                self.sync_indicator.configure(bootstyle="warning")
+                self.log_message(">>> Offline mode: skipping startup sync", "auto")
+                return
+            
             self.status_var.set("Performing initial file sync...")
             self.log_message(">>> Smart syncing files...", "auto")
-            self.log_text.see(tk.END)
             
             # Perform full sync (all files) using configurable paths
-            synced_files = sync_esphome_files(
-                self.sync_source_path.get(), 
-                self.sync_local_path.get(),
-                None  # No backups during startup sync
-            )
+            synced_files = self.sync_workspace_files(None)  # No backups during startup sync
             
             self.last_sync_time = datetime.now().strftime("%H:%M:%S")
             
@@ -1415,7 +4230,6 @@ class ModernESPHomeGUI:
                 self.log_message(">>> Startup sync completed: No changes needed", "auto")
             
             self.status_var.set("Ready")
-            self.log_text.see(tk.END)
         
         # Start sync in background - don't block UI
         threading.Thread(target=startup_sync_thread, daemon=True).start()
@@ -1630,6 +4444,9 @@ class ModernESPHomeGUI:
         sync_menu = tk.Menu(util_frame, tearoff=0)
         sync_menu.add_command(label="Smart Sync (Current Project)", command=self.smart_sync_before_compile)
         sync_menu.add_command(label="Full Sync (All Files)", command=self.manual_full_sync)
+        sync_menu.add_command(label="Dry Run (Plan Full Sync)...", command=self.show_sync_plan_dialog)
+        sync_menu.add_separator()
+        sync_menu.add_command(label="Workspace Sync Status...", command=self.show_sync_status_dashboard)
         
         self.sync_btn = tb.Button(util_frame, text="Sync Files", command=self.smart_sync_before_compile, bootstyle="info")
         self.sync_btn.pack(side=LEFT, padx=(15, 5))
@@ -1887,6 +4704,14 @@ class ModernESPHomeGUI:
 
         self.refresh_device_btn.bind("<Button-3>", show_refresh_context_menu)  # Button-3 is right-click
 
+        tb.Button(
+            button_frame,
+            text="Refresh All Devices",
+            command=self.refresh_all_devices,
+            bootstyle="success-outline",
+            width=18
+        ).pack(side=LEFT, padx=(0, 10))
+
         # Middle: Clear history button
         clear_history_btn = tb.Button(
             button_frame, 
@@ -1970,6 +4795,9 @@ class ModernESPHomeGUI:
         self.log_text.tag_configure("warning", foreground="#ffa500")    # Orange - Warning messages  
         self.log_text.tag_configure("error", foreground="#ff6b6b")      # Bright Red - Error messages
         self.log_text.tag_configure("debug", foreground="#a0a0a0")      # Gray - Debug messages        
+        
+        # Every log line goes through the sink - worker threads never touch the widget directly
+        self.log_sink = LogSink(self.root, self.log_text)
 
     def setup_version_section(self, parent):
         """Version selection section with mismatch warning"""
@@ -2268,6 +5096,13 @@ class ModernESPHomeGUI:
                                     textvariable=self.max_backups)
         max_backup_spin.pack(anchor=W, pady=5)
         
+        tb.Checkbutton(settings_frame, text="Verify backup catalog at startup (background)", 
+                    variable=self.backup_verify_on_startup, bootstyle="primary-round-toggle").pack(anchor=W, pady=5)
+        
+        tb.Label(settings_frame, text="Pack backups older than (days, 0 = manual only):").pack(anchor=W, pady=(10, 0))
+        tb.Spinbox(settings_frame, from_=0, to=3650, width=10,
+                   textvariable=self.backup_pack_after_days).pack(anchor=W, pady=5)
+        
         tb.Label(settings_frame, text=f"Backup location:", bootstyle="info").pack(anchor=W, pady=(10, 0))
         tb.Label(settings_frame, text=f"{self.backup_base_path}", bootstyle="secondary", 
                 font=('Arial', 8)).pack(anchor=W, pady=2)
@@ -2306,6 +5141,22 @@ class ModernESPHomeGUI:
                 command=lambda: self.cleanup_backups(self.backup_tree), 
                 bootstyle="warning", width=20).pack(fill=X, pady=5)
         
+        tb.Button(actions_frame, text="Export as Plain Files", 
+                command=lambda: self.export_plain_backups(self.backup_tree), 
+                bootstyle="secondary", width=20).pack(fill=X, pady=5)
+        
+        tb.Button(actions_frame, text="Verify Backup Catalog", 
+                command=self.verify_backup_catalog, 
+                bootstyle="secondary", width=20).pack(fill=X, pady=5)
+        
+        tb.Button(actions_frame, text="Pack Old Backups", 
+                command=self.pack_old_backups, 
+                bootstyle="secondary", width=20).pack(fill=X, pady=5)
+        
+        tb.Button(actions_frame, text="Import Legacy Backups", 
+                command=self.import_legacy_backups, 
+                bootstyle="secondary", width=20).pack(fill=X, pady=5)
+        
         # Information
         info_frame = tb.Labelframe(left_frame, text="Information", padding=15, bootstyle="secondary")
         info_frame.pack(fill=BOTH, expand=True)
@@ -2321,7 +5172,11 @@ class ModernESPHomeGUI:
 
     Automatic backups occur:
     • Before compilation
-    • Before upload"""
+    • Before upload
+
+    Identical content is stored only once,
+    compressed, mostly as deltas (Δ);
+    old backups are packed per month"""
         
         tb.Label(info_frame, text=info_text, justify=LEFT, bootstyle="secondary", 
                 font=('Arial', 9)).pack(anchor=W)
@@ -2354,6 +5209,10 @@ class ModernESPHomeGUI:
                 command=lambda: self.delete_backup_tree_item(self.backup_tree), 
                 bootstyle="danger").pack(side=LEFT, padx=5)
         
+        tb.Button(tree_buttons_frame, text="Search Contents", 
+                command=self.show_backup_search, 
+                bootstyle="outline-primary").pack(side=LEFT, padx=5)
+        
         # Multi-select info label
         self.multi_select_info = tb.Label(tree_buttons_frame, text="Use Ctrl+Click or Shift+Click for multiple selection", 
                                         bootstyle="secondary", font=('Arial', 8))
@@ -2367,11 +5226,11 @@ class ModernESPHomeGUI:
         self.backup_tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings", selectmode="extended")  # Changed to extended
         
         # Define headings with sorting
-        self.backup_tree.heading("#0", text="Backup Structure", command=lambda: self.tree_sort(self.backup_tree, "#0", False))
-        self.backup_tree.heading("Name", text="File Name", command=lambda: self.tree_sort(self.backup_tree, "Name", False))
-        self.backup_tree.heading("Date", text="Backup Date", command=lambda: self.tree_sort(self.backup_tree, "Date", False))
-        self.backup_tree.heading("Size", text="Size", command=lambda: self.tree_sort(self.backup_tree, "Size", False))
-        self.backup_tree.heading("Type", text="Backup Type", command=lambda: self.tree_sort(self.backup_tree, "Type", False))
+        self.backup_tree.heading("#0", text="Backup Structure", command=lambda: self.sort_backup_tree(self.backup_tree, "#0"))
+        self.backup_tree.heading("Name", text="File Name", command=lambda: self.sort_backup_tree(self.backup_tree, "Name"))
+        self.backup_tree.heading("Date", text="Backup Date ▼", command=lambda: self.sort_backup_tree(self.backup_tree, "Date"))
+        self.backup_tree.heading("Size", text="Size", command=lambda: self.sort_backup_tree(self.backup_tree, "Size"))
+        self.backup_tree.heading("Type", text="Backup Type", command=lambda: self.sort_backup_tree(self.backup_tree, "Type"))
         self.backup_tree.heading("FullPath", text="Path")
         
         # Define columns
@@ -2389,8 +5248,9 @@ class ModernESPHomeGUI:
         self.backup_tree.pack(side=LEFT, fill=BOTH, expand=True)
         scrollbar.pack(side=RIGHT, fill=Y)
         
-        # Double-click to restore
-        self.backup_tree.bind("<Double-1>", lambda e: self.restore_backup_tree_item(self.backup_tree))
+        # Double-click to restore (or load the next page); versions load when a folder opens
+        self.backup_tree.bind("<Double-1>", self.on_backup_tree_double_click)
+        self.backup_tree.bind("<<TreeviewOpen>>", self.on_backup_folder_open)
         
         # Context menu for backup tree
         self.backup_context_menu = tk.Menu(self.backup_tree, tearoff=0)
@@ -2398,6 +5258,10 @@ class ModernESPHomeGUI:
                                             command=lambda: self.restore_backup_tree_item(self.backup_tree))
         self.backup_context_menu.add_command(label="Delete Selected Backups", 
                                         command=lambda: self.delete_backup_tree_item(self.backup_tree))
+        self.backup_context_menu.add_command(label="Diff Against Current File", 
+                                        command=lambda: self.diff_selected_backup(self.backup_tree))
+        self.backup_context_menu.add_command(label="Search Backup Contents...", 
+                                        command=self.show_backup_search)
         self.backup_context_menu.add_separator()
         self.backup_context_menu.add_command(label="Select All", 
                                         command=lambda: self.select_all_tree_items(self.backup_tree))
@@ -2408,17 +5272,39 @@ class ModernESPHomeGUI:
                                         command=self.open_backup_location)
         self.backup_context_menu.add_command(label="Open File Location", 
                                         command=lambda: self.open_file_location(self.backup_tree))
+        self.backup_context_menu.add_command(label="Export as Plain Files...", 
+                                        command=lambda: self.export_plain_backups(self.backup_tree))
         
         self.backup_tree.bind("<Button-3>", self.show_backup_context_menu)
         
         # Initial population
         self.populate_backup_tree(self.backup_tree)
 
+    BACKUP_TREE_PAGE_SIZE = 200
+    BACKUP_TAG_STYLES = {
+        None: ("Recent", "🟢"),
+        'daily': ("Daily", "🔵"),
+        'weekly': ("Weekly", "🟣"),
+        'monthly': ("Monthly", "🟠"),
+        'yearly': ("Yearly", "🟡"),
+        'baseline': ("Baseline", "⚫"),
+    }
+    # Tree column -> (folder sort key, version sort key) in the backup index
+    BACKUP_SORT_COLUMNS = {
+        "#0": ('name', 'date'),
+        "Name": ('name', 'date'),
+        "Date": ('date', 'date'),
+        "Size": ('size', 'size'),
+        "Type": ('count', 'tag'),
+    }
+
     def populate_backup_tree(self, tree):
-        """Populate backup treeview with folder structure"""
-        # Clear existing items
-        for item in tree.get_children():
-            tree.delete(item)
+        """Populate backup treeview with one node per YAML file - versions load when a folder is opened"""
+        # Keep folders that were open (and so loaded) open across a refresh
+        previous = getattr(self, 'backup_tree_folders', {})
+        reopen = {info['name'] for iid, info in previous.items() if tree.exists(iid) and tree.item(iid, 'open')}
+        self.backup_tree_folders = {}
+        tree.delete(*tree.get_children())
         
         # Scan backup directory
         if not self.backup_base_path.exists():
@@ -2426,169 +5312,116 @@ class ModernESPHomeGUI:
             return
         
         try:
-            total_backups = 0
-            total_size = 0
-            yaml_folders = {}
-            
-            # First pass: collect all YAML folders and their backups
-            for subdir in self.backup_base_path.iterdir():
-                if subdir.is_dir():
-                    original_filename = subdir.name
-                    folder_size = 0
-                    folder_backups = []
-                    
-                    for backup_file in subdir.iterdir():
-                        if backup_file.is_file():
-                            stat = backup_file.stat()
-                            file_time = datetime.fromtimestamp(stat.st_mtime)
-                            
-                            # Determine backup type from filename and get emoji
-                            backup_type = "Recent"
-                            type_emoji = "🟢"
-                            if backup_file.name.endswith('.daily'):
-                                backup_type = "Daily"
-                                type_emoji = "🔵"
-                            elif backup_file.name.endswith('.weekly'):
-                                backup_type = "Weekly" 
-                                type_emoji = "🟣"
-                            elif backup_file.name.endswith('.monthly'):
-                                backup_type = "Monthly"
-                                type_emoji = "🟠"
-                            elif backup_file.name.endswith('.yearly'):
-                                backup_type = "Yearly"
-                                type_emoji = "🟡"
-                            elif backup_file.name.endswith('.baseline'):
-                                backup_type = "Baseline"
-                                type_emoji = "⚫"
-                            
-                            folder_backups.append({
-                                'name': backup_file.name,
-                                'date': file_time,
-                                'size': stat.st_size,
-                                'type': backup_type,
-                                'type_emoji': type_emoji,
-                                'path': backup_file
-                            })
-                            
-                            folder_size += stat.st_size
-                            total_backups += 1
-                            total_size += stat.st_size
-                    
-                    yaml_folders[original_filename] = {
-                        'size': folder_size,
-                        'backups': folder_backups
-                    }
+            store = get_backup_store(self.backup_base_path)
+            column, reverse = getattr(self, 'backup_sort', ("Date", True))
+            folder_key, _ = self.BACKUP_SORT_COLUMNS.get(column, ('name', 'date'))
             
-            # Second pass: build the tree structure with folder icons
-            for yaml_file, folder_data in sorted(yaml_folders.items()):
-                folder_size_str = self.format_size(folder_data['size'])
-                backup_count = len(folder_data['backups'])
-                
-                # Add folder with icon and count
-                folder_text = f"📁 {yaml_file} ({backup_count} backups)"
+            for row in store.name_rows(folder_key, reverse):
+                folder_text = f"📁 {row['name']} ({row['count']} backups)"
+                latest_str = row['latest_at'].strftime("%Y-%m-%d %H:%M:%S") if row['latest_at'] else ""
                 folder_item = tree.insert("", "end", text=folder_text, 
-                                        values=("", "", folder_size_str, "Folder", ""))
-                
-                # Add backup files as children with emoji indicators
-                for backup in sorted(folder_data['backups'], key=lambda x: x['date'], reverse=True):
-                    size_str = self.format_size(backup['size'])
-                    date_str = backup['date'].strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    tree.insert(folder_item, "end", text="", 
-                            values=(backup['name'], date_str, size_str, 
-                                    f"{backup['type_emoji']} {backup['type']}", str(backup['path'])))
+                                        values=("", latest_str, self.format_size(row['size']), "Folder", ""))
+                self.backup_tree_folders[folder_item] = {'name': row['name'], 'count': row['count'], 'loaded': 0}
+                # Placeholder child so the folder shows an expander before its versions are fetched
+                tree.insert(folder_item, "end", iid=f"{folder_item}::placeholder", text="", values=("Loading...", "", "", "", ""))
+                if row['name'] in reopen:
+                    tree.item(folder_item, open=True)
+                    self.load_backup_folder_page(tree, folder_item)
             
             # Update status
             if hasattr(self, 'backup_status_var'):
-                size_mb = total_size / (1024 * 1024)
-                self.backup_status_var.set(f"Backups: {total_backups} files in {len(yaml_folders)} YAML files")
+                summary = store.catalog_summary()
+                self.backup_status_var.set(f"Backups: {summary['versions']} files in {summary['files']} YAML files "
+                                           f"({self.format_size(summary['stored_size'])} stored for "
+                                           f"{self.format_size(summary['logical_size'])})")
             
             # Update total size display
             self.update_backup_total_size()
             
-            # Auto-expand all folders initially
-            self.expand_all_tree_items(tree)
-            
         except Exception as e:
             print(f"Error populating backup tree: {e}")
             self.update_backup_total_size()
 
-    def tree_sort(self, tree, column, reverse):
-        """Sort tree contents when a column header is clicked"""
-        # Get all items from the tree
-        items = [(tree.set(item, column), item) for item in tree.get_children('')]
-        
-        # Separate folders and files for proper sorting
-        folders = []
-        files = []
-        
-        for value, item in items:
-            if tree.get_children(item):  # This is a folder (has children)
-                folders.append((value, item))
-            else:
-                files.append((value, item))
-        
-        # Sort based on column type
-        if column == "Size":
-            # Convert size strings to bytes for proper numeric sorting
-            def size_to_bytes(size_str):
-                if not size_str or size_str == "":
-                    return 0
-                size_str = size_str.upper()
-                if "KB" in size_str:
-                    return float(size_str.replace("KB", "").strip()) * 1024
-                elif "MB" in size_str:
-                    return float(size_str.replace("MB", "").strip()) * 1024 * 1024
-                elif "GB" in size_str:
-                    return float(size_str.replace("GB", "").strip()) * 1024 * 1024 * 1024
-                else:
-                    try:
-                        return float(size_str)
-                    except ValueError:
-                        return 0
-            
-            folders.sort(key=lambda x: size_to_bytes(x[0]), reverse=reverse)
-            files.sort(key=lambda x: size_to_bytes(x[0]), reverse=reverse)
-        elif column == "Date":
-            # Sort by date
-            def parse_date(date_str):
-                if not date_str:
-                    return datetime.min
-                try:
-                    return datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    return datetime.min
-            
-            folders.sort(key=lambda x: parse_date(x[0]), reverse=reverse)
-            files.sort(key=lambda x: parse_date(x[0]), reverse=reverse)
+    def load_backup_folder_page(self, tree, folder_item):
+        """Fetch the next page of a folder's versions from the backup index"""
+        info = getattr(self, 'backup_tree_folders', {}).get(folder_item)
+        if not info:
+            return
+        for child in (f"{folder_item}::placeholder", f"{folder_item}::more"):
+            if tree.exists(child):
+                tree.delete(child)
+        
+        column, reverse = getattr(self, 'backup_sort', ("Date", True))
+        _, version_key = self.BACKUP_SORT_COLUMNS.get(column, ('name', 'date'))
+        versions = get_backup_store(self.backup_base_path).versions_page(
+            info['name'], info['loaded'], self.BACKUP_TREE_PAGE_SIZE, version_key, reverse)
+        
+        for backup_version in versions:
+            backup_type, type_emoji = self.BACKUP_TAG_STYLES.get(backup_version['tag'], self.BACKUP_TAG_STYLES[None])
+            if backup_version['kind'] == 'delta':
+                backup_type += " (Δ)"  # Stored as a delta, rebuilt on restore
+            tree.insert(folder_item, "end", text="", 
+                        values=(backup_version['label'], backup_version['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+                                self.format_size(backup_version['size']), f"{type_emoji} {backup_type}", backup_version['ref']))
+        info['loaded'] += len(versions)
+        
+        remaining = info['count'] - info['loaded']
+        if versions and remaining > 0:
+            tree.insert(folder_item, "end", iid=f"{folder_item}::more", text="",
+                        values=(f"▼ Load {min(remaining, self.BACKUP_TREE_PAGE_SIZE)} more ({remaining} remaining)",
+                                "", "", "", ""))
+
+    def on_backup_folder_open(self, event):
+        """Load a folder's first page the first time it is expanded"""
+        tree = event.widget
+        folder_item = tree.focus()
+        info = getattr(self, 'backup_tree_folders', {}).get(folder_item)
+        if info and info['loaded'] == 0:
+            self.load_backup_folder_page(tree, folder_item)
+
+    def on_backup_tree_double_click(self, event):
+        """Double-click restores a backup, or loads the next page on a 'Load more' row"""
+        tree = event.widget
+        item = tree.identify_row(event.y)
+        if item.endswith("::more"):
+            self.load_backup_folder_page(tree, tree.parent(item))
+            return "break"
+        if item in getattr(self, 'backup_tree_folders', {}):
+            return None  # Default double-click toggles the folder
+        self.restore_backup_tree_item(tree)
+        return "break"
+
+    def sort_backup_tree(self, tree, column):
+        """Sort by a column using typed keys from the backup index (click again to reverse)"""
+        current_column, current_reverse = getattr(self, 'backup_sort', ("Date", True))
+        if column == current_column:
+            reverse = not current_reverse
         else:
-            # Alphabetical sort for other columns
-            folders.sort(key=lambda x: x[0].lower() if x[0] else "", reverse=reverse)
-            files.sort(key=lambda x: x[0].lower() if x[0] else "", reverse=reverse)
+            reverse = column in ("Date", "Size")  # Newest/largest first feels natural for these
+        self.backup_sort = (column, reverse)
         
-        # Rebuild the tree with sorted items
-        for item in folders + files:
-            tree.move(item[1], '', 'end')
-        
-        # Reverse sort next time
-        tree.heading(column, command=lambda: self.tree_sort(tree, column, not reverse))
+        headings = {"#0": "Backup Structure", "Name": "File Name", "Date": "Backup Date", "Size": "Size", "Type": "Backup Type"}
+        for col, text in headings.items():
+            arrow = (" ▼" if reverse else " ▲") if col == column else ""
+            tree.heading(col, text=text + arrow)
+        self.populate_backup_tree(tree)
 
     def get_selected_backup_paths(self, tree):
-        """Get the full paths of all selected backup files"""
+        """Get the store version ids of all selected backups"""
         selections = tree.selection()
-        backup_paths = []
+        version_ids = []
         
         for item in selections:
             item_data = tree.item(item)
             values = item_data['values']
             
-            # Check if it's a backup file (has FullPath) and not a folder
-            if len(values) > 4 and values[4]:  # FullPath exists and is not empty
-                backup_path = Path(values[4])
-                if backup_path.exists():
-                    backup_paths.append(backup_path)
+            # Check if it's a backup (has a version ref in FullPath) and not a folder
+            if len(values) > 4 and values[4]:
+                version_id = parse_backup_ref(values[4])
+                if version_id is not None:
+                    version_ids.append(version_id)
         
-        return backup_paths
+        return version_ids
 
     def restore_backup_tree_item(self, tree):
         """Restore selected backup from tree (single restore only)"""
@@ -2605,19 +5438,19 @@ class ModernESPHomeGUI:
         item = tree.item(selections[0])
         values = item['values']
         
-        # Check if it's a backup file (has FullPath) and not a folder
-        if len(values) > 4 and values[4]:  # FullPath exists and is not empty
-            backup_path = Path(values[4])
-        else:
+        # Check if it's a backup (has a version ref in FullPath) and not a folder
+        version_id = parse_backup_ref(values[4]) if len(values) > 4 and values[4] else None
+        if version_id is None:
             messagebox.showwarning("Invalid Selection", "Please select a backup file to restore (not a folder)")
             return
         
-        if not backup_path.exists():
+        store = get_backup_store(self.backup_base_path)
+        version = store.get(version_id)
+        if not version:
             messagebox.showerror("Error", "Backup file not found")
             return
         
-        # Extract original filename from parent folder name
-        original_name = backup_path.parent.name
+        original_name = version['name']
         
         # Ask for restore location
         restore_path = filedialog.asksaveasfilename(
@@ -2629,7 +5462,7 @@ class ModernESPHomeGUI:
         
         if restore_path:
             try:
-                shutil.copy2(backup_path, restore_path)
+                store.restore(version_id, restore_path)
                 messagebox.showinfo("Success", f"Backup restored to:\n{restore_path}")
                 
                 # Update current file if it matches
@@ -2649,8 +5482,10 @@ class ModernESPHomeGUI:
             messagebox.showwarning("No Selection", "Please select backup file(s) to delete (not folders)")
             return
         
+        store = get_backup_store(self.backup_base_path)
         if len(backup_paths) == 1:
-            message = f"Delete backup '{backup_paths[0].name}'?"
+            version = store.get(backup_paths[0])
+            message = f"Delete backup '{version['label'] if version else backup_paths[0]}'?"
         else:
             message = f"Delete {len(backup_paths)} selected backups?"
         
@@ -2660,12 +5495,10 @@ class ModernESPHomeGUI:
         deleted_count = 0
         errors = []
         
-        for backup_path in backup_paths:
-            try:
-                backup_path.unlink()
-                deleted_count += 1
-            except Exception as e:
-                errors.append(f"{backup_path.name}: {str(e)}")
+        try:
+            deleted_count = store.delete(backup_paths)
+        except Exception as e:
+            errors.append(str(e))
         
         if deleted_count > 0:
             self.populate_backup_tree(tree)
@@ -2697,6 +5530,32 @@ class ModernESPHomeGUI:
         
         tree.selection_set(file_items)
 
+    def pack_old_backups(self, quiet=False):
+        """Roll old backup objects into monthly pack files in the background"""
+        if not self.backup_base_path.exists():
+            return
+        # Manual runs use the configured age too, falling back to the default when auto-packing is off
+        days = self.backup_pack_after_days.get() or BACKUP_PACK_AFTER_DAYS
+        
+        def pack_thread():
+            start = time.perf_counter()
+            try:
+                summary = get_backup_store(self.backup_base_path).pack_old_objects(days)
+            except Exception as e:
+                message = f">>> Packing backups failed: {e}"
+                self.root.after(0, lambda: self.log_message(message, "auto"))
+                return
+            elapsed = time.perf_counter() - start
+            message = (f">>> Packed {summary['packed']} of {summary['loose_before']} loose backup object(s) "
+                       f"older than {days} days into {len(summary['packs'])} pack(s) in {elapsed:.1f}s"
+                       + (f", compacted {summary['compacted']} pack(s)" if summary['compacted'] else ""))
+            if summary['packed'] or summary['compacted'] or not quiet:
+                self.root.after(0, lambda: self.log_message(message, "auto"))
+            if hasattr(self, 'total_size_var'):
+                self.root.after(0, self.update_backup_total_size)
+        
+        threading.Thread(target=pack_thread, daemon=True).start()
+
     def show_backup_context_menu(self, event):
         """Show context menu for backup tree"""
         item = self.backup_tree.identify_row(event.y)
@@ -2707,9 +5566,12 @@ class ModernESPHomeGUI:
             self.backup_context_menu.post(event.x_root, event.y_root)
 
     def expand_all_tree_items(self, tree):
-        """Expand all items in the tree"""
+        """Expand all items in the tree (backup folders fetch their first page)"""
+        folders = getattr(self, 'backup_tree_folders', {})
         for item in tree.get_children():
             tree.item(item, open=True)
+            if item in folders and folders[item]['loaded'] == 0:
+                self.load_backup_folder_page(tree, item)
 
     def collapse_all_tree_items(self, tree):
         """Collapse all items in the tree"""
@@ -2717,11 +5579,13 @@ class ModernESPHomeGUI:
             tree.item(item, open=False)
 
     def open_file_location(self, tree):
-        """Open the location of the selected backup file"""
-        backup_path = self.get_selected_backup_path(tree)
-        if not backup_path:
+        """Open the folder the selected backup was taken from"""
+        version_ids = self.get_selected_backup_paths(tree)
+        version = get_backup_store(self.backup_base_path).get(version_ids[0]) if version_ids else None
+        if not version or not version['source_path']:
             messagebox.showwarning("No Selection", "Please select a backup file to open location")
             return
+        backup_path = Path(version['source_path'])
         
         try:
             if sys.platform == "win32":
@@ -2765,14 +5629,86 @@ class ModernESPHomeGUI:
             return f"{size_bytes:.2f} {size_names[i]}"
 
     def update_backup_total_size(self):
-        """Update the total backup folder size display"""
+        """Update the total backup size display from the backup catalog (no directory walk)"""
         if hasattr(self, 'backup_base_path') and self.backup_base_path.exists():
-            total_size = self.get_folder_size(self.backup_base_path)
-            formatted_size = self.format_size(total_size)
+            summary = get_backup_store(self.backup_base_path).catalog_summary()
+            formatted_size = self.format_size(summary['disk_size'])
             self.total_size_var.set(f"Total size: {formatted_size}")
         else:
             self.total_size_var.set("Total size: 0 B")
 
+    def confirm_backup_repair(self, orphan_count):
+        """Offer to delete the orphan files a catalog check found"""
+        if messagebox.askyesno("Repair Backup Store",
+                               f"{orphan_count} file(s) in the backup store are not referenced by the catalog "
+                               "(left over from interrupted backups or packing).\n\nDelete them?",
+                               default="no"):
+            self.verify_backup_catalog(repair=True)
+
+    def import_legacy_backups(self):
+        """Copy plain per-file backups from older versions into the store, after asking"""
+        store = get_backup_store(self.backup_base_path)
+        legacy = store.find_legacy_backups()
+        if not legacy:
+            messagebox.showinfo("Import Legacy Backups", "No plain backup files found.")
+            return
+        if not messagebox.askyesno("Import Legacy Backups",
+                                   f"Import {len(legacy)} plain backup file(s) into the backup store?\n\n"
+                                   "The original files are kept."):
+            return
+        remove_originals = messagebox.askyesno(
+            "Import Legacy Backups",
+            "Delete each original file once its copy has been read back from the store and verified?",
+            default="no")
+
+        def import_thread():
+            summary = store.import_legacy_backups(remove_originals)
+            self.log_message(f">>> Legacy backups: {summary['imported']} imported, {summary['skipped']} already in the store, "
+                             f"{summary['removed']} original(s) removed, {summary['failed']} failed", "auto")
+            if hasattr(self, 'backup_tree'):
+                self.root.after(0, lambda: self.populate_backup_tree(self.backup_tree))
+
+        threading.Thread(target=import_thread, daemon=True).start()
+
+    def verify_backup_catalog(self, quiet=False, repair=False):
+        """Re-scan the backup store in the background and fix index drift between the catalog and disk
+
+        Orphan files are only reported; with repair (asked for after an interactive check)
+        they are deleted.
+        """
+        if not self.backup_base_path.exists():
+            return
+        
+        def verify_thread():
+            start = time.perf_counter()
+            store = get_backup_store(self.backup_base_path)
+            findings = store.verify_catalog(remove_orphans=repair)
+            findings['indexed'] = store.index_pending()  # Search index catch-up rides along
+            legacy = len(store.find_legacy_backups())
+            if legacy:
+                self.log_message(f">>> {legacy} plain backup file(s) are not in the backup store yet - "
+                                 "use 'Import Legacy Backups' on the Backup tab", "auto")
+            elapsed = time.perf_counter() - start
+            drift = (findings['missing_objects'] or findings['orphan_files'] or
+                     findings['size_fixes'] or findings['totals_fixed'])
+            if drift:
+                message = (f">>> Backup catalog checked in {elapsed:.1f}s: "
+                           f"{len(findings['missing_objects'])} missing object(s), "
+                           f"{findings['orphan_files']} orphan file(s) {'removed' if repair else 'found'}, "
+                           f"{findings['size_fixes']} size fix(es), totals {'recounted' if findings['totals_fixed'] else 'ok'}")
+            else:
+                message = f">>> Backup catalog verified in {elapsed:.1f}s: no drift"
+            if findings['orphan_files'] and not repair and quiet:
+                message += " - use 'Verify Backup Catalog' on the Backup tab to remove the orphans"
+            if drift or not quiet:
+                self.root.after(0, lambda: self.log_message(message, "auto"))
+            if findings['orphan_files'] and not repair and not quiet:
+                self.root.after(0, lambda: self.confirm_backup_repair(findings['orphan_files']))
+            if hasattr(self, 'backup_tree'):
+                self.root.after(0, lambda: self.populate_backup_tree(self.backup_tree))
+        
+        threading.Thread(target=verify_thread, daemon=True).start()
+
     def show_backup_context_menu(self, event):
         """Show context menu for backup tree"""
         item = self.backup_tree.identify_row(event.y)
@@ -2792,46 +5728,285 @@ class ModernESPHomeGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Could not open backup location: {e}")
 
-    def create_full_backup(self):
-        """Create a backup of all YAML files"""
-        def full_backup_thread():
-            self.status_var.set("Creating full backup...")
-            
-            # Find all YAML files in the esphome directory
-            esphome_dir = r"C:\esphome"
-            yaml_files = []
-            
-            for root, dirs, files in os.walk(esphome_dir):
-                for file in files:
-                    if file.lower().endswith(('.yaml', '.yml')):
-                        yaml_files.append(os.path.join(root, file))
-            
-            backed_up_files = []
-            for yaml_file in yaml_files:
-                backup_path = create_backup(
-                    yaml_file,
-                    self.backup_base_path,
-                    os.path.basename(yaml_file)
-                )
-                if backup_path:
-                    backed_up_files.append(os.path.basename(yaml_file))
-            
-            if backed_up_files:
-                self.last_backup_time = datetime.now().strftime("%H:%M:%S")
-                self.backup_status_var.set(f"Full backup: {len(backed_up_files)} files")
-                self.status_var.set(f"Full backup created: {len(backed_up_files)} files")
-                self.log_message(f">>> Full backup created: {len(backed_up_files)} files", "auto")
-                
-                # Clean up old backups
-                cleanup_old_backups(self.backup_base_path, self.max_backups.get())
-                
-                # Refresh the backup list
-                self.populate_backup_list(self.backup_tree)
-                self.update_backup_total_size()
+    def create_full_backup(self):
+        """Back up every YAML file under the configured local paths whose content changed"""
+        # Read Tk variables on the main thread
+        roots = [(root.local_path, root.exclude) for root in self.get_sync_roots(enabled_only=True)
+                 if root.local_path]
+        max_backups = self.max_backups.get()
+        
+        def full_backup_thread():
+            self.root.after(0, lambda: self.status_var.set("Creating full backup..."))
+            
+            yaml_files = []
+            seen = set()
+            for local_path, exclude in roots:
+                for rel in scan_sync_tree(local_path, ("*.yaml", "*.yml"), exclude):
+                    path = os.path.normpath(os.path.join(local_path, *rel.split('/')))
+                    if path not in seen:  # Nested roots list the same files twice
+                        seen.add(path)
+                        yaml_files.append(path)
+            
+            if not yaml_files:
+                self.root.after(0, lambda: self.status_var.set("No YAML files found in the configured local paths"))
+                return
+            
+            summary = full_backup(yaml_files, self.backup_base_path)
+            backed_up = summary['backed_up']
+            throughput = (f"{summary['scanned']} files in {summary['elapsed']:.1f}s "
+                          f"({summary['files_per_sec']:.0f} files/s, {summary['mb_per_sec']:.1f} MB/s)")
+            self.log_message(f">>> Full backup: {len(backed_up)} changed, {summary['unchanged']} unchanged, "
+                             f"{throughput}", "auto")
+            for path in summary['skipped_duplicates']:
+                self.log_message(f"  Skipped {path}: another file with the same name is already backed up", "auto")
+            if summary['failed']:
+                self.log_message(f"  Failed: {', '.join(summary['failed'])}", "auto")
+            
+            if backed_up:
+                # Clean up old backups of the files just backed up
+                cleanup_old_backups(self.backup_base_path, max_backups, set(backed_up))
+            
+            def finish():
+                if backed_up:
+                    self.last_backup_time = datetime.now().strftime("%H:%M:%S")
+                    self.backup_status_var.set(f"Full backup: {len(backed_up)} files")
+                    self.status_var.set(f"Full backup created: {len(backed_up)} changed files - {throughput}")
+                    self.populate_backup_tree(self.backup_tree)
+                    self.update_backup_total_size()
+                else:
+                    self.status_var.set(f"No files needed backup - {throughput}")
+            self.root.after(0, finish)
+        
+        threading.Thread(target=full_backup_thread, daemon=True).start()
+
+    def show_backup_search(self):
+        """Full-text search across every backed-up version"""
+        if not self.backup_base_path.exists():
+            messagebox.showinfo("Search Backups", "No backups yet")
+            return
+        store = get_backup_store(self.backup_base_path)
+        
+        window = tb.Toplevel(self.root)
+        window.title("Search Backup Contents")
+        window.geometry("1100x600")
+        window.transient(self.root)
+        
+        main_frame = tb.Frame(window, padding=10)
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        search_frame = tb.Frame(main_frame)
+        search_frame.pack(fill=X, pady=(0, 10))
+        
+        query_var = tk.StringVar()
+        tb.Label(search_frame, text="Find:").pack(side=LEFT)
+        query_entry = tb.Entry(search_frame, textvariable=query_var, width=50)
+        query_entry.pack(side=LEFT, padx=5, fill=X, expand=True)
+        
+        name_var = tk.StringVar(value="All files")
+        tb.Label(search_frame, text="In:").pack(side=LEFT, padx=(10, 0))
+        tb.Combobox(search_frame, textvariable=name_var, state="readonly", width=28,
+                    values=["All files"] + [name for name, _, _ in store.names()]).pack(side=LEFT, padx=5)
+        
+        status_var = tk.StringVar(value="All words must appear, e.g.  i2c sda GPIO21")
+        tb.Label(main_frame, textvariable=status_var, bootstyle="secondary").pack(anchor=W, pady=(0, 5))
+        
+        tree_frame = tb.Frame(main_frame)
+        tree_frame.pack(fill=BOTH, expand=True)
+        columns = ("File", "Backup Date", "Type", "Match")
+        results_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+        for col in columns:
+            results_tree.heading(col, text=col)
+        results_tree.column("File", width=180)
+        results_tree.column("Backup Date", width=140)
+        results_tree.column("Type", width=90)
+        results_tree.column("Match", width=640)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=VERTICAL, command=results_tree.yview)
+        results_tree.configure(yscroll=scrollbar.set)
+        results_tree.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        
+        results = {}
+        
+        def run_search(event=None):
+            text = query_var.get().strip()
+            if not text:
+                return
+            name = None if name_var.get() == "All files" else name_var.get()
+            status_var.set("Searching...")
+            def search_thread():
+                start = time.perf_counter()
+                try:
+                    found = store.search(text, name)
+                except sqlite3.OperationalError as e:
+                    message = f"Search failed: {e}"
+                    self.root.after(0, lambda: status_var.set(message))
+                    return
+                elapsed = (time.perf_counter() - start) * 1000
+                self.root.after(0, lambda: show_results(found, elapsed))
+            threading.Thread(target=search_thread, daemon=True).start()
+        
+        def show_results(found, elapsed):
+            if not window.winfo_exists():
+                return
+            results_tree.delete(*results_tree.get_children())
+            results.clear()
+            for backup_version in found:
+                backup_type = self.BACKUP_TAG_STYLES.get(backup_version['tag'], self.BACKUP_TAG_STYLES[None])[0]
+                item = results_tree.insert("", "end", values=(
+                    backup_version['name'], backup_version['created_at'].strftime("%Y-%m-%d %H:%M:%S"), backup_type, backup_version['snippet']))
+                results[item] = backup_version
+            status_var.set(f"{len(found)} version(s) found in {elapsed:.0f} ms"
+                           + ("" if store.fts_available else " (FTS5 unavailable - scanned contents)"))
+        
+        def selected_version():
+            selection = results_tree.selection()
+            return results.get(selection[0]) if selection else None
+        
+        def reveal():
+            backup_version = selected_version()
+            if backup_version:
+                self.reveal_backup_version(backup_version)
+        
+        def diff():
+            backup_version = selected_version()
+            if backup_version:
+                self.show_backup_diff(backup_version)
+        
+        query_entry.bind("<Return>", run_search)
+        results_tree.bind("<Double-1>", lambda e: diff())
+        tb.Button(search_frame, text="Search", command=run_search, bootstyle="primary").pack(side=LEFT, padx=5)
+        
+        button_frame = tb.Frame(main_frame)
+        button_frame.pack(fill=X, pady=(10, 0))
+        tb.Button(button_frame, text="Diff vs Current File", command=diff, bootstyle="info").pack(side=LEFT, padx=5)
+        tb.Button(button_frame, text="Show in Backup Tab", command=reveal, bootstyle="secondary").pack(side=LEFT, padx=5)
+        tb.Button(button_frame, text="Close", command=window.destroy, bootstyle="secondary").pack(side=RIGHT, padx=5)
+        
+        # Catch up on anything stored before the search index existed
+        def index_thread():
+            indexed = store.index_pending()
+            if indexed:
+                self.root.after(0, lambda: status_var.set(f"Indexed {indexed} older backup version(s) - ready"))
+        threading.Thread(target=index_thread, daemon=True).start()
+        query_entry.focus_set()
+
+    def reveal_backup_version(self, version):
+        """Switch to the Backup tab and select a version, loading its folder's pages as needed"""
+        tree = self.backup_tree
+        self.notebook.select(self.backup_tab)
+        folders = getattr(self, 'backup_tree_folders', {})
+        folder_item = next((iid for iid, info in folders.items() if info['name'] == version['name']), None)
+        if folder_item is None:
+            self.populate_backup_tree(tree)
+            folders = self.backup_tree_folders
+            folder_item = next((iid for iid, info in folders.items() if info['name'] == version['name']), None)
+            if folder_item is None:
+                return
+        tree.item(folder_item, open=True)
+        if folders[folder_item]['loaded'] == 0:
+            self.load_backup_folder_page(tree, folder_item)
+        while True:
+            match = next((item for item in tree.get_children(folder_item)
+                          if str(tree.item(item)['values'][4]) == version['ref']), None)
+            if match or folders[folder_item]['loaded'] >= folders[folder_item]['count']:
+                break
+            self.load_backup_folder_page(tree, folder_item)
+        if match:
+            tree.selection_set([match])
+            tree.see(match)
+
+    def current_file_for_backup(self, name):
+        """Best guess at the working copy a backup belongs to (current file, else the local mirror)"""
+        if self.file_path.get() and os.path.basename(self.file_path.get()) == name:
+            return self.file_path.get()
+        for root in self.get_sync_roots():
+            candidate = os.path.join(root.local_path, name)
+            if root.local_path and os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def diff_selected_backup(self, tree):
+        """Diff the selected backup against its current file"""
+        version_ids = self.get_selected_backup_paths(tree)
+        if not version_ids:
+            messagebox.showwarning("No Selection", "Please select a backup file to compare")
+            return
+        version = get_backup_store(self.backup_base_path).get(version_ids[0])
+        if version:
+            self.show_backup_diff(version)
+
+    def show_backup_diff(self, version):
+        """Unified diff between a backup version and the current file"""
+        current_path = self.current_file_for_backup(version['name'])
+        if not current_path:
+            current_path = filedialog.askopenfilename(title=f"Current file to compare with {version['name']}",
+                                                      filetypes=[("YAML files", "*.yaml *.yml"), ("All files", "*.*")])
+            if not current_path:
+                return
+        try:
+            old_text = get_backup_store(self.backup_base_path).read(version['id']).decode('utf-8', errors='replace')
+            with open(current_path, 'r', encoding='utf-8', errors='replace') as f:
+                new_text = f.read()
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not compare: {e}")
+            return
+        
+        diff_lines = list(difflib.unified_diff(old_text.splitlines(), new_text.splitlines(),
+                                               fromfile=f"backup {version['label']}", tofile=current_path, lineterm=""))
+        
+        diff_win = tb.Toplevel(self.root)
+        diff_win.title(f"Diff: {version['label']} vs current")
+        diff_win.geometry("1000x650")
+        
+        tb.Label(diff_win, text=f"{version['label']}  →  {current_path}", 
+                font=('Arial', 11, 'bold'), bootstyle="info").pack(pady=10)
+        
+        text = scrolledtext.ScrolledText(diff_win, wrap=tk.NONE, font=('Consolas', 9))
+        text.pack(fill=BOTH, expand=True, padx=10, pady=5)
+        text.tag_configure("added", foreground="#90ee90")
+        text.tag_configure("removed", foreground="#ff6b6b")
+        text.tag_configure("hunk", foreground="#5bc0de")
+        if not diff_lines:
+            text.insert(tk.END, "No differences - the current file matches this backup.")
+        for line in diff_lines:
+            if line.startswith('@@'):
+                tag = "hunk"
+            elif line.startswith('+') and not line.startswith('+++'):
+                tag = "added"
+            elif line.startswith('-') and not line.startswith('---'):
+                tag = "removed"
             else:
-                self.status_var.set("No files needed backup")
+                tag = None
+            text.insert(tk.END, line + "\n", tag)
+        text.config(state='disabled')
         
-        threading.Thread(target=full_backup_thread, daemon=True).start()
+        button_frame = tb.Frame(diff_win)
+        button_frame.pack(pady=10)
+        tb.Button(button_frame, text="Show in Backup Tab", command=lambda: self.reveal_backup_version(version), 
+                  bootstyle="secondary").pack(side=LEFT, padx=5)
+        tb.Button(button_frame, text="Close", command=diff_win.destroy, bootstyle="secondary").pack(side=LEFT, padx=5)
+
+    def export_plain_backups(self, tree):
+        """Export backups as readable <name>/<name>.<timestamp> files (selected files' folders, or everything)"""
+        names = None
+        store = get_backup_store(self.backup_base_path)
+        selected_ids = self.get_selected_backup_paths(tree)
+        folders = getattr(self, 'backup_tree_folders', {})
+        selected_folders = [folders[item]['name'] for item in tree.selection() if item in folders]
+        if selected_ids or selected_folders:
+            names = {store.get(version_id)['name'] for version_id in selected_ids}
+            names.update(selected_folders)
+        
+        dest_dir = filedialog.askdirectory(title="Export backups to...")
+        if not dest_dir:
+            return
+        
+        def export_thread():
+            written = store.export_plain(dest_dir, names)
+            self.root.after(0, lambda: self.log_message(f">>> Exported {written} backup(s) to {dest_dir}", "auto"))
+            self.root.after(0, lambda: messagebox.showinfo("Export Complete", f"Exported {written} backup(s) to:\n{dest_dir}"))
+        
+        threading.Thread(target=export_thread, daemon=True).start()
 
     def cleanup_backups(self, tree):
         """Clean up old backups"""
@@ -2873,6 +6048,9 @@ class ModernESPHomeGUI:
             ("Update ESPHome", self.update_esphome, "success"),
             ("Scan COM Ports", self.scan_ports, "secondary"),
             ("Scan OTA Devices", self.scan_ips, "secondary"),
+            ("Sweep Subnet for Devices", self.sweep_subnet_dialog, "secondary"),
+            ("Workspace Sync Status", self.show_sync_status_dashboard, "info"),
+            ("Sync Dry Run", self.show_sync_plan_dialog, "info"),
             ("Clean Build Directory", self.clean_build, "warning"),
         ]
         
@@ -2893,6 +6071,30 @@ class ModernESPHomeGUI:
         local_entry = tb.Entry(settings_frame, textvariable=self.sync_local_path, width=35)
         local_entry.pack(fill=X, pady=(2, 8))
         
+        # Include/exclude filters for the primary root (comma separated globs)
+        tb.Label(settings_frame, text="Include Patterns (blank = YAML + resources):", bootstyle="info").pack(anchor=W)
+        tb.Entry(settings_frame, textvariable=self.sync_include_patterns, width=35).pack(fill=X, pady=(2, 8))
+        tb.Label(settings_frame, text="Exclude Patterns (e.g. archive, *.bak.yaml):", bootstyle="info").pack(anchor=W)
+        tb.Entry(settings_frame, textvariable=self.sync_exclude_patterns, width=35).pack(fill=X, pady=(2, 8))
+        
+        tb.Button(settings_frame, text="Additional Sync Roots...", command=self.show_sync_roots_dialog,
+                  bootstyle="info-outline").pack(fill=X, pady=(0, 8))
+        
+        # Offline mode
+        tb.Checkbutton(settings_frame, text="Offline mode (build from local mirror)", 
+                    variable=self.offline_mode, bootstyle="warning-round-toggle").pack(anchor=W, pady=(0, 8))
+        
+        # Full sync transport
+        tb.Label(settings_frame, text="Full Sync Transport:", bootstyle="info").pack(anchor=W)
+        tb.Combobox(settings_frame, textvariable=self.sync_transport, values=SYNC_TRANSPORTS,
+                    state="readonly", width=33).pack(fill=X, pady=(2, 8))
+        
+        tb.Label(settings_frame, text="Bundle Helper URL (e.g. http://192.168.4.76:8765):", bootstyle="info").pack(anchor=W)
+        tb.Entry(settings_frame, textvariable=self.sync_helper_url, width=35).pack(fill=X, pady=(2, 8))
+        
+        tb.Label(settings_frame, text="Bundle Helper Token:", bootstyle="info").pack(anchor=W)
+        tb.Entry(settings_frame, textvariable=self.sync_helper_token, width=35, show="*").pack(fill=X, pady=(2, 8))
+        
         # Save button
         tb.Button(settings_frame, text="Save Settings", 
                 command=self.save_settings, bootstyle="success", width=15).pack(pady=5)
@@ -2912,6 +6114,12 @@ class ModernESPHomeGUI:
         self.storage_status_label = tb.Label(current_file_frame, text="No data stored", bootstyle="secondary")
         self.storage_status_label.pack(anchor=W, pady=2)
         
+        ttl_frame = tb.Frame(current_file_frame)
+        ttl_frame.pack(anchor=W, pady=2)
+        tb.Label(ttl_frame, text="Revalidate device info older than (hours):").pack(side=LEFT)
+        tb.Spinbox(ttl_frame, from_=1, to=720, width=6,
+                   textvariable=self.device_info_ttl_hours).pack(side=LEFT, padx=5)
+        
         # Update current file info
         if self.file_path.get():
             self.update_storage_status()
@@ -3273,6 +6481,7 @@ class ModernESPHomeGUI:
         self.firmware_max_size = "N/A"
         self.firmware_percentage = "N/A"
         self.last_sync_time = None
+        self.last_sync_metrics = None
         self.synced_files = []
         self.esphome_versions = {}
         self.versions_base_path = Path("C:/esphome_versions")
@@ -3280,6 +6489,11 @@ class ModernESPHomeGUI:
         self.last_backup_time = None
         self.backup_enabled = tk.BooleanVar(value=True)
         self.max_backups = tk.IntVar(value=10)
+        self.backup_verify_on_startup = tk.BooleanVar(value=True)
+        self.backup_pack_after_days = tk.IntVar(value=BACKUP_PACK_AFTER_DAYS)  # 0 = never pack automatically
+        self.device_info_ttl_hours = tk.IntVar(value=DEVICE_INFO_TTL_HOURS)
+        self.device_info_inflight = set()  # YAML keys with a collection running
+        self.sweep_networks = tk.StringVar()  # CIDRs for the subnet sweep, blank = this machine's /24
         self.ip_list_var = tk.StringVar()
         self.timer_var = tk.StringVar(value="00:00")
         self.timer_running = False
@@ -3291,6 +6505,17 @@ class ModernESPHomeGUI:
         # Sync path configuration (configurable in Tools tab)
         self.sync_source_path = tk.StringVar(value=r"\\192.168.4.76\config\esphome")
         self.sync_local_path = tk.StringVar(value=r"C:\esphome")
+        # Offline mode builds straight from the local mirror without touching the share
+        self.offline_mode = tk.BooleanVar(value=False)
+        # Transport for full workspace syncs (see SYNC_TRANSPORTS)
+        self.sync_transport = tk.StringVar(value="Per-file")
+        self.sync_helper_url = tk.StringVar(value="")
+        self.sync_helper_token = tk.StringVar(value="")
+        # Filters for the primary root above; extra roots (other hosts, shared packages) carry their own
+        self.sync_include_patterns = tk.StringVar(value="")
+        self.sync_exclude_patterns = tk.StringVar(value="")
+        self.extra_sync_roots = []
+        self.sync_manifests = {}
 
 
         # Add these for process control
@@ -3376,6 +6601,252 @@ class ModernESPHomeGUI:
         # Force a fresh device info collection
         self.get_device_info_for_selected_file(force_refresh=True)
 
+    FLEET_REFRESH_PARALLEL = 8
+
+    def fleet_refresh_targets(self, devices, yaml_files, selected=None):
+        """(yaml_path, ip, stored info) for every known config with a reachable device
+
+        A config matches a discovered device by file name, by the device name in its build
+        record or by the hostname stored for it (hyphens and underscores are interchangeable).
+        selected is (yaml_key, ip) for the open file, which keeps its entered IP; otherwise the
+        build record's address is used.
+        """
+        def normalize(name):
+            return str(name).lower().replace('_', '-')
+        
+        ip_by_name = {normalize(name): ip for name, ip in devices}
+        stored = self.data_manager.load_devices_data()
+        targets = []
+        for yaml_path in yaml_files:
+            previous = stored.get(self.data_manager.get_yaml_key(yaml_path), {}).get('device_info')
+            ip = (ip_by_name.get(normalize(Path(yaml_path).stem)) or
+                  ip_by_name.get(normalize(storage_reader.device_facts(yaml_path)['host_name'])))
+            if not ip and previous:
+                ip = ip_by_name.get(normalize(previous.get('host_name', '')))
+            if not ip and selected and selected[1] and selected[0] == yaml_path:
+                ip = selected[1]
+            if not ip:
+                ip = storage_reader.address(yaml_path)  # Static IPs / .local names from the last build
+            if ip:
+                targets.append((yaml_path, ip, previous))
+        return targets
+
+    def refresh_all_devices(self):
+        """Refresh device info for every known config/device pair, several at a time"""
+        roots = [(root.local_path, root.exclude) for root in self.get_sync_roots(enabled_only=True) if root.local_path]
+        stored_paths = [path for path in self.data_manager.load_devices_data() if os.path.exists(path)]
+        current = self.data_manager.get_yaml_key(self.file_path.get()) if self.file_path.get() else None
+        selected = (current, self.ota_ip_var.get().strip())
+        stop_event = threading.Event()
+        
+        window = tb.Toplevel(self.root)
+        window.title("Refresh All Devices")
+        window.geometry("900x550")
+        window.transient(self.root)
+        
+        main_frame = tb.Frame(window, padding=10)
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        summary_var = tk.StringVar(value="Discovering devices...")
+        tb.Label(main_frame, textvariable=summary_var, bootstyle="info").pack(anchor=W, pady=(0, 5))
+        overall = tb.Progressbar(main_frame, mode="determinate", bootstyle="success-striped")
+        overall.pack(fill=X, pady=(0, 10))
+        
+        columns = ("Device", "IP", "Progress", "Status", "Firmware")
+        tree = tb.Treeview(main_frame, columns=columns, show="headings", height=16)
+        for column, width in zip(columns, (200, 130, 80, 260, 120)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width, anchor=W)
+        tree.pack(fill=BOTH, expand=True)
+        
+        button_frame = tb.Frame(main_frame)
+        button_frame.pack(fill=X, pady=(10, 0))
+        cancel_btn = tb.Button(button_frame, text="Cancel Remaining", bootstyle="danger-outline",
+                               command=lambda: (stop_event.set(), cancel_btn.configure(state="disabled")))
+        cancel_btn.pack(side=LEFT)
+        tb.Button(button_frame, text="Close", bootstyle="secondary",
+                  command=lambda: (stop_event.set(), window.destroy())).pack(side=RIGHT)
+        
+        def ui(callback):
+            # The window may be closed while workers are still reporting
+            self.root.after(0, lambda: callback() if window.winfo_exists() else None)
+        
+        def fleet_thread():
+            start = time.perf_counter()
+            # Keys are resolved paths, the same form the device store uses
+            yaml_files = set(stored_paths)
+            if current and os.path.exists(current):
+                yaml_files.add(current)
+            for local_path, exclude in roots:
+                for rel in scan_sync_tree(local_path, ("*.yaml", "*.yml"), exclude):
+                    if os.path.basename(rel) != "secrets.yaml":
+                        yaml_files.add(self.data_manager.get_yaml_key(os.path.join(local_path, *rel.split('/'))))
+            devices = discover_esphome_devices()
+            targets = self.fleet_refresh_targets(devices, sorted(yaml_files), selected)
+            if not targets:
+                ui(lambda: summary_var.set(f"No configs matched any of the {len(devices)} discovered device(s)"))
+                return
+            
+            def add_rows():
+                for yaml_path, ip, previous in targets:
+                    tree.insert("", END, iid=yaml_path, values=(Path(yaml_path).stem, ip, "0%", "Queued",
+                                                                (previous or {}).get('firmware_version', '')))
+                overall.configure(maximum=len(targets), value=0)
+                summary_var.set(f"Refreshing {len(targets)} device(s), {min(self.FLEET_REFRESH_PARALLEL, len(targets))} at a time...")
+            ui(add_rows)
+            
+            last_report = {}
+            finished = []
+            report_lock = Lock()
+            
+            def device_callback(yaml_path, percent, status):
+                # Log scraping reports every line - pass at most ~5 updates a second per device
+                now = time.monotonic()
+                done = status in ("Done", "Failed", "Skipped")
+                with report_lock:
+                    if not done and now - last_report.get(yaml_path, 0) < 0.2:
+                        return
+                    last_report[yaml_path] = now
+                    if done:
+                        finished.append(yaml_path)
+                    count = len(finished)
+                
+                def update():
+                    if tree.exists(yaml_path):
+                        tree.set(yaml_path, "Progress", f"{percent:.0f}%")
+                        tree.set(yaml_path, "Status", status)
+                    if done:
+                        overall.configure(value=count)
+                ui(update)
+            
+            results = refresh_devices(targets, device_callback, self.FLEET_REFRESH_PARALLEL, stop_event)
+            collected = self.data_manager.save_device_info_batch({path: info for path, info in results.items() if info})
+            elapsed = time.perf_counter() - start
+            
+            def finish():
+                for path, info in collected.items():
+                    if tree.exists(path):
+                        tree.set(path, "Firmware", info.get('firmware_version', 'N/A'))
+                summary_var.set(f"Refreshed {len(collected)} of {len(targets)} device(s) in {elapsed:.0f}s")
+                cancel_btn.configure(state="disabled")
+            ui(finish)
+            
+            self.log_message(f">>> Fleet refresh: {len(collected)}/{len(targets)} device(s) updated in {elapsed:.1f}s", "auto")
+            if current in collected:
+                self.root.after(0, lambda: self.update_device_info_display(collected[current]))
+        
+        threading.Thread(target=fleet_thread, daemon=True).start()
+
+    def sweep_subnet_dialog(self):
+        """Probe the OTA/API ports across one or more subnets for devices mDNS doesn't show"""
+        if not self.sweep_networks.get().strip():
+            self.sweep_networks.set(local_subnet())
+        stop_event = threading.Event()
+        
+        window = tb.Toplevel(self.root)
+        window.title("Sweep Subnet for Devices")
+        window.geometry("800x500")
+        window.transient(self.root)
+        
+        main_frame = tb.Frame(window, padding=10)
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        entry_frame = tb.Frame(main_frame)
+        entry_frame.pack(fill=X, pady=(0, 5))
+        tb.Label(entry_frame, text="Networks (e.g. 192.168.1.0/24, 10.0.5.0/24):", bootstyle="info").pack(side=LEFT)
+        tb.Entry(entry_frame, textvariable=self.sweep_networks, width=40).pack(side=LEFT, fill=X, expand=True, padx=5)
+        start_btn = tb.Button(entry_frame, text="Start Sweep", bootstyle="success")
+        start_btn.pack(side=LEFT)
+        
+        summary_var = tk.StringVar(value=f"Probes ports {', '.join(str(p) for p in SWEEP_PORTS)} on every address")
+        tb.Label(main_frame, textvariable=summary_var, bootstyle="info").pack(anchor=W, pady=(0, 5))
+        progress = tb.Progressbar(main_frame, mode="determinate", bootstyle="success-striped")
+        progress.pack(fill=X, pady=(0, 10))
+        
+        columns = ("IP", "Name", "Open Ports", "ESPHome")
+        tree = tb.Treeview(main_frame, columns=columns, show="headings", height=14)
+        for column, width in zip(columns, (130, 220, 160, 120)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width, anchor=W)
+        tree.tag_configure("unverified", foreground="gray")  # Port open, but no ESPHome answer - not registered
+        tree.pack(fill=BOTH, expand=True)
+        
+        button_frame = tb.Frame(main_frame)
+        button_frame.pack(fill=X, pady=(10, 0))
+        cancel_btn = tb.Button(button_frame, text="Cancel", bootstyle="danger-outline", state="disabled",
+                               command=lambda: (stop_event.set(), cancel_btn.configure(state="disabled")))
+        cancel_btn.pack(side=LEFT)
+        tb.Button(button_frame, text="Close", bootstyle="secondary",
+                  command=lambda: (stop_event.set(), window.destroy())).pack(side=RIGHT)
+        
+        def ui(callback):
+            self.root.after(0, lambda: callback() if window.winfo_exists() else None)
+        
+        def start():
+            networks = self.sweep_networks.get().strip()
+            try:
+                hosts = sweep_targets(networks)
+            except ValueError as e:
+                messagebox.showerror("Invalid Network", str(e), parent=window)
+                return
+            if not hosts:
+                return
+            stop_event.clear()
+            tree.delete(*tree.get_children())
+            start_btn.configure(state="disabled")
+            cancel_btn.configure(state="normal")
+            progress.configure(maximum=len(hosts), value=0)
+            summary_var.set(f"Sweeping {len(hosts)} address(es)...")
+            self.save_settings()
+            threading.Thread(target=sweep_thread, args=(networks, len(hosts)), daemon=True).start()
+        
+        def sweep_thread(networks, total):
+            began = time.perf_counter()
+            last_report = [0.0]
+            
+            def on_found(host, open_ports, hello):
+                if not hello:
+                    identity = "unverified"
+                elif hello.get('ota_version'):
+                    identity = f"OTA v{hello['ota_version']}"
+                else:
+                    identity = hello.get('version') or "API"
+                values = (host, (hello or {}).get('name') or device_registry.name_for_address(host) or "",
+                          ", ".join(str(p) for p in open_ports), identity)
+                ui(lambda: tree.insert("", END, values=values, tags=() if hello else ("unverified",)))
+            
+            def on_progress(checked, count):
+                now = time.monotonic()
+                if checked < count and now - last_report[0] < 0.1:
+                    return
+                last_report[0] = now
+                ui(lambda: (progress.configure(value=checked),
+                            summary_var.set(f"Checked {checked} of {count} address(es)...")))
+            
+            try:
+                found = sweep_subnet(networks, device_registry, found_callback=on_found,
+                                     progress_callback=on_progress, stop_event=stop_event)
+            except Exception as e:
+                message = f"Sweep failed: {e}"
+                ui(lambda: summary_var.set(message))
+                found = None
+            elapsed = time.perf_counter() - began
+            
+            verified = sum(1 for _, _, hello in found if hello) if found else 0
+
+            def finish():
+                start_btn.configure(state="normal")
+                cancel_btn.configure(state="disabled")
+                if found is not None:
+                    state = "cancelled" if stop_event.is_set() else "finished"
+                    summary_var.set(f"Sweep {state}: {verified} device(s), {len(found) - verified} unverified host(s) "
+                                    f"in {total} address(es), {elapsed:.1f}s")
+            ui(finish)
+            if verified:
+                self.log_message(f">>> Subnet sweep found {verified} device(s) in {networks}", "auto")
+        
+        start_btn.configure(command=start)
+
     def stop_device_info_check(self):
         """Stop the device info collection"""
         self.device_info_stop_requested = True
@@ -3477,11 +6948,8 @@ class ModernESPHomeGUI:
             # Ensure we have the latest version list before getting device info
             self.scan_esphome_versions()
             
-            # Only auto-check device if we have an IP and no stored data
-            stored_info = self.data_manager.get_device_info(filename)
-            if not stored_info and self.ota_ip_var.get():
-                self.device_check_status.configure(text="Auto-checking device...", bootstyle="warning")
-                self.get_device_info_for_selected_file(force_refresh=True)
+            # Cached info shows at once; a collection runs only if it is missing or stale
+            self.get_device_info_for_selected_file()
 
     def load_stored_data(self, yaml_path):
         """Load stored device info and upload history for a YAML file - clear display if no data"""
@@ -3513,10 +6981,6 @@ class ModernESPHomeGUI:
             self.update_device_info_display(device_info)
         else:
             self.log_message(">>> No stored device information found", "auto")
-            # Auto-start device info collection if we have an IP
-            if self.ota_ip_var.get():
-                self.device_check_status.configure(text="Auto-checking device...", bootstyle="warning")
-                self.get_device_info_for_selected_file()
         
         # Load upload history
         upload_history = self.data_manager.get_upload_history(yaml_path)
@@ -3581,121 +7045,76 @@ class ModernESPHomeGUI:
                 }
                 self.update_history_display()
 
+    @staticmethod
+    def empty_device_info(value='N/A'):
+        return {field: value for field in DeviceLogParser.RESULT_FIELDS}
+
     def get_device_info_for_selected_file(self, force_refresh=False):
-        """Get device information for the selected YAML file with progress"""
+        """Show device information for the selected YAML file, collecting it when missing or stale
+
+        Stored values are displayed at once; when they are older than the TTL or an upload
+        happened since they were read, a collection runs in the background (stale-while-revalidate).
+        """
         yaml_path = self.file_path.get()
         ip = self.ota_ip_var.get().strip()
+        revalidate = False
+        use_api = True
+        
+        # The last build's record supplies an address when none has been entered or discovered
+        if yaml_path and not ip:
+            ip = storage_reader.address(yaml_path)
+            if ip:
+                self.ota_ip_var.set(ip)
 
-        # If we're not forcing a refresh, try to load from storage first
+        # If we're not forcing a refresh, show what is stored and decide whether it is still fresh
         if not force_refresh:
-            stored_info = self.data_manager.get_device_info(yaml_path)
-            stored_history = self.data_manager.get_upload_history(yaml_path)
-            
-            # Check if firmware versions match between stored device info and last upload
-            if stored_info and stored_history:
-                device_fw = stored_info.get('firmware_version', 'N/A')
-                upload_fw = stored_history.get('last_upload', {}).get('version', 'N/A')
-                
-                # If versions don't match, mark device info as potentially outdated
-                if device_fw != upload_fw and upload_fw != 'N/A' and device_fw != 'N/A':
-                    self.device_check_status.configure(
-                        text="Device info may be outdated", 
-                        bootstyle="warning"
-                    )
+            entry = self.data_manager.get_device_entry(yaml_path) if yaml_path else None
+            stored_history = self.data_manager.get_upload_history(yaml_path) if yaml_path else None
             
-            if stored_info and not force_refresh:
+            if entry and entry.get('device_info'):
                 self.log_message(">>> Loaded device info from storage", "auto")
-                self.update_device_info_display(stored_info)
+                self.update_device_info_display(entry['device_info'])
                 if stored_history:
                     self.log_message(">>> Loaded upload history from storage", "auto")
                     self.set_build_history(stored_history)
                     self.update_history_display()
-                return
+                
+                reason = device_info_staleness(entry, self.device_info_ttl_hours.get() * 3600,
+                                               (stored_history or {}).get('last_upload'))
+                if not reason:
+                    self.device_check_status.configure(
+                        text=f"Cached ({format_age(device_info_age(entry))} old)", bootstyle="success")
+                    return
+                if not ip:
+                    self.device_check_status.configure(text=f"Cached, stale: {reason}", bootstyle="warning")
+                    return
+                self.log_message(f">>> Device info is stale ({reason}) - revalidating in background", "auto")
+                revalidate = True
+                use_api = reason != DEVICE_INFO_HARDWARE_EXPIRED
+            elif yaml_path and storage_reader.read(yaml_path):
+                # Never queried, but compiled here: show the build record's facts while the device is asked
+                facts = storage_reader.device_facts(yaml_path)
+                self.update_device_info_display({**self.empty_device_info(), **facts})
+                self.log_message(">>> Loaded build facts from .esphome/storage - querying device for the rest", "auto")
+                revalidate = True
         
         # If no stored data or forcing refresh, proceed with collection
         self.device_info_stop_requested = False
 
         if not yaml_path or not ip:
-            self.update_device_info_display({
-                'firmware_version': 'N/A',
-                'host_name': 'N/A', 
-                'wifi_ssid': 'N/A',
-                'local_mac': 'N/A',
-                'wifi_signal': 'N/A',
-                'chip': 'N/A',
-                'frequency': 'N/A',
-                'framework': 'N/A',
-                'psram_size': 'N/A',
-                'flash_size': 'N/A'
-            })
+            if not revalidate:
+                self.update_device_info_display(self.empty_device_info())
             self.refresh_device_btn.configure(state="normal")
             self.device_check_status.configure(text="No file/device", bootstyle="secondary")
             return
-            
-        def progress_callback(progress, status):
-            """Update progress bar and status from worker thread"""
-            self.root.after(0, lambda: self.update_progress(progress))
-            self.root.after(0, lambda: self.status_var.set(status))
-            self.root.after(0, lambda: self.update_phase_label(status))
-            self.root.after(0, lambda: self.device_check_status.configure(text=status, bootstyle="info"))
-
-        def device_info_thread():
-            self.root.after(0, lambda: self.update_progress(0))
-            device_info = get_device_info_with_progress(yaml_path, ip, progress_callback)
-            
-            if device_info and not self.device_info_stop_requested:
-                # Save to storage
-                self.data_manager.save_device_info(yaml_path, device_info)
-                self.root.after(0, lambda: self.update_device_info_display(device_info))
-                self.root.after(0, lambda: self.status_var.set("Device information complete"))
-                self.root.after(0, lambda: self.update_phase_label("Done"))
-                self.root.after(0, lambda: self.device_check_status.configure(text="Complete", bootstyle="success"))
-                
-                # Auto-select matching ESPHome version
-                if device_info['firmware_version'] != 'N/A' and device_info['firmware_version'] != 'Error':
-                    self.auto_select_esphome_version(device_info['firmware_version'])
-            else:
-                if not self.device_info_stop_requested:
-                    self.root.after(0, lambda: self.update_device_info_display({
-                        'firmware_version': 'Error',
-                        'host_name': 'Error',
-                        'wifi_ssid': 'Error',
-                        'local_mac': 'Error', 
-                        'wifi_signal': 'Error',
-                        'chip': 'Error',
-                        'frequency': 'Error',
-                        'framework': 'Error',
-                        'psram_size': 'Error',
-                        'flash_size': 'Error'
-                    }))
-                    self.root.after(0, lambda: self.status_var.set("Failed to get device information"))
-                    self.root.after(0, lambda: self.update_phase_label("Error"))
-                    self.root.after(0, lambda: self.device_check_status.configure(text="Failed", bootstyle="danger"))
-            
-            # Reset buttons when done
-            self.root.after(0, lambda: self.refresh_device_btn.configure(state="normal"))
-
-            # Reset progress after a short delay
-            self.root.after(2000, lambda: self.update_progress(0))
-                        
-        threading.Thread(target=device_info_thread, daemon=True).start()
-
-        if not yaml_path or not ip:
-            self.update_device_info_display({
-                'firmware_version': 'N/A',
-                'host_name': 'N/A', 
-                'wifi_ssid': 'N/A',
-                'local_mac': 'N/A',
-                'wifi_signal': 'N/A',
-                'chip': 'N/A',
-                'frequency': 'N/A',
-                'framework': 'N/A',
-                'psram_size': 'N/A',
-                'flash_size': 'N/A'
-            })
-            self.refresh_device_btn.configure(state="normal")
-            self.device_check_status.configure(text="No file/device", bootstyle="secondary")
+        
+        # One collection per config at a time (selection, auto-check and refresh can overlap)
+        key = self.data_manager.get_yaml_key(yaml_path)
+        if key in self.device_info_inflight:
             return
+        self.device_info_inflight.add(key)
+        if revalidate:
+            self.device_check_status.configure(text="Cached, revalidating...", bootstyle="info")
             
         def progress_callback(progress, status):
             """Update progress bar and status from worker thread"""
@@ -3706,11 +7125,14 @@ class ModernESPHomeGUI:
 
         def device_info_thread():
             self.root.after(0, lambda: self.update_progress(0))
-            device_info = get_device_info_with_progress(yaml_path, ip, progress_callback)
+            try:
+                device_info = get_device_info_with_progress(yaml_path, ip, progress_callback, use_api=use_api)
+            finally:
+                self.device_info_inflight.discard(key)
             
             if device_info and not self.device_info_stop_requested:
-                # Save to storage
-                self.data_manager.save_device_info(yaml_path, device_info)
+                # Save to storage - fields this collection could not read keep their stored value
+                device_info = self.data_manager.save_device_info(yaml_path, device_info) or device_info
                 self.root.after(0, lambda: self.update_device_info_display(device_info))
                 self.root.after(0, lambda: self.status_var.set("Device information complete"))
                 self.root.after(0, lambda: self.update_phase_label("Done"))
@@ -3719,6 +7141,11 @@ class ModernESPHomeGUI:
                 # Auto-select matching ESPHome version
                 if device_info['firmware_version'] != 'N/A' and device_info['firmware_version'] != 'Error':
                     self.auto_select_esphome_version(device_info['firmware_version'])
+            elif revalidate and not self.device_info_stop_requested:
+                # Keep showing the cached values rather than replacing them with errors
+                self.root.after(0, lambda: self.status_var.set("Device unreachable - showing cached information"))
+                self.root.after(0, lambda: self.update_phase_label("Cached"))
+                self.root.after(0, lambda: self.device_check_status.configure(text="Refresh failed, showing cached", bootstyle="warning"))
             else:
                 if not self.device_info_stop_requested:
                     self.root.after(0, lambda: self.update_device_info_display({
@@ -3951,31 +7378,77 @@ class ModernESPHomeGUI:
             self.com_frame.grid()
 
     def scan_ips(self):
-        self.status_var.set("Scanning for OTA devices...")
-        devices = discover_esphome_devices()
-        devices.sort(key=lambda x: x[0])  # Sort by name
+        # The background registry already knows the devices - no waiting on the Tk thread
+        discovery_service.start()
+        devices = device_registry.devices(online_only=True)
+        remembered = [device for device in device_registry.devices() if device not in devices]
 
-        display_list = [f"{name} ({ip})" for name, ip in devices]
         ip_only_list = [ip for _, ip in devices]
 
-        self.ip_combo['values'] = display_list
+        self.refresh_ip_choices()
 
         yaml_name = os.path.splitext(os.path.basename(self.file_path.get()))[0] if self.file_path.get() else ""
+        # The device name from the last build may differ from the file name
+        built_name = storage_reader.device_facts(self.file_path.get())['host_name'] if self.file_path.get() else 'N/A'
+        built_address = storage_reader.address(self.file_path.get()) if self.file_path.get() else ""
 
         # Try to match YAML name after populating dropdown
         for name, ip in devices:
-            if name == yaml_name:
+            if name == yaml_name or name == built_name:
                 self.ota_ip_var.set(ip)
                 break
         else:
-            # Fallback to first device if no match
-            if ip_only_list:
+            # Fallback to the build's address, then to the device's address from an earlier
+            # session, then to the first device seen now - never to a remembered stranger
+            remembered_ip = next((ip for name, ip in remembered if name in (yaml_name, built_name)), None)
+            if built_address:
+                self.ota_ip_var.set(built_address)
+            elif remembered_ip:
+                self.ota_ip_var.set(remembered_ip)
+            elif ip_only_list:
                 self.ota_ip_var.set(ip_only_list[0])
 
-        if ip_only_list:
+        stale = device_registry.stale_count()
+        if ip_only_list and stale:
+            self.status_var.set(f"Found {len(ip_only_list)} OTA device(s), {stale} not yet seen this session")
+        elif ip_only_list:
             self.status_var.set(f"Found {len(ip_only_list)} OTA device(s)")
         else:
-            self.status_var.set("No OTA devices found")
+            self.status_var.set("No OTA devices found yet - discovery keeps listening in the background")
+
+    def refresh_ip_choices(self):
+        """Refill the OTA dropdown from the device registry"""
+        self.ip_refresh_pending = False
+        if not hasattr(self, 'ip_combo'):
+            return
+        self.ip_combo['values'] = [f"{name} ({ip})" for name, ip in device_registry.ranked_devices()]
+
+    def report_registry_reconcile(self):
+        """Log how the remembered devices compare with what mDNS has answered so far, and save"""
+        records = device_registry.snapshot()
+        stale = [record['name'] for record in records if record.get('stale')]
+        self.log_message(f">>> Device registry: {len(records) - len(stale)} device(s) confirmed, "
+                         f"{len(stale)} remembered but not seen yet", "auto")
+        if stale:
+            self.log_message(f">>> Not seen yet: {', '.join(stale[:10])}{' ...' if len(stale) > 10 else ''}", "auto")
+        threading.Thread(target=device_registry.save_cache, daemon=True).start()
+
+    def on_registry_changed(self):
+        """Registry listener - runs on a discovery thread, so hop to Tk and coalesce bursts"""
+        if getattr(self, 'ip_refresh_pending', False):
+            return
+        self.ip_refresh_pending = True
+        try:
+            self.root.after(250, self.refresh_ip_choices)
+        except Exception:
+            self.ip_refresh_pending = False
+
+    def resolve_upload_target(self, target):
+        """OTA target with a known IP substituted for a device name, logging the rewrite"""
+        address = host_resolver.resolve(target)
+        if address != target:
+            self.log_message(f">>> Upload target {target} -> {address} (cached address, no mDNS lookup)", "auto")
+        return address
 
     def scan_ports(self):
         """Scan for available COM ports"""
@@ -4004,7 +7477,6 @@ class ModernESPHomeGUI:
                 self.status_var.set("Process forcefully stopped")
                 self.update_phase_label("Stopped")
                 self.log_message(">>> Process forcefully terminated", "auto")
-                self.log_text.see(tk.END)
                 self.update_progress(0)
                 self.stop_timer()
                 self.error_indicator.configure(bootstyle="warning")
@@ -4058,8 +7530,9 @@ class ModernESPHomeGUI:
                 self.log_message( f">>> Backup created: {backup_path}", "auto")
                 self.status_var.set("Backup created successfully")
                 
-                # Clean up old backups
-                cleanup_old_backups(self.backup_base_path, self.max_backups.get())
+                # Clean up old backups (only this file's versions changed)
+                cleanup_old_backups(self.backup_base_path, self.max_backups.get(),
+                                    [os.path.basename(self.file_path.get())])
             else:
                 self.log_message( ">>> Backup failed", "auto")
                 self.status_var.set("Backup failed")
@@ -4079,17 +7552,15 @@ class ModernESPHomeGUI:
                 self.backup_status_var.set(f"Backup: Auto ({self.last_backup_time})")
                 self.log_message( f">>> Auto-backup created: {os.path.basename(backup_path)}", "auto")
             
-            # Clean up old backups
-            cleanup_old_backups(self.backup_base_path, self.max_backups.get())
+            # Clean up old backups (only this file's versions changed)
+            cleanup_old_backups(self.backup_base_path, self.max_backups.get(), [os.path.basename(file_path)])
 
     def sync_all_files(self):
         """Enhanced sync that includes all file types"""
         def sync_thread():
             self.status_var.set("Syncing all files...")
             # Use enhanced sync function with configurable paths
-            synced_files = sync_esphome_files(
-                self.sync_source_path.get(), 
-                self.sync_local_path.get(),
+            synced_files = self.sync_workspace_files(
                 self.backup_base_path if self.backup_enabled.get() else None
             )
             self.last_sync_time = datetime.now().strftime("%H:%M:%S")
@@ -4129,15 +7600,27 @@ class ModernESPHomeGUI:
             self.sync_indicator.configure(bootstyle="secondary")
             return False
         
-        filename = os.path.basename(self.file_path.get())
-        network_path = r"\\192.168.4.76\config\esphome"
-        local_path = r"C:\esphome"
+        # Files inside a root's local mirror keep their sub-folder, anything else maps by name
+        root, rel_path = self.root_for_file(self.file_path.get())
+        network_path = root.network_path
+        local_path = root.local_path
         
-        src = os.path.join(network_path, filename)
-        dst = os.path.join(local_path, filename)
+        src = os.path.join(network_path, rel_path)
+        dst = os.path.join(local_path, rel_path)
+        
+        if self.offline_mode.get():
+            self.sync_status_var.set("Sync: Offline mode")
+            self.sync_indicator.configure(bootstyle="warning")
+            return False
         
+        share = get_share_guard(network_path)
         try:
-            if not os.path.exists(src):
+            if not share.is_reachable():
+                self.sync_status_var.set(f"Sync: Share unreachable ({share.describe()})")
+                self.sync_indicator.configure(bootstyle="warning")
+                return False
+            
+            if not share.exists(src):
                 self.sync_status_var.set("Sync: Network file not found")
                 self.sync_indicator.configure(bootstyle="warning")
                 return False
@@ -4147,15 +7630,23 @@ class ModernESPHomeGUI:
                 self.sync_indicator.configure(bootstyle="danger")
                 return True
             
-            # Check if source is newer using checksum for better accuracy
-            src_checksum = get_file_checksum(src)
-            dst_checksum = get_file_checksum(dst)
+            # Different sizes means different content - no need to hash at all
+            src_stat = share.stat(src)
+            dst_stat = os.stat(dst)
+            if src_stat.st_size != dst_stat.st_size:
+                self.sync_status_var.set("Sync: Needs sync (content changed)")
+                self.sync_indicator.configure(bootstyle="danger")
+                return True
+            
+            # Check if source is newer using checksum for better accuracy (cached per size/mtime)
+            src_checksum = share.run(checksum_service.checksum, src, src_stat)
+            dst_checksum = checksum_service.checksum(dst, dst_stat)
             
             if src_checksum and dst_checksum and src_checksum != dst_checksum:
                 self.sync_status_var.set("Sync: Needs sync (content changed)")
                 self.sync_indicator.configure(bootstyle="danger")
                 return True
-            elif os.path.getmtime(src) > os.path.getmtime(dst):
+            elif src_stat.st_mtime > dst_stat.st_mtime:
                 self.sync_status_var.set("Sync: Needs sync (newer version)")
                 self.sync_indicator.configure(bootstyle="danger")
                 return True
@@ -4165,11 +7656,301 @@ class ModernESPHomeGUI:
                 self.sync_indicator.configure(bootstyle="success")
                 return False
                 
+        except ShareUnavailableError:
+            self.sync_status_var.set(f"Sync: Share unreachable ({share.describe()})")
+            self.sync_indicator.configure(bootstyle="warning")
+            return False
         except Exception as e:
             self.sync_status_var.set(f"Sync: Error checking")
             self.sync_indicator.configure(bootstyle="warning")
             return False
 
+    def get_sync_roots(self, enabled_only=False):
+        """Primary root (Tools tab paths) followed by the extra roots"""
+        primary = SyncRoot("Primary", self.sync_source_path.get(), self.sync_local_path.get(),
+                           self.sync_include_patterns.get(), self.sync_exclude_patterns.get(),
+                           helper_url=self.sync_helper_url.get().strip())
+        roots = [primary] + list(self.extra_sync_roots)
+        return [root for root in roots if root.enabled] if enabled_only else roots
+
+    def root_for_file(self, file_path):
+        """(root, rel_path) for a file - the root whose local mirror contains it, else primary by name"""
+        roots = self.get_sync_roots(enabled_only=True) or self.get_sync_roots()[:1]
+        # Prefer the most specific mirror when roots are nested (e.g. packages under the main config)
+        for root in sorted(roots, key=lambda r: len(os.path.abspath(r.local_path or '.')), reverse=True):
+            rel_path = root.relative_local_path(file_path)
+            if rel_path:
+                return root, rel_path
+        return roots[0], os.path.basename(file_path)
+
+    def get_sync_manifest(self, root=None):
+        """Return the sync manifest for a root (default: the primary root) - one manifest file per root"""
+        root = root or self.get_sync_roots()[0]
+        manifest = self.sync_manifests.get(root.key)
+        if manifest is None:
+            manifest = SyncManifest(root.network_path, root.local_path,
+                                    self.data_manager.data_dir / f"sync_manifest_{root.key}.json",
+                                    root.patterns, root.exclude)
+            self.sync_manifests[root.key] = manifest
+        return manifest
+
+    def show_sync_roots_dialog(self):
+        """Add, edit and remove the additional sync roots (other hosts, shared package repos)"""
+        window = tb.Toplevel(self.root)
+        window.title("Sync Roots")
+        window.geometry("900x520")
+        window.transient(self.root)
+        
+        main_frame = tb.Frame(window, padding=10)
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        tb.Label(main_frame, text="The primary root is set in Sync Settings. Roots below sync alongside it, in parallel.",
+                 bootstyle="secondary").pack(anchor=W, pady=(0, 5))
+        
+        columns = ("Name", "Source", "Local", "Include", "Exclude", "Enabled")
+        tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=8)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=110)
+        tree.column("Source", width=200)
+        tree.column("Local", width=180)
+        tree.column("Enabled", width=60)
+        tree.pack(fill=BOTH, expand=True)
+        
+        form = tb.Labelframe(main_frame, text="Root", padding=10, bootstyle="info")
+        form.pack(fill=X, pady=(10, 0))
+        fields = {
+            'name': tk.StringVar(),
+            'network_path': tk.StringVar(),
+            'local_path': tk.StringVar(),
+            'include': tk.StringVar(),
+            'exclude': tk.StringVar(),
+            'helper_url': tk.StringVar(),
+        }
+        enabled_var = tk.BooleanVar(value=True)
+        labels = [
+            ('name', "Name:"),
+            ('network_path', "Network Source Path:"),
+            ('local_path', "Local Destination Path:"),
+            ('include', "Include Patterns:"),
+            ('exclude', "Exclude Patterns:"),
+            ('helper_url', "Bundle Helper URL:"),
+        ]
+        for row, (key, text) in enumerate(labels):
+            tb.Label(form, text=text).grid(row=row, column=0, sticky=W, pady=2)
+            tb.Entry(form, textvariable=fields[key], width=60).grid(row=row, column=1, sticky=EW, pady=2, padx=5)
+        tb.Checkbutton(form, text="Enabled", variable=enabled_var,
+                       bootstyle="success-round-toggle").grid(row=len(labels), column=1, sticky=W, pady=2)
+        form.columnconfigure(1, weight=1)
+        
+        def populate():
+            tree.delete(*tree.get_children())
+            for index, root in enumerate(self.extra_sync_roots):
+                tree.insert("", "end", iid=str(index), values=(
+                    root.name, root.network_path, root.local_path,
+                    ", ".join(root.include) or "(default)", ", ".join(root.exclude) or "-",
+                    "Yes" if root.enabled else "No"
+                ))
+        
+        def on_select(event=None):
+            selection = tree.selection()
+            if not selection:
+                return
+            data = self.extra_sync_roots[int(selection[0])].to_dict()
+            for key, var in fields.items():
+                value = data[key]
+                var.set(", ".join(value) if isinstance(value, list) else value)
+            enabled_var.set(data['enabled'])
+        
+        def root_from_form():
+            name = fields['name'].get().strip()
+            if not name or not fields['network_path'].get().strip() or not fields['local_path'].get().strip():
+                messagebox.showwarning("Sync Roots", "Name, source path and local path are required", parent=window)
+                return None
+            return SyncRoot(name, fields['network_path'].get().strip(), fields['local_path'].get().strip(),
+                            fields['include'].get(), fields['exclude'].get(), enabled_var.get(),
+                            fields['helper_url'].get().strip())
+        
+        def save_roots():
+            self.save_settings()
+            populate()
+        
+        def add_root():
+            root = root_from_form()
+            if not root:
+                return
+            if root.name == "Primary" or any(r.name == root.name for r in self.extra_sync_roots):
+                messagebox.showwarning("Sync Roots", f"A root named '{root.name}' already exists", parent=window)
+                return
+            self.extra_sync_roots.append(root)
+            save_roots()
+        
+        def update_root():
+            selection = tree.selection()
+            root = root_from_form()
+            if not selection or not root:
+                return
+            index = int(selection[0])
+            if root.name == "Primary" or any(r.name == root.name for i, r in enumerate(self.extra_sync_roots) if i != index):
+                messagebox.showwarning("Sync Roots", f"A root named '{root.name}' already exists", parent=window)
+                return
+            self.extra_sync_roots[index] = root
+            save_roots()
+        
+        def remove_root():
+            selection = tree.selection()
+            if not selection:
+                return
+            del self.extra_sync_roots[int(selection[0])]
+            save_roots()
+        
+        tree.bind("<<TreeviewSelect>>", on_select)
+        
+        button_frame = tb.Frame(main_frame)
+        button_frame.pack(fill=X, pady=(10, 0))
+        tb.Button(button_frame, text="Add", command=add_root, bootstyle="success").pack(side=LEFT, padx=5)
+        tb.Button(button_frame, text="Update", command=update_root, bootstyle="info").pack(side=LEFT, padx=5)
+        tb.Button(button_frame, text="Remove", command=remove_root, bootstyle="danger").pack(side=LEFT, padx=5)
+        tb.Button(button_frame, text="Close", command=window.destroy, bootstyle="secondary").pack(side=RIGHT, padx=5)
+        
+        populate()
+
+    def show_sync_status_dashboard(self):
+        """Show sync status for every YAML and resource in each sync root"""
+        window = tb.Toplevel(self.root)
+        window.title("Workspace Sync Status")
+        window.geometry("1200x650")
+        window.transient(self.root)
+        
+        main_frame = tb.Frame(window, padding=10)
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        # Toolbar: summary, filter and actions
+        toolbar = tb.Frame(main_frame)
+        toolbar.pack(fill=X, pady=(0, 10))
+        
+        summary_var = tk.StringVar(value="Loading...")
+        tb.Label(toolbar, textvariable=summary_var, bootstyle="info", justify=LEFT).pack(side=LEFT)
+        
+        roots = self.get_sync_roots(enabled_only=True)
+        manifests = {root.name: self.get_sync_manifest(root) for root in roots}
+        refreshing = set()
+        
+        filter_var = tk.StringVar(value="Needs attention")
+        filter_options = ["All", "Needs attention"] + [SyncManifest.LABELS[s] for s in SyncManifest.STATUSES]
+        filter_combo = tb.Combobox(toolbar, textvariable=filter_var, values=filter_options,
+                                   state="readonly", width=22)
+        filter_combo.pack(side=RIGHT, padx=5)
+        tb.Label(toolbar, text="Show:").pack(side=RIGHT)
+        
+        root_var = tk.StringVar(value="All roots")
+        root_combo = tb.Combobox(toolbar, textvariable=root_var, values=["All roots"] + list(manifests),
+                                 state="readonly", width=18)
+        root_combo.pack(side=RIGHT, padx=5)
+        tb.Label(toolbar, text="Root:").pack(side=RIGHT)
+        
+        # File list
+        tree_frame = tb.Frame(main_frame)
+        tree_frame.pack(fill=BOTH, expand=True)
+        
+        columns = ("Root", "File", "Status", "Source Size", "Local Size", "Source Modified", "Local Modified")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=120)
+        tree.column("Root", width=100)
+        tree.column("File", width=360)
+        tree.column("Status", width=170)
+        
+        tree.tag_configure('stale', foreground="#ff6b6b")
+        tree.tag_configure('missing', foreground="#ff6b6b")
+        tree.tag_configure('local_modified', foreground="#ffa500")
+        tree.tag_configure('local_only', foreground="#a0a0a0")
+        
+        scrollbar = ttk.Scrollbar(tree_frame, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        
+        def format_time(stat_pair):
+            if not stat_pair:
+                return "-"
+            return datetime.fromtimestamp(stat_pair[1] / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+        
+        def describe_root(name, manifest):
+            if name in refreshing:
+                return f"{name}: refreshing..."
+            summary = manifest.summary()
+            counts = summary['counts']
+            text = (f"{name}: {summary['total']} files, {counts['in_sync']} in sync, {counts['stale']} stale, "
+                    f"{counts['missing']} missing, {counts['local_modified']} locally modified, "
+                    f"{counts['local_only']} local only  ({summary['elapsed_ms'] or 0:.0f} ms)")
+            if summary['offline']:
+                text += " [share offline]"
+            return text
+        
+        def populate():
+            if not window.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            selected = filter_var.get()
+            selected_root = root_var.get()
+            for name, manifest in manifests.items():
+                if selected_root not in ("All roots", name):
+                    continue
+                for rel_path, entry in manifest.rows():
+                    status = entry['status']
+                    if selected == "Needs attention" and status == 'in_sync':
+                        continue
+                    if selected not in ("All", "Needs attention") and SyncManifest.LABELS[status] != selected:
+                        continue
+                    tree.insert("", "end", tags=(status,), values=(
+                        name,
+                        rel_path,
+                        SyncManifest.LABELS[status],
+                        self.format_size(entry['src'][0]) if entry['src'] else "-",
+                        self.format_size(entry['dst'][0]) if entry['dst'] else "-",
+                        format_time(entry['src']),
+                        format_time(entry['dst']),
+                    ))
+            
+            summary_var.set("\n".join(describe_root(name, manifest) for name, manifest in manifests.items()
+                                      if selected_root in ("All roots", name)))
+        
+        def refresh():
+            # One thread per root so a slow share only holds up its own rows
+            for name, manifest in manifests.items():
+                if name in refreshing:
+                    continue
+                refreshing.add(name)
+                def refresh_thread(name=name, manifest=manifest):
+                    try:
+                        manifest.refresh()
+                    finally:
+                        refreshing.discard(name)
+                        self.root.after(0, populate)
+                threading.Thread(target=refresh_thread, daemon=True).start()
+            populate()
+        
+        def sync_now():
+            summary_var.set("Syncing...")
+            def sync_thread():
+                synced_files = self.sync_workspace_files(
+                    self.backup_base_path if self.backup_enabled.get() else None
+                )
+                self.root.after(0, lambda: self.log_message(f">>> Workspace sync: {len(synced_files)} file(s) synced", "auto"))
+                self.root.after(0, refresh)
+                self.root.after(0, self.check_sync_status)
+            threading.Thread(target=sync_thread, daemon=True).start()
+        
+        filter_combo.bind("<<ComboboxSelected>>", lambda e: populate())
+        root_combo.bind("<<ComboboxSelected>>", lambda e: populate())
+        tb.Button(toolbar, text="Sync All", command=sync_now, bootstyle="success").pack(side=RIGHT, padx=5)
+        tb.Button(toolbar, text="Refresh", command=refresh, bootstyle="info").pack(side=RIGHT, padx=5)
+        
+        # Show the cached manifests immediately, then bring them up to date
+        refresh()
+
     def scan_esphome_versions(self):
         """Scan for available ESPHome versions"""
         self.esphome_versions = {"Default": {"path": "esphome", "version": "System Default"}}
@@ -4663,7 +8444,7 @@ class ModernESPHomeGUI:
 
     def extract_ram_usage_from_log(self):
         """Extract RAM usage percentage from the log text"""
-        log_content = self.log_text.get(1.0, tk.END)
+        log_content = self.log_sink.contents()
         ram_pattern = r'RAM:\s*\[.*\]\s*([\d.]+)%'
         ram_match = re.search(ram_pattern, log_content)
         if ram_match:
@@ -4803,14 +8584,8 @@ class ModernESPHomeGUI:
         def smart_sync_thread():
             self.status_var.set("Smart syncing current project...")
             
-            synced_files = sync_esphome_files_fast(
-                self.sync_source_path.get(), 
-                self.sync_local_path.get(),
-                self.backup_base_path if self.backup_enabled.get() else None,
-                current_file  # Only sync files needed for this YAML
-            )
-            
-            self.last_sync_time = datetime.now().strftime("%H:%M:%S")
+            # Only sync files needed for this YAML (skipped when offline)
+            synced_files = self.sync_before_build(current_file)
             result_container.extend(synced_files)  # Store result
             
             if synced_files:
@@ -4833,17 +8608,214 @@ class ModernESPHomeGUI:
         
         return result_container
 
+    def sync_workspace_files(self, backup_path=None):
+        """Full sync of every enabled root (concurrently) using the transport selected in the Tools tab"""
+        roots = self.get_sync_roots(enabled_only=True)
+        
+        def root_done(root, synced_files):
+            if len(roots) > 1:
+                self.root.after(0, lambda: self.log_message(
+                    f">>> [{root.name}] {len(synced_files)} file(s) synced", "auto"))
+        
+        results = sync_roots(
+            roots,
+            backup_path,
+            self.sync_transport.get(),
+            self.sync_helper_token.get().strip() or None,
+            metrics_callback=self.report_sync_metrics,
+            root_callback=root_done
+        )
+        synced_files = []
+        for root in roots:
+            synced_files.extend(results.get(root.name, []))
+        return synced_files
+
+    def report_sync_metrics(self, metrics, plan=None):
+        """Keep the latest sync metrics and log the per-stage timings (called from sync threads)"""
+        self.last_sync_metrics = metrics
+        totals = metrics['totals']
+        transferred = totals['copy']['bytes'] + totals['delta']['bytes']
+        timing_text = plan.describe_timings() if plan else "n/a"
+        root_text = f" [{metrics['root']}]" if metrics.get('root') and self.extra_sync_roots else ""
+        summary = (f">>> Sync plan{root_text}: {totals['copy']['count']} copy, {totals['delta']['count']} delta, "
+                   f"{totals['backup']['count']} backup, {totals['skip']['count']} skip "
+                   f"({self.format_size(transferred)}) - {timing_text}, total {metrics.get('total_ms', 0):.0f} ms")
+        if metrics.get('fallback'):
+            summary += f" [fell back to classic sync: {metrics['fallback']}]"
+        self.root.after(0, lambda: self.log_message(summary, "auto"))
+
+    def show_sync_plan_dialog(self):
+        """Dry run: show what a full sync would do, with byte counts and stage timings, before running it"""
+        window = tb.Toplevel(self.root)
+        window.title("Sync Plan (Dry Run)")
+        window.geometry("1000x600")
+        window.transient(self.root)
+        
+        main_frame = tb.Frame(window, padding=10)
+        main_frame.pack(fill=BOTH, expand=True)
+        
+        summary_var = tk.StringVar(value="Planning...")
+        tb.Label(main_frame, textvariable=summary_var, bootstyle="info", justify=LEFT).pack(anchor=W, pady=(0, 5))
+        timings_var = tk.StringVar(value="")
+        tb.Label(main_frame, textvariable=timings_var, bootstyle="secondary").pack(anchor=W, pady=(0, 10))
+        
+        show_skipped = tk.BooleanVar(value=False)
+        
+        tree_frame = tb.Frame(main_frame)
+        tree_frame.pack(fill=BOTH, expand=True)
+        columns = ("Action", "File", "Size", "Reason")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+        tree.column("Action", width=80)
+        tree.column("File", width=480)
+        tree.column("Size", width=100)
+        tree.column("Reason", width=200)
+        tree.tag_configure('copy', foreground="#90ee90")
+        tree.tag_configure('delta', foreground="#ffff00")
+        tree.tag_configure('backup', foreground="#e9a4fe")
+        tree.tag_configure('skip', foreground="#a0a0a0")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        
+        button_frame = tb.Frame(main_frame)
+        button_frame.pack(fill=X, pady=(10, 0))
+        
+        transport = self.sync_transport.get()
+        helper_token = self.sync_helper_token.get().strip() or None
+        backup_path = self.backup_base_path if self.backup_enabled.get() else None
+        roots = {root.name: root for root in self.get_sync_roots(enabled_only=True)}
+        root_var = tk.StringVar(value=next(iter(roots), ""))
+        state = {'plan': None, 'root': None}
+        
+        def populate(plan):
+            if not window.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for op in plan.operations:
+                if op['action'] == 'skip' and not show_skipped.get():
+                    continue
+                tree.insert("", "end", tags=(op['action'],),
+                            values=(op['action'], op['path'], self.format_size(op['bytes']), op['reason']))
+            totals = plan.totals()
+            summary_var.set(
+                f"{transport}: {totals['copy']['count']} copy ({self.format_size(totals['copy']['bytes'])}), "
+                f"{totals['delta']['count']} delta ({self.format_size(totals['delta']['bytes'])}), "
+                f"{totals['backup']['count']} backup, {totals['skip']['count']} up to date"
+                + ("  - executed" if plan.executed else "  - not executed (dry run)")
+            )
+            timings_var.set(f"Stage timings: {plan.describe_timings()}")
+            execute_btn.configure(state="disabled" if plan.executed or not plan.ops('copy', 'delta') else "normal")
+        
+        def run_plan():
+            root = roots.get(root_var.get())
+            if not root:
+                summary_var.set("No sync root enabled")
+                return
+            summary_var.set(f"Planning {root.name}...")
+            execute_btn.configure(state="disabled")
+            state['plan'] = None
+            def plan_thread():
+                try:
+                    if transport == "Bundle helper" and root.helper_url:
+                        plan = plan_bundle_sync(root.helper_url, root.network_path, root.local_path,
+                                                backup_path, helper_token, patterns=root.patterns, exclude=root.exclude)
+                    else:
+                        plan = plan_sync(root.network_path, root.local_path, backup_path,
+                                         patterns=root.patterns, exclude=root.exclude)
+                except Exception as e:
+                    message = f"Planning failed: {e}"
+                    self.root.after(0, lambda: summary_var.set(message))
+                    return
+                state['plan'] = plan
+                state['root'] = root
+                metrics = plan.metrics(transport)
+                metrics['root'] = root.name
+                record_sync_metrics(metrics)
+                self.root.after(0, lambda: populate(plan))
+            threading.Thread(target=plan_thread, daemon=True).start()
+        
+        def execute_plan():
+            plan = state['plan']
+            root = state['root']
+            if not plan:
+                return
+            execute_btn.configure(state="disabled")
+            summary_var.set("Executing plan...")
+            def execute_thread():
+                start = time.perf_counter()
+                try:
+                    if transport == "Bundle helper" and root.helper_url:
+                        execute_bundle_plan(plan, root.helper_url, helper_token)
+                    else:
+                        execute_sync_plan(plan, max_workers=8 if transport == "Pipelined batch" else 1)
+                except Exception as e:
+                    message = f"Sync failed: {e}"
+                    self.root.after(0, lambda: summary_var.set(message))
+                    return
+                metrics = plan.metrics(transport)
+                metrics['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+                metrics['root'] = root.name
+                record_sync_metrics(metrics)
+                self.report_sync_metrics(metrics, plan)
+                self.last_sync_time = datetime.now().strftime("%H:%M:%S")
+                self.root.after(0, lambda: populate(plan))
+                self.root.after(0, self.check_sync_status)
+            threading.Thread(target=execute_thread, daemon=True).start()
+        
+        tb.Label(button_frame, text="Root:").pack(side=LEFT)
+        root_combo = tb.Combobox(button_frame, textvariable=root_var, values=list(roots), state="readonly", width=18)
+        root_combo.pack(side=LEFT, padx=5)
+        root_combo.bind("<<ComboboxSelected>>", lambda e: run_plan())
+        tb.Button(button_frame, text="Re-plan", command=run_plan, bootstyle="info").pack(side=LEFT, padx=5)
+        execute_btn = tb.Button(button_frame, text="Execute Plan", command=execute_plan, bootstyle="success", state="disabled")
+        execute_btn.pack(side=LEFT, padx=5)
+        tb.Checkbutton(button_frame, text="Show up-to-date files", variable=show_skipped,
+                       command=lambda: state['plan'] and populate(state['plan']),
+                       bootstyle="secondary-round-toggle").pack(side=LEFT, padx=15)
+        tb.Button(button_frame, text="Close", command=window.destroy, bootstyle="secondary").pack(side=RIGHT, padx=5)
+        
+        run_plan()
+
+    def sync_before_build(self, current_file):
+        """Smart sync ahead of a build - skipped, building from the local mirror, when offline"""
+        if not current_file:
+            return []
+        
+        if self.offline_mode.get():
+            self.log_message(">>> Offline mode: building from local mirror", "auto")
+            self.sync_status_var.set("Sync: Offline mode")
+            self.sync_indicator.configure(bootstyle="warning")
+            return []
+        
+        root, _ = self.root_for_file(current_file)
+        share = get_share_guard(root.network_path)
+        if not share.is_reachable():
+            self.log_message(f">>> Share unreachable ({share.describe()}) - building from local mirror", "auto")
+            self.sync_status_var.set("Sync: Share offline (using local mirror)")
+            self.sync_indicator.configure(bootstyle="warning")
+            return []
+        
+        synced_files = sync_esphome_files_fast(
+            root.network_path, 
+            root.local_path,
+            self.backup_base_path if self.backup_enabled.get() else None,
+            current_file,
+            patterns=root.patterns,
+            exclude=root.exclude
+        )
+        self.last_sync_time = datetime.now().strftime("%H:%M:%S")
+        return synced_files
+
     def manual_full_sync(self):
         """Manual full sync - use when you want to update all resources"""
         def full_sync_thread():
             self.status_var.set("Performing full manual sync...")
             self.log_message( ">>> Starting full manual sync...", "auto")
             
-            synced_files = sync_esphome_files(
-                self.sync_source_path.get(), 
-                self.sync_local_path.get(),
-                None  # No backups during full sync
-            )
+            synced_files = self.sync_workspace_files(None)  # No backups during full sync
             
             self.last_sync_time = datetime.now().strftime("%H:%M:%S")
             
@@ -4857,7 +8829,6 @@ class ModernESPHomeGUI:
                 self.log_message( ">>> Full sync completed: No changes needed", "auto")
             
             self.status_var.set("Full sync completed")
-            self.log_text.see(tk.END)
         
         threading.Thread(target=full_sync_thread, daemon=True).start()
 
@@ -4969,6 +8940,17 @@ class ModernESPHomeGUI:
                 'sync_local_path': self.sync_local_path.get(),
                 'backup_enabled': self.backup_enabled.get(),
                 'max_backups': self.max_backups.get(),
+                'backup_verify_on_startup': self.backup_verify_on_startup.get(),
+                'backup_pack_after_days': self.backup_pack_after_days.get(),
+                'device_info_ttl_hours': self.device_info_ttl_hours.get(),
+                'sweep_networks': self.sweep_networks.get(),
+                'offline_mode': self.offline_mode.get(),
+                'sync_transport': self.sync_transport.get(),
+                'sync_helper_url': self.sync_helper_url.get(),
+                'sync_helper_token': self.sync_helper_token.get(),
+                'sync_include_patterns': self.sync_include_patterns.get(),
+                'sync_exclude_patterns': self.sync_exclude_patterns.get(),
+                'sync_roots': [root.to_dict() for root in self.extra_sync_roots],
             }
             
             with open(config_file, 'w') as f:
@@ -4992,6 +8974,28 @@ class ModernESPHomeGUI:
                         self.backup_enabled.set(settings['backup_enabled'])
                     if 'max_backups' in settings:
                         self.max_backups.set(settings['max_backups'])
+                    if 'backup_verify_on_startup' in settings:
+                        self.backup_verify_on_startup.set(settings['backup_verify_on_startup'])
+                    if 'backup_pack_after_days' in settings:
+                        self.backup_pack_after_days.set(settings['backup_pack_after_days'])
+                    if 'device_info_ttl_hours' in settings:
+                        self.device_info_ttl_hours.set(settings['device_info_ttl_hours'])
+                    if 'sweep_networks' in settings:
+                        self.sweep_networks.set(settings['sweep_networks'])
+                    if 'offline_mode' in settings:
+                        self.offline_mode.set(settings['offline_mode'])
+                    if settings.get('sync_transport') in SYNC_TRANSPORTS:
+                        self.sync_transport.set(settings['sync_transport'])
+                    if 'sync_helper_url' in settings:
+                        self.sync_helper_url.set(settings['sync_helper_url'])
+                    if 'sync_helper_token' in settings:
+                        self.sync_helper_token.set(settings['sync_helper_token'])
+                    if 'sync_include_patterns' in settings:
+                        self.sync_include_patterns.set(settings['sync_include_patterns'])
+                    if 'sync_exclude_patterns' in settings:
+                        self.sync_exclude_patterns.set(settings['sync_exclude_patterns'])
+                    if 'sync_roots' in settings:
+                        self.extra_sync_roots = [SyncRoot.from_dict(data) for data in settings['sync_roots']]
         except Exception as e:
             print(f"Could not load settings: {e}")
 
@@ -5013,7 +9017,6 @@ class ModernESPHomeGUI:
         self.error_indicator.configure(bootstyle="info")
         self.start_process_spinner("Initializing...")
         self.log_message(">>> Starting compilation process...", "auto")
-        self.log_text.see(tk.END)
         self.root.update_idletasks()
         
         if not self.validate_file():
@@ -5038,16 +9041,9 @@ class ModernESPHomeGUI:
                 self.update_process_status("Syncing files...")
                 
                 current_file = self.file_path.get() if self.file_path.get() else None
-                if current_file:
-                    synced_files = sync_esphome_files_fast(
-                        r"\\192.168.4.76\config\esphome", 
-                        r"C:\esphome",
-                        self.backup_base_path if self.backup_enabled.get() else None,
-                        current_file
-                    )
-                    self.last_sync_time = datetime.now().strftime("%H:%M:%S")
-                    if synced_files:
-                        self.log_message(f">>> Synced files: {len(synced_files)}", "auto")
+                synced_files = self.sync_before_build(current_file)
+                if synced_files:
+                    self.log_message(f">>> Synced files: {len(synced_files)}", "auto")
                 
                 if not self.is_running:
                     self.log_message(">>> Stopped after sync", "auto")
@@ -5073,7 +9069,6 @@ class ModernESPHomeGUI:
                 self.update_progress(20)
                 self.update_process_status("Compiling firmware...")
                 self.log_message(">>> Starting compilation...", "auto")
-                self.log_text.see(tk.END)
 
                 # Reset firmware size display
                 self.firmware_size_var.set("Firmware size: N/A")
@@ -5129,7 +9124,6 @@ class ModernESPHomeGUI:
                 
             except Exception as e:
                 self.log_message(f">>> Thread error: {str(e)}", "auto")
-                self.log_text.see(tk.END)
                 self.is_running = False
                 self.stop_process_spinner()
         
@@ -5144,12 +9138,12 @@ class ModernESPHomeGUI:
             return
 
         project_name = os.path.splitext(os.path.basename(yaml_path))[0]
-        base_dir = os.path.dirname(yaml_path)
         
         # Paths to build artifacts
-        build_dir = os.path.join(base_dir, ".esphome", "build", project_name)
-        firmware_elf = os.path.join(build_dir, ".pioenvs", project_name, "firmware.elf")
-        firmware_bin = os.path.join(build_dir, ".pioenvs", project_name, "firmware.bin")
+        paths = storage_reader.firmware_paths(yaml_path)
+        build_dir = paths['build_dir']
+        firmware_elf = paths['firmware_elf']
+        firmware_bin = paths['firmware_bin']
         build_log_path = os.path.join(build_dir, "log", "build.log")
         
         if not os.path.exists(firmware_elf):
@@ -5266,7 +9260,6 @@ class ModernESPHomeGUI:
         self.log_message( ">>> 🟪🟪🟪🟪🟪🟪🟪  Starting compile & upload process...  🟪🟪🟪🟪🟪🟪🟪", "auto")
         self.log_message( ">>> 🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪", "auto")
         self.log_message( ">>> 🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪🟪", "auto")
-        self.log_text.see(tk.END)
         self.root.update_idletasks()
         
         if not self.validate_file():
@@ -5291,14 +9284,8 @@ class ModernESPHomeGUI:
                 self.update_process_status("Syncing files...")
                 
                 current_file = self.file_path.get() if self.file_path.get() else None
-                if current_file:
-                    synced_files = sync_esphome_files_fast(
-                        r"\\192.168.4.76\config\esphome", 
-                        r"C:\esphome",
-                        self.backup_base_path if self.backup_enabled.get() else None,
-                        current_file
-                    )
-                    self.last_sync_time = datetime.now().strftime("%H:%M:%S")
+                synced_files = self.sync_before_build(current_file)
+                if synced_files:
                     self.log_message( f">> SYNC UPDATE: Synced the following: {synced_files}", "auto")
                 
                 if not self.is_running:
@@ -5325,7 +9312,6 @@ class ModernESPHomeGUI:
                 self.update_progress(20)
                 self.update_process_status("Compiling firmware...")
                 self.log_message( ">>> Starting compilation...", "auto")
-                self.log_text.see(tk.END)
 
                 # Reset firmware size display
                 self.firmware_size_var.set("Firmware size: N/A")
@@ -5352,7 +9338,7 @@ class ModernESPHomeGUI:
                 if not compile_success:
                     self.log_message( ">>> DEBUG: Compile failed, checking if we should continue anyway...", "auto")
                     # Check if firmware actually exists despite the failure flag
-                    firmware_bin_path = os.path.join(os.path.dirname(yaml_path), ".esphome", "build", os.path.splitext(os.path.basename(yaml_path))[0], "firmware.bin")
+                    firmware_bin_path = storage_reader.firmware_paths(yaml_path)['firmware_bin']
                     firmware_exists = os.path.exists(firmware_bin_path)
                     self.log_message( f">>> DEBUG: Firmware exists: {firmware_exists} at {firmware_bin_path}", "auto")
                     
@@ -5372,7 +9358,6 @@ class ModernESPHomeGUI:
                 self.update_progress(70)
                 self.update_process_status("Uploading to device...")
                 self.log_message( ">>> Starting upload...", "auto")
-                self.log_text.see(tk.END)
 
                 mode = self.upload_mode_var.get()
                 if mode == "COM":
@@ -5382,9 +9367,10 @@ class ModernESPHomeGUI:
                         upload_command = f'esphome upload --device {port} "{yaml_path}"'
                     self.log_message( f">>> DEBUG: COM upload command: {upload_command}", "auto")
                 else:  # OTA mode
-                    ip = self.ota_ip_var.get().strip()
+                    ip = self.resolve_upload_target(self.ota_ip_var.get().strip())
                     self.log_message( f">>> DEBUG: OTA IP: {ip}", "auto")
                     if not is_ota_device_available(ip):
+                        host_resolver.forget(upload_device_name(yaml_path))
                         self.status_var.set("OTA device not reachable")
                         self.update_phase_label("OTA check failed")
                         self.error_indicator.configure(bootstyle="warning")
@@ -5393,9 +9379,10 @@ class ModernESPHomeGUI:
                     upload_command = f'esphome upload --device {ip} "{yaml_path}"'
                     self.log_message( f">>> DEBUG: OTA upload command: {upload_command}", "auto")
 
-                self.log_text.see(tk.END)
 
                 upload_success = self.run_command(upload_command, start_time, estimated_total)
+                if mode == "OTA":
+                    host_resolver.record_upload(upload_device_name(yaml_path), ip, upload_success)
                 end_time = time.time()
                 duration = end_time - start_time
                 self.stop_timer()
@@ -5430,7 +9417,6 @@ class ModernESPHomeGUI:
                 
             except Exception as e:
                 self.log_message( f">>> Thread error: {str(e)}", "auto")
-                self.log_text.see(tk.END)
                 self.is_running = False
                 self.stop_process_spinner()
         
@@ -5448,7 +9434,6 @@ class ModernESPHomeGUI:
         self.error_indicator.configure(bootstyle="info")
         self.start_process_spinner("Initializing...")
         self.log_message(">>> Starting upload process...", "auto")
-        self.log_text.see(tk.END)
         self.root.update_idletasks()
         
         if not self.validate_file():
@@ -5473,16 +9458,9 @@ class ModernESPHomeGUI:
                 self.update_process_status("Syncing files...")
                 
                 current_file = self.file_path.get() if self.file_path.get() else None
-                if current_file:
-                    synced_files = sync_esphome_files_fast(
-                        r"\\192.168.4.76\config\esphome", 
-                        r"C:\esphome",
-                        self.backup_base_path if self.backup_enabled.get() else None,
-                        current_file
-                    )
-                    self.last_sync_time = datetime.now().strftime("%H:%M:%S")
-                    if synced_files:
-                        self.log_message(f">>> Synced files: {len(synced_files)}", "auto")
+                synced_files = self.sync_before_build(current_file)
+                if synced_files:
+                    self.log_message(f">>> Synced files: {len(synced_files)}", "auto")
                 
                 if not self.is_running:
                     self.log_message(">>> Stopped after sync", "auto")
@@ -5508,7 +9486,6 @@ class ModernESPHomeGUI:
                 self.update_progress(20)
                 self.update_process_status("Uploading to device...")
                 self.log_message(">>> Starting upload...", "auto")
-                self.log_text.see(tk.END)
 
                 yaml_path = self.file_path.get()
                 start_time = time.time()
@@ -5526,9 +9503,10 @@ class ModernESPHomeGUI:
                         upload_command = f'{esphome_cmd} upload --device {port} "{yaml_path}"'
                     self.log_message(f">>> COM upload command: {upload_command}", "auto")
                 else:  # OTA mode
-                    ip = self.ota_ip_var.get().strip()
+                    ip = self.resolve_upload_target(self.ota_ip_var.get().strip())
                     self.log_message(f">>> OTA IP: {ip}", "auto")
                     if not is_ota_device_available(ip):
+                        host_resolver.forget(upload_device_name(yaml_path))
                         self.status_var.set("OTA device not reachable")
                         self.update_phase_label("OTA check failed")
                         self.error_indicator.configure(bootstyle="warning")
@@ -5538,6 +9516,8 @@ class ModernESPHomeGUI:
                     self.log_message(f">>> OTA upload command: {upload_command}", "auto")
 
                 upload_success = self.run_command(upload_command, start_time, estimated_total)
+                if mode == "OTA":
+                    host_resolver.record_upload(upload_device_name(yaml_path), ip, upload_success)
                 end_time = time.time()
                 duration = end_time - start_time
                 self.stop_timer()
@@ -5578,7 +9558,6 @@ class ModernESPHomeGUI:
                 
             except Exception as e:
                 self.log_message(f">>> Thread error: {str(e)}", "auto")
-                self.log_text.see(tk.END)
                 self.is_running = False
                 self.stop_process_spinner()
         
@@ -5681,7 +9660,7 @@ class ModernESPHomeGUI:
         # Update device list when mode changes
         def update_device_list(*args):
             if self.upload_mode_var.get() == "OTA":
-                devices = [f"{name} ({ip})" for name, ip in discover_esphome_devices()]
+                devices = [f"{name} ({ip})" for name, ip in device_registry.ranked_devices()]
                 device_combo['values'] = devices
                 if devices:
                     device_combo.set(devices[0])
@@ -6299,6 +10278,9 @@ class ModernESPHomeGUI:
             self.upload_scheduler.stop()
         
         self.save_recent_files()
+        checksum_service.save_cache()
+        discovery_service.stop()
+        device_registry.save_cache()
         self.root.quit()
 
     def compile_selected_uploads(self):
@@ -6379,7 +10361,6 @@ class ModernESPHomeGUI:
                             output_lines.append(line_stripped)
                             # Show in log
                             self.log_message(line_stripped, "auto")
-                            self.log_text.see(tk.END)
                     
                     process.wait()
                     success = process.returncode == 0
@@ -6388,11 +10369,7 @@ class ModernESPHomeGUI:
                     # Update database
                     if success:
                         # Find the compiled firmware path
-                        project_name = os.path.splitext(os.path.basename(yaml_path))[0]
-                        firmware_path = os.path.join(
-                            os.path.dirname(yaml_path),
-                            ".esphome", "build", project_name, ".pioenvs", project_name, "firmware.bin"
-                        )
+                        firmware_path = storage_reader.firmware_paths(yaml_path)['firmware_bin']
                         
                         if os.path.exists(firmware_path):
                             self.delayed_upload_manager._update_upload_compile_status(upload_id, 'success', full_output, firmware_path)
@@ -6437,7 +10414,6 @@ class ModernESPHomeGUI:
         try:
             self.log_message( f">>> Using: {self.current_esphome_version.get()} ({esphome_cmd})", "auto")
             self.log_message( f">>> {command}", "auto")
-            self.log_text.see(tk.END)
 
             # Reset upload progress tracking
             self.last_upload_progress = 0
@@ -6505,22 +10481,11 @@ class ModernESPHomeGUI:
                             self.update_progress(current_percent)
                             self.process_status_var.set(f"Uploading... {current_percent}%")
 
-                        # DELETE PREVIOUS LINE BEFORE WRITING NEW ONE
-                        if is_overwriting:
-                            try:
-                                # Delete from start of last line to end of last line
-                                self.log_text.delete("end-2l", "end-1l")
-                            except:
-                                pass
-                        
-                        # Write the new line
-                        self.log_message(output, "auto")
+                        # Write the new line over the previous progress line
+                        self.log_message(output, "auto", replace_previous=is_overwriting)
                         
                         # Mark that the last thing we did was a progress bar
                         is_overwriting = True
-                        
-                        # Update UI to show change
-                        self.root.update_idletasks()
                         continue 
 
                     # ---------------------------------------------------------
@@ -6547,13 +10512,8 @@ class ModernESPHomeGUI:
                         self.update_progress(100)
                         upload_complete = True
 
-                    # Print the normal line
+                    # Print the normal line - the log sink redraws in batches
                     self.log_message(output, "auto")
-                    self.log_text.see(tk.END)
-                    
-                    # IGNORE esp_idf_size warnings
-                    if "esp_idf_size:" not in output:
-                         self.root.update_idletasks()
             # ---------------------------------------------------------
             # END OF LOOP
             # ---------------------------------------------------------
@@ -6633,10 +10593,10 @@ class ModernESPHomeGUI:
             messagebox.showwarning("Warning", "The selected file doesn't appear to be a YAML file")
         return True
 
-    def log_message(self, message, message_type="auto"):
+    def log_message(self, message, message_type="auto", replace_previous=False):
         """
         Add a message to the log with colored formatting
-        Auto-detects message type if set to "auto"
+        Auto-detects message type if set to "auto"; replace_previous overwrites the last line
         """
         if message_type == "auto":
             # Auto-detect message type based on content
@@ -6657,12 +10617,10 @@ class ModernESPHomeGUI:
             else:
                 message_type = "esphome"  # Default for ESPHome output
         
-        self.log_text.insert(tk.END, message + "\n", message_type)
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self.log_sink.write(message, message_type, replace_previous)
 
     def clear_log(self):
-        self.log_text.delete(1.0, tk.END)
+        self.log_sink.clear()
         # Reset firmware size display when clearing log
         self.firmware_size_var.set("Firmware size: N/A")
         self.inst_ver_var.set(" ")
@@ -6731,14 +10689,12 @@ class ModernESPHomeGUI:
             
             # Add to log
             self.log_message( ">>> Process stopped by user", "auto")
-            self.log_text.see(tk.END)
             
             # Force UI update
             self.root.update_idletasks()
             
         except Exception as e:
             self.log_message( f">>> Error stopping process: {str(e)}", "auto")
-            self.log_text.see(tk.END)
 
     def clean_build(self):
         """Clean the build directory to fix compilation issues"""
@@ -6765,6 +10721,11 @@ class ModernESPHomeGUI:
         threading.Thread(target=clean_thread, daemon=True).start()
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark-log-parser":
+        # python esphome_gui_v92.py --benchmark-log-parser boot1.log [boot2.log ...]
+        benchmark_log_parser(sys.argv[2:])
+        return
+    
     # Create root window with ttkbootstrap theme
     root = tb.Window(themename="darkly")
     
@@ -0,0 +1,177 @@
+# ESPHome Studio sync helper.
+# Runs next to the ESPHome config share (e.g. on the Home Assistant host) and serves the
+# changed YAML/resource files as one streamed tar archive, so a sync over a slow share costs
+# one HTTP request instead of an open/read/close round trip per file.
+# It only uses the standard library. Run it locally against any folder as a stand-in for testing:
+#
+#     python esphome_sync_helper.py --root /config/esphome --port 8765 [--token SECRET]
+#
+# It listens on 127.0.0.1 unless --host says otherwise, and any other address requires --token.
+# secrets.yaml (WiFi and API keys) is never listed or served unless --include-secrets is given.
+# The GUI imports SYNC_PATTERNS and scan_sync_tree from here, so both sides filter alike.
+#
+# Endpoints:
+#     GET  /manifest  -> {"files": {"rel/path.yaml": [size, mtime_ns], ...}}
+#     POST /bundle    -> body {"files": ["rel/path.yaml", ...]}, response is a tar.gz stream
+
+import argparse
+import fnmatch
+import hmac
+import ipaddress
+import json
+import os
+import tarfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# File patterns that are synced from the share (YAML configs and their resources)
+SYNC_PATTERNS = (
+    "*.yaml",
+    "*.yml",
+    "*.png", "*.jpg", "*.jpeg", "*.bmp", "*.gif",  # Images
+    "*.ttf", "*.otf",  # Fonts
+    "*.bin",  # Binary files
+    "*.txt", "*.md",  # Text files
+)
+
+# Files holding credentials - only served with --include-secrets
+SECRET_FILES = ("secrets.yaml",)
+
+def is_sync_excluded(rel_path, exclude):
+    """True if a relative path (or its file/folder name) matches one of the exclude globs"""
+    if not exclude:
+        return False
+    rel_lower = rel_path.lower()
+    name_lower = rel_lower.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatch(rel_lower, p) or fnmatch.fnmatch(name_lower, p) for p in exclude)
+
+def scan_sync_tree(root, patterns=SYNC_PATTERNS, exclude=()):
+    """Collect {rel_path: (size, mtime_ns)} for syncable files, skipping hidden dirs like .esphome"""
+    found = {}
+    if not root or not os.path.isdir(root):
+        return found
+    patterns = tuple(p.lower() for p in patterns)
+    exclude = tuple(p.lower() for p in exclude)
+    stack = [("", root)]
+    while stack:
+        rel_dir, abs_dir = stack.pop()
+        try:
+            with os.scandir(abs_dir) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if is_sync_excluded(rel, exclude):
+                        continue
+                    try:
+                        if entry.is_dir():
+                            stack.append((rel, entry.path))
+                        elif entry.is_file() and any(fnmatch.fnmatch(entry.name.lower(), p) for p in patterns):
+                            # DirEntry.stat() is served from the directory listing on Windows
+                            st = entry.stat()
+                            found[rel] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Sync scan failed for {abs_dir}: {e}")
+    return found
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class SyncHelperHandler(BaseHTTPRequestHandler):
+    root = "."
+    token = None
+    include_secrets = False
+
+    def _authorized(self):
+        if self.token and not hmac.compare_digest(self.headers.get("X-Sync-Token", "").encode("utf-8"),
+                                                  self.token.encode("utf-8")):
+            self.send_error(403, "Invalid sync token")
+            return False
+        return True
+
+    def _scan(self):
+        return scan_sync_tree(self.root, exclude=() if self.include_secrets else SECRET_FILES)
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/manifest":
+            self.send_error(404)
+            return
+        self._send_json({"files": self._scan()})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/bundle":
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            requested = json.loads(self.rfile.read(length) or b"{}").get("files", [])
+        except (ValueError, AttributeError):
+            self.send_error(400, "Expected JSON body with a 'files' list")
+            return
+
+        # Only files that a manifest scan would list can be requested - no path tricks
+        available = self._scan()
+        files = [rel for rel in requested if rel in available]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/gzip")
+        self.send_header("X-Sync-File-Count", str(len(files)))
+        self.end_headers()
+
+        with tarfile.open(fileobj=self.wfile, mode="w|gz") as tar:
+            for rel in files:
+                try:
+                    tar.add(os.path.join(self.root, *rel.split("/")), arcname=rel, recursive=False)
+                except OSError as e:
+                    print(f"Skipping {rel}: {e}")
+
+    def log_message(self, format, *args):
+        print(f"[sync-helper] {self.address_string()} {format % args}")
+
+def serve(root, host="127.0.0.1", port=8765, token=None, include_secrets=False):
+    """Serve manifests and bundles for root until interrupted"""
+    if not token and not is_loopback(host):
+        raise ValueError(f"Refusing to serve on {host} without a token")
+    handler = type("BoundSyncHelperHandler", (SyncHelperHandler,),
+                   {"root": os.path.abspath(root), "token": token, "include_secrets": include_secrets})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving {handler.root} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ESPHome config files as streamed sync bundles")
+    parser.add_argument("--root", required=True, help="ESPHome config directory to serve")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (non-loopback needs --token)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", default=None, help="Shared secret expected in the X-Sync-Token header")
+    parser.add_argument("--include-secrets", action="store_true", help="Also serve secrets.yaml")
+    args = parser.parse_args()
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"--token is required when listening on {args.host}")
+    serve(args.root, args.host, args.port, args.token, args.include_secrets)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GUI_DEPENDENCIES = ("tkinter", "serial", "requests", "zeroconf", "ttkbootstrap", "schedule", "packaging")
+
+
+@pytest.fixture(scope="session")
+def gui():
+    """The GUI module - tests that need it are skipped where its dependencies are missing"""
+    for module in GUI_DEPENDENCIES:
+        pytest.importorskip(module)
+    import esphome_gui_v92
+    return esphome_gui_v92
@@ -0,0 +1,52 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def legacy_retention(versions, max_backups):
+    """The multi-pass rules cleanup_old_backups used before plan_backup_retention"""
+    backups = sorted(((v['id'], v['created_at']) for v in versions), key=lambda x: x[1], reverse=True)
+    keep = {}
+    for version_id, _ in backups[:max_backups]:
+        keep[version_id] = None
+    oldest_first = sorted(backups, key=lambda x: x[1])
+    for tag, key in (("daily", lambda dt: dt.strftime("%Y-%m-%d")),
+                     ("weekly", lambda dt: "%d-W%02d" % dt.isocalendar()[:2]),
+                     ("monthly", lambda dt: dt.strftime("%Y-%m")),
+                     ("yearly", lambda dt: dt.strftime("%Y"))):
+        seen = set()
+        for version_id, dt in oldest_first:
+            if key(dt) not in seen:
+                seen.add(key(dt))
+                keep[version_id] = tag
+    keep[oldest_first[0][0]] = "baseline"
+    return keep, [version_id for version_id, _ in backups if version_id not in keep]
+
+
+def random_history(rng, count):
+    """count versions with distinct times spread over up to three years, ids in time order"""
+    start = datetime(2022, 12, 25, 8, 0)
+    offsets = sorted(rng.sample(range(3 * 365 * 24 * 60), count))
+    return [{'id': index + 1, 'created_at': start + timedelta(minutes=offset)}
+            for index, offset in enumerate(offsets)]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_legacy_rules(gui, seed):
+    rng = random.Random(seed)
+    versions = random_history(rng, rng.randint(1, 300))
+    rng.shuffle(versions)
+    max_backups = rng.choice([0, 1, 5, 10, 50])
+    keep, delete = gui.plan_backup_retention(versions, max_backups)
+    legacy_keep, legacy_delete = legacy_retention(versions, max_backups)
+    assert keep == legacy_keep
+    assert sorted(delete) == sorted(legacy_delete)
+
+
+def test_dense_day_keeps_newest_and_first(gui):
+    start = datetime(2024, 3, 5, 9, 0)
+    versions = [{'id': i, 'created_at': start + timedelta(minutes=i)} for i in range(1, 31)]
+    keep, delete = gui.plan_backup_retention(versions, max_backups=3)
+    assert keep == {1: "baseline", 28: None, 29: None, 30: None}
+    assert sorted(delete) == list(range(2, 28))
@@ -0,0 +1,136 @@
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+def yaml_text(revision, lines=60):
+    """A device config where each revision changes a couple of lines"""
+    body = [f"  - platform: gpio\n    pin: {pin}\n    name: sensor_{pin}\n" for pin in range(lines)]
+    body[revision % lines] = f"  - platform: gpio\n    pin: {revision % lines}\n    name: renamed_{revision}\n"
+    return "esphome:\n  name: kitchen\nsensor:\n" + "".join(body) + f"# revision {revision}\n"
+
+
+def add_version(store, tmp_path, name, text, **kwargs):
+    """Add text as a version of name - every call writes a fresh file so the checksum cache can't answer"""
+    path = Path(tempfile.mkdtemp(dir=tmp_path)) / name
+    path.write_text(text)
+    return store.add(path, name, **kwargs)
+
+
+def object_rows(store):
+    conn = sqlite3.connect(store.db_file)
+    rows = {digest: (kind, base) for digest, kind, base in conn.execute("SELECT digest, kind, base FROM objects")}
+    conn.close()
+    return rows
+
+
+def test_round_trip_across_delta_chains(gui, tmp_path):
+    store = gui.BackupStore(tmp_path / "backups")
+    texts = [yaml_text(revision) for revision in range(gui.BACKUP_SNAPSHOT_INTERVAL * 2 + 3)]
+    versions = [add_version(store, tmp_path, "kitchen.yaml", text) for text in texts]
+
+    kinds = [kind for kind, _ in object_rows(store).values()]
+    assert kinds.count('delta') > gui.BACKUP_SNAPSHOT_INTERVAL
+    assert kinds.count('full') >= 2  # Chains are cut off by periodic snapshots
+    for version, text in zip(versions, texts):
+        assert store.read(version['id']) == text.encode()
+
+
+def test_identical_contents_share_one_object(gui, tmp_path):
+    store = gui.BackupStore(tmp_path / "backups")
+    first = add_version(store, tmp_path, "kitchen.yaml", yaml_text(1))
+    second = add_version(store, tmp_path, "garage.yaml", yaml_text(1))
+    assert first['digest'] == second['digest']
+    assert len(object_rows(store)) == 1
+
+    # Backing up unchanged content again records nothing
+    path = tmp_path / "kitchen.yaml"
+    path.write_text(yaml_text(1))
+    again = store.add(path)
+    assert again['unchanged'] is True
+    assert again['id'] == first['id']
+    assert len(store.versions()) == 2
+
+
+def test_catalog_totals_follow_add_and_delete(gui, tmp_path):
+    store = gui.BackupStore(tmp_path / "backups")
+    for revision in range(5):
+        add_version(store, tmp_path, "kitchen.yaml", yaml_text(revision))
+        add_version(store, tmp_path, "garage.yaml", yaml_text(revision + 100))
+
+    def assert_catalog_matches():
+        versions = store.versions()
+        summary = store.catalog_summary()
+        assert summary['versions'] == len(versions)
+        assert summary['files'] == len({v['name'] for v in versions})
+        assert summary['logical_size'] == sum(v['size'] for v in versions)
+        assert summary['objects'] == len(object_rows(store))
+        assert store.names() == [(name, len(store.versions(name)), sum(v['size'] for v in store.versions(name)))
+                                 for name in sorted({v['name'] for v in versions})]
+        assert store.verify_catalog()['totals_fixed'] is False
+
+    assert_catalog_matches()
+    store.delete([v['id'] for v in store.versions("kitchen.yaml")[:3]])
+    assert_catalog_matches()
+    store.delete([v['id'] for v in store.versions("garage.yaml")])
+    assert_catalog_matches()
+    assert [name for name, _, _ in store.names()] == ["kitchen.yaml"]
+
+
+def test_packed_objects_read_back(gui, tmp_path):
+    store = gui.BackupStore(tmp_path / "backups")
+    start = datetime(2024, 1, 30, 12, 0)
+    texts = {}
+    for revision in range(6):
+        version = add_version(store, tmp_path, "kitchen.yaml", yaml_text(revision),
+                              created_at=start + timedelta(days=revision))
+        texts[version['id']] = yaml_text(revision).encode()
+
+    summary = store.pack_old_objects(older_than_days=-1)
+    assert summary['packed'] == len(object_rows(store))
+    assert summary['packs'] == ["2024-01", "2024-02"]
+    assert not any(path.is_file() for path in store.objects_dir.rglob("*"))
+    for version_id, data in texts.items():
+        assert store.read(version_id) == data
+    assert store.verify_catalog()['missing_objects'] == []
+
+
+def test_garbage_collection_keeps_delta_bases(gui, tmp_path):
+    store = gui.BackupStore(tmp_path / "backups")
+    base = add_version(store, tmp_path, "kitchen.yaml", yaml_text(1))
+    delta = add_version(store, tmp_path, "kitchen.yaml", yaml_text(2))
+    assert object_rows(store)[delta['digest']] == ('delta', base['digest'])
+
+    store.delete([base['id']])
+    assert base['digest'] in object_rows(store)
+    assert store.read(delta['id']) == yaml_text(2).encode()
+    assert store.collect_garbage() == 0
+
+    store.delete([delta['id']])
+    assert object_rows(store) == {}
+    assert not any(path.is_file() for path in store.objects_dir.rglob("*"))
+
+
+def test_legacy_import_keeps_source_files(gui, tmp_path):
+    backup_dir = tmp_path / "backups"
+    legacy_dir = backup_dir / "kitchen.yaml"
+    legacy_dir.mkdir(parents=True)
+    originals = {}
+    for revision, suffix in enumerate(["", "", ".daily"]):
+        created = datetime(2024, 5, 1 + revision, 8, 30)
+        path = legacy_dir / f"kitchen.yaml.{created.strftime(gui.BACKUP_TIMESTAMP_FORMAT)}{suffix}"
+        path.write_text(yaml_text(revision))
+        originals[path] = yaml_text(revision)
+
+    store = gui.BackupStore(backup_dir)
+    summary = store.import_legacy_backups()
+    assert summary == {'found': 3, 'imported': 3, 'skipped': 0, 'removed': 0, 'failed': 0}
+    for path, text in originals.items():
+        assert path.read_text() == text
+    versions = store.versions("kitchen.yaml")
+    assert sorted(store.read(v['id']).decode() for v in versions) == sorted(originals.values())
+    assert [v['tag'] for v in versions] == ["daily", None, None]
+
+    assert store.import_legacy_backups()['skipped'] == 3
+    assert len(store.versions("kitchen.yaml")) == 3
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from esphome_api_standin import StandinDevice
+
+
+@pytest.fixture
+def standin():
+    """start(**device options) -> port of a stand-in device served from a background event loop"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    servers = []
+
+    def start(password="", encrypted=False):
+        device = StandinDevice("kitchen-light", "2024.6.1", "AA:BB:CC:DD:EE:FF", "esp32dev",
+                               "Jun 10 2024, 12:00:00", password, encrypted)
+        server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(device.handle, "127.0.0.1", 0), loop).result(5)
+        servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def shutdown():
+        for server in servers:
+            server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    yield start
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def test_correct_password(gui, standin):
+    port = standin(password="hunter2")
+    info = gui.fetch_device_info_api("127.0.0.1", port, "hunter2")
+    assert info['name'] == "kitchen-light"
+    assert info['esphome_version'] == "2024.6.1"
+    assert info['mac_address'] == "AA:BB:CC:DD:EE:FF"
+    assert info['uses_password'] is True
+    result = gui.device_info_from_api(info)
+    assert result['firmware_version'] == "2024.6.1"
+    assert result['chip'] == "esp32dev"
+    assert result['wifi_ssid'] == "N/A"
+
+
+def test_no_password_needed(gui, standin):
+    port = standin()
+    assert gui.fetch_device_info_api("127.0.0.1", port)['name'] == "kitchen-light"
+
+
+def test_bad_password(gui, standin):
+    port = standin(password="hunter2")
+    with pytest.raises(gui.ESPHomeAPIError, match="password"):
+        gui.fetch_device_info_api("127.0.0.1", port, "wrong")
+
+
+def test_encrypted_device(gui, standin):
+    port = standin(encrypted=True)
+    with pytest.raises(gui.ESPHomeAPIError, match="encryption"):
+        gui.fetch_device_info_api("127.0.0.1", port)
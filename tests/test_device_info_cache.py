@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+TTL = 24 * 3600
+T0 = datetime(2024, 6, 1, 12, 0)
+
+LOG_READING = {
+    'firmware_version': "2024.5.0", 'host_name': "kitchen", 'local_mac': "AA:BB:CC:DD:EE:01",
+    'ssid': "home", 'chip': "ESP32", 'flash_size': "4.0 MB", 'frequency': "240 MHz",
+}
+API_READING = {  # The native API reports no Wi-Fi or hardware details
+    'firmware_version': "2024.6.0", 'host_name': "kitchen", 'local_mac': "AA:BB:CC:DD:EE:01",
+    'ssid': "N/A", 'chip': "N/A",
+}
+
+
+def test_merge_keeps_fields_the_new_reading_lacks(gui):
+    first = gui.merge_device_info(None, LOG_READING, T0)
+    later = T0 + timedelta(hours=30)
+    merged = gui.merge_device_info(first, API_READING, later)
+
+    assert merged['device_info']['firmware_version'] == "2024.6.0"
+    assert merged['device_info']['ssid'] == "home"
+    assert merged['device_info']['chip'] == "ESP32"
+    assert merged['device_info']['flash_size'] == "4.0 MB"
+    assert merged['field_updated']['firmware_version'] == later.isoformat()
+    assert merged['field_updated']['ssid'] == T0.isoformat()
+    assert merged['field_updated']['flash_size'] == T0.isoformat()
+    assert merged['last_updated'] == later.isoformat()
+
+
+def test_merge_drops_old_fields_from_a_different_device(gui):
+    first = gui.merge_device_info(None, LOG_READING, T0)
+    replacement = dict(API_READING, local_mac="AA:BB:CC:DD:EE:02")
+    merged = gui.merge_device_info(first, replacement, T0 + timedelta(hours=1))
+
+    assert merged['device_info']['ssid'] == "N/A"
+    assert 'flash_size' not in merged['device_info']
+    assert 'ssid' not in merged['field_updated']
+
+
+def test_merge_stamps_legacy_entries_with_their_last_update(gui):
+    legacy = {'device_info': dict(LOG_READING), 'last_updated': T0.isoformat()}
+    merged = gui.merge_device_info(legacy, API_READING, T0 + timedelta(hours=2))
+    assert merged['field_updated']['ssid'] == T0.isoformat()
+
+
+def test_key_fields_expire_after_the_ttl(gui):
+    entry = gui.merge_device_info(None, LOG_READING, T0)
+    assert gui.device_info_staleness(entry, TTL, now=T0 + timedelta(hours=23)) == ""
+    assert gui.device_info_staleness(entry, TTL, now=T0 + timedelta(hours=25)) == "1d old"
+
+    # A fresh API answer renews the key fields; older Wi-Fi details don't make the entry stale
+    entry = gui.merge_device_info(entry, API_READING, T0 + timedelta(hours=25))
+    assert gui.device_info_staleness(entry, TTL, now=T0 + timedelta(hours=40)) == ""
+
+
+def test_hardware_fields_expire_after_their_longer_ttl(gui):
+    entry = gui.merge_device_info(None, LOG_READING, T0)
+    static_ttl = TTL * gui.DEVICE_INFO_STATIC_TTL_FACTOR
+    for day in range(1, static_ttl // 86400 + 2):
+        entry = gui.merge_device_info(entry, API_READING, T0 + timedelta(days=day))
+        now = T0 + timedelta(days=day, hours=1)
+        expected = gui.DEVICE_INFO_HARDWARE_EXPIRED if (now - T0).total_seconds() > static_ttl else ""
+        assert gui.device_info_staleness(entry, TTL, now=now) == expected, day
+
+    # Reading the logs again renews them
+    entry = gui.merge_device_info(entry, LOG_READING, now)
+    assert gui.device_info_staleness(entry, TTL, now=now) == ""
+
+
+def test_incomplete_or_unstamped_entries_are_stale(gui):
+    entry = gui.merge_device_info(None, dict(LOG_READING, host_name="N/A"), T0)
+    assert gui.device_info_staleness(entry, TTL, now=T0) == "incomplete"
+    assert gui.device_info_staleness({'device_info': dict(LOG_READING)}, TTL, now=T0) == "no timestamp"
+
+
+def test_uploads_after_the_reading_make_it_stale(gui):
+    entry = gui.merge_device_info(None, LOG_READING, T0)
+    now = T0 + timedelta(hours=1)
+    newer = {'version': "2024.6.0", 'timestamp': "2024-06-01 11:00:00"}
+    assert gui.device_info_staleness(entry, TTL, newer, now=now) == "last upload used 2024.6.0"
+    same_version_later = {'version': "2024.5.0", 'timestamp': "2024-06-01 12:30:00"}
+    assert gui.device_info_staleness(entry, TTL, same_version_later, now=now) == "uploaded since last read"
+    same_version_earlier = {'version': "2024.5.0", 'timestamp': "2024-06-01 11:00:00"}
+    assert gui.device_info_staleness(entry, TTL, same_version_earlier, now=now) == ""
@@ -0,0 +1,110 @@
+import os
+import re
+import stat
+import sys
+
+import pytest
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "boot_log.txt")
+
+# The per-line patterns get_device_info_with_progress searched before DeviceLogParser
+LEGACY_PATTERNS = {
+    'firmware_version': r'ESPHome version *?([\d\.]+)',
+    'host_name': r"Hostname:\s*'([^']+)'",
+    'wifi_ssid': r"SSID:\s*'([^']+)'",
+    'local_mac': r"Local MAC:\s*([0-9A-Fa-f:]{17})",
+    'wifi_signal': r"Signal strength:\s*(-?\d+)\s*dB",
+    'chip': r'\[D\]\[debug:\d+\]: Chip:\s*Model=([^,]+)',
+    'frequency': r'\[D\]\[debug:\d+\]: CPU Frequency:\s*(\d+)\s*MHz',
+    'framework': r'\[D\]\[debug:\d+\]: Framework:\s*([^\s,]+)',
+    'psram': r'\[C\]\[psram:\d+\]:\s*Size:\s*(\d+)\s*KB',
+}
+LEGACY_PARTITION = r'\b(\w+)\s+\d+\s+\d+\s+0x[0-9A-Fa-f]+\s+0x([0-9A-Fa-f]+)'
+COMMON_FLASH_SIZES = {4194304: "4.0 MB", 8388608: "8.0 MB", 16777216: "16.0 MB", 33554432: "32.0 MB"}
+
+
+def legacy_parse(lines):
+    """The old every-pattern-every-line loop and its final processing"""
+    values = {}
+    partition_sizes = []
+    for line in lines:
+        line = line.rstrip()
+        match = re.search(LEGACY_PARTITION, line)
+        if match:
+            partition_sizes.append(int(match.group(2), 16))
+        for name, pattern in LEGACY_PATTERNS.items():
+            match = re.search(pattern, line)
+            key = 'psram_size' if name == 'psram' else name
+            if match and key not in values:
+                if name == 'psram':
+                    psram_kb = int(match.group(1))
+                    values[key] = f"{psram_kb / 1024:.1f} MB" if psram_kb >= 1024 else f"{psram_kb} KB"
+                else:
+                    values[key] = match.group(1)
+        if 'Flash Chip:' in line and 'Size=' in line and 'flash_size' not in values:
+            match = re.search(r'Size=(\d+kB)', line)
+            if match:
+                values['flash_size'] = f"{int(match.group(1).replace('kB', '')) / 1024:.1f} MB"
+    if 'flash_size' not in values and partition_sizes:
+        total_bytes = sum(partition_sizes)
+        closest_size = min(COMMON_FLASH_SIZES, key=lambda size: abs(size - total_bytes))
+        if abs(total_bytes - closest_size) / closest_size < 0.55:
+            values['flash_size'] = COMMON_FLASH_SIZES[closest_size]
+        elif total_bytes >= 1024 * 1024:
+            values['flash_size'] = f"{total_bytes / (1024 * 1024):.1f} MB"
+        else:
+            values['flash_size'] = f"{total_bytes / 1024:.0f} KB"
+    fields = ('firmware_version', 'host_name', 'wifi_ssid', 'local_mac', 'wifi_signal',
+              'chip', 'frequency', 'framework', 'psram_size', 'flash_size')
+    return {name: values.get(name, 'N/A') for name in fields}
+
+
+def boot_log_lines():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def parse(gui, lines):
+    parser = gui.DeviceLogParser()
+    for line in lines:
+        parser.feed(line)
+    return parser
+
+
+def test_boot_log_matches_legacy(gui):
+    lines = boot_log_lines()
+    parser = parse(gui, lines)
+    assert parser.result() == legacy_parse(lines)
+    assert parser.has_essentials()
+    assert parser.result()['host_name'] == "kitchen-light"
+    assert parser.result()['flash_size'] == "4.0 MB"
+
+
+def test_flash_size_estimated_from_partitions(gui):
+    lines = [line for line in boot_log_lines() if 'Flash Chip:' not in line]
+    parser = parse(gui, lines)
+    assert parser.result() == legacy_parse(lines)
+    assert parser.result()['flash_size'] == "4.0 MB"
+
+
+def test_partial_log_leaves_fields_unset(gui):
+    lines = boot_log_lines()[:12]
+    parser = parse(gui, lines)
+    assert parser.result() == legacy_parse(lines)
+    assert not parser.has_essentials()
+    assert parser.result()['chip'] == "N/A"
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="fake esphome is a POSIX script")
+def test_log_fallback_reads_the_process_output(gui, tmp_path, monkeypatch):
+    fake = tmp_path / "esphome"
+    fake.write_text(f"#!{sys.executable}\nimport sys\nsys.stdout.write(open({FIXTURE!r}, encoding='utf-8').read())\n",
+                    encoding='utf-8')
+    fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ.get('PATH', '')}")
+    progress = []
+    result = gui.get_device_info_with_progress(str(tmp_path / "kitchen-light.yaml"), "192.168.1.42",
+                                               lambda percent, message: progress.append(percent),
+                                               max_wait=10, use_api=False)
+    assert result == legacy_parse(boot_log_lines())
+    assert progress[-1] == 100
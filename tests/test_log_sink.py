@@ -0,0 +1,149 @@
+import threading
+
+import pytest
+
+
+class FakeRoot:
+    """Collects root.after() callbacks instead of running a Tk event loop"""
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append((ms, callback))
+
+    def run_pending(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for _, callback in callbacks:
+            callback()
+
+
+class FakeText:
+    """The slice of tk.Text that LogSink uses, keeping (text, tag) runs"""
+    def __init__(self):
+        self.runs = []
+        self.insert_calls = 0
+        self.see_calls = 0
+
+    @property
+    def text(self):
+        return "".join(text for text, _ in self.runs)
+
+    def insert(self, index, *chunks):
+        self.insert_calls += 1
+        self.runs += list(zip(chunks[::2], chunks[1::2]))
+
+    def delete(self, start, end=None):
+        if (start, end) == ("end-2l", "end-1l"):
+            # Drop the last line, which is always the tail of the last run here
+            text, tag = self.runs.pop()
+            head = text[:text[:-1].rfind("\n") + 1]
+            if head:
+                self.runs.append((head, tag))
+        else:
+            self.runs = []
+
+    def see(self, index):
+        self.see_calls += 1
+
+    def get(self, start, end):
+        return self.text
+
+
+@pytest.fixture
+def sink(gui):
+    root, widget = FakeRoot(), FakeText()
+    return gui.LogSink(root, widget, interval_ms=25), root, widget
+
+
+def test_lines_are_batched_into_one_insert(sink):
+    log, root, widget = sink
+    log.write("Compiling kitchen.yaml", "info")
+    log.write("INFO Reading configuration", "auto")
+    log.write("INFO Generating C++ source", "auto")
+    log.write("Compile failed", "error")
+
+    assert [ms for ms, _ in root.callbacks] == [25]  # One flush scheduled for the whole burst
+    assert widget.text == ""
+    root.run_pending()
+    assert widget.insert_calls == 1 and widget.see_calls == 1
+    assert widget.runs == [("Compiling kitchen.yaml\n", "info"),
+                           ("INFO Reading configuration\nINFO Generating C++ source\n", "auto"),
+                           ("Compile failed\n", "error")]
+
+    log.write("Done", "info")
+    assert len(root.callbacks) == 1  # The next line schedules the next flush
+    root.run_pending()
+    assert widget.text.endswith("Compile failed\nDone\n")
+
+
+def test_lines_from_many_threads_keep_their_order_per_thread(sink):
+    log, root, widget = sink
+
+    def writer(index):
+        for line in range(200):
+            log.write(f"{index}:{line}", "auto")
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(root.callbacks) == 1
+    root.run_pending()
+
+    lines = widget.text.splitlines()
+    assert len(lines) == 800
+    for index in range(4):
+        assert [line for line in lines if line.startswith(f"{index}:")] == [f"{index}:{n}" for n in range(200)]
+
+
+def test_replace_previous_overwrites_the_flushed_line(sink):
+    log, root, widget = sink
+    log.write("Uploading...", "info")
+    log.write("Uploading: [===       ] 30%", "auto")
+    root.run_pending()
+
+    log.write("Uploading: [======    ] 60%", "auto", replace_previous=True)
+    assert log.contents() == "Uploading...\nUploading: [======    ] 60%\n"
+    root.run_pending()
+    assert widget.text == "Uploading...\nUploading: [======    ] 60%\n"
+
+
+def test_pending_replacements_collapse(sink):
+    log, root, widget = sink
+    log.write("Uploading: 0%", "auto")
+    root.run_pending()
+
+    for percent in (10, 20, 30):
+        log.write(f"Uploading: {percent}%", "auto", replace_previous=True)
+    log.write("OTA successful", "success")
+    assert log.pending == [("Uploading: 30%", "auto", True), ("OTA successful", "success", False)]
+    root.run_pending()
+    assert widget.runs == [("Uploading: 30%\n", "auto"), ("OTA successful\n", "success")]
+
+    # A replacement of a line that never reached the widget doesn't touch what is already shown
+    log.write("Verifying", "info")
+    log.write("Verified", "info", replace_previous=True)
+    root.run_pending()
+    assert widget.text == "Uploading: 30%\nOTA successful\nVerified\n"
+
+
+def test_clear_drops_pending_lines(sink):
+    log, root, widget = sink
+    log.write("old", "auto")
+    root.run_pending()
+    log.write("not flushed yet", "auto")
+    log.clear()
+    root.run_pending()
+    assert widget.text == "" and log.contents() == ""
+
+
+def test_writes_after_tk_is_gone_are_ignored(gui, sink):
+    log, root, widget = sink
+
+    def closed(ms, callback):
+        raise gui.tk.TclError("application has been destroyed")
+
+    root.after = closed
+    log.write("late line", "auto")
+    assert log.contents() == "late line\n"
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+
+from esphome_api_standin import StandinDevice
+
+
+async def ota_device(reader, writer):
+    """Answers an ESPHome OTA handshake with OK + protocol version 2, then hangs up"""
+    await reader.readexactly(5)
+    writer.write(bytes([0x00, 0x02]))
+    await writer.drain()
+    writer.close()
+
+
+async def other_service(reader, writer):
+    """Something else listening on a device port - answers everything with an HTTP error"""
+    await reader.read(64)
+    writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+    await writer.drain()
+    writer.close()
+
+
+@pytest.fixture
+def listeners():
+    """listen(handler, host, port) on a background event loop; skips where loopback aliases can't be bound"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    servers = []
+
+    def listen(handler, host, port):
+        try:
+            server = asyncio.run_coroutine_threadsafe(asyncio.start_server(handler, host, port), loop).result(5)
+        except OSError as e:
+            pytest.skip(f"Cannot listen on {host}:{port}: {e}")
+        servers.append(server)
+
+    async def shutdown():
+        for server in servers:
+            server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    yield listen
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def test_only_hosts_that_answer_like_esphome_are_registered(gui, listeners):
+    device = StandinDevice("kitchen-light", "2024.6.1", "AA:BB:CC:DD:EE:FF", "esp32dev", "Jun 10 2024, 12:00:00")
+    listeners(device.handle, "127.0.0.2", gui.ESPHOME_API_PORT)
+    listeners(other_service, "127.0.0.3", gui.ESPHOME_API_PORT)
+    listeners(ota_device, "127.0.0.4", 3232)
+    listeners(other_service, "127.0.0.5", 8266)
+
+    registry = gui.DeviceRegistry()
+    reported = []
+    found = gui.sweep_subnet("127.0.0.2/31, 127.0.0.4/31", registry, timeout=1.0,
+                             found_callback=lambda host, ports, hello: reported.append(host))
+
+    by_host = {host: (ports, hello) for host, ports, hello in found}
+    assert sorted(by_host) == sorted(reported) == ["127.0.0.2", "127.0.0.3", "127.0.0.4", "127.0.0.5"]
+    assert by_host["127.0.0.2"][1] == {'name': "kitchen-light", 'version': "2024.6.1"}
+    assert by_host["127.0.0.3"] == ([gui.ESPHOME_API_PORT], None)
+    assert by_host["127.0.0.4"][1]['ota_version'] == 2
+    assert by_host["127.0.0.5"] == ([8266], None)
+
+    assert registry.devices() == [("127.0.0.4", "127.0.0.4"), ("kitchen-light", "127.0.0.2")]
+    record = registry.get("kitchen-light")
+    assert record['sources'] == ["sweep"]
+    assert record['txt'] == {'version': "2024.6.1"}
+    assert record['port'] == gui.ESPHOME_API_PORT
+
+
+def test_known_devices_keep_their_name(gui, listeners):
+    listeners(ota_device, "127.0.0.6", 3232)
+    registry = gui.DeviceRegistry()
+    registry.update("garage-door", ["127.0.0.6"], source="mdns")
+
+    gui.sweep_subnet("127.0.0.6", registry, ports=(3232,), timeout=1.0)
+    assert registry.devices() == [("garage-door", "127.0.0.6")]
+    assert registry.get("garage-door")['sources'] == ["mdns", "sweep"]
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+BASE_NS = 1_700_000_000 * 10**9
+
+
+def put(root, rel, text, age_s=0):
+    """Write root/rel with an mtime age_s seconds after BASE_NS (so newer/older is deterministic)"""
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    os.utime(path, ns=(BASE_NS + age_s * 10**9, BASE_NS + age_s * 10**9))
+    return path
+
+
+@pytest.fixture
+def trees(tmp_path):
+    share, local = tmp_path / "share", tmp_path / "local"
+    share.mkdir()
+    local.mkdir()
+    return share, local
+
+
+@pytest.fixture
+def hashed(gui, monkeypatch):
+    """Records every path the checksum service is asked to hash"""
+    calls = []
+    checksum_many = gui.checksum_service.checksum_many
+
+    def recording(paths, *args, **kwargs):
+        paths = list(paths)
+        calls.extend(paths)
+        return checksum_many(paths, *args, **kwargs)
+
+    monkeypatch.setattr(gui.checksum_service, "checksum_many", recording)
+    return calls
+
+
+def statuses(manifest):
+    return {rel: entry['status'] for rel, entry in manifest.rows()}
+
+
+def test_classification(gui, trees):
+    share, local = trees
+    put(share, "same.yaml", "a: 1\n")
+    put(local, "same.yaml", "a: 1\n", age_s=5)
+    put(local, "local_only.yaml", "b: 1\n")
+    put(share, "packages/remote_only.yaml", "c: 1\n")
+    # Both sides differ with no known common version: the newer side decides
+    put(share, "share_newer.yaml", "d: 2\n", age_s=10)
+    put(local, "share_newer.yaml", "d: 1\n")
+    put(share, "local_newer.yaml", "e: 1\n")
+    put(local, "local_newer.yaml", "e: 2\n", age_s=10)
+
+    manifest = gui.SyncManifest(str(share), str(local))
+    summary = manifest.refresh()
+
+    assert statuses(manifest) == {
+        "same.yaml": "in_sync",
+        "local_only.yaml": "local_only",
+        "packages/remote_only.yaml": "missing",
+        "share_newer.yaml": "stale",
+        "local_newer.yaml": "local_modified",
+    }
+    assert summary['total'] == 5
+    assert summary['offline'] is False
+
+
+def test_conflicts_after_a_sync_use_the_synced_baseline(gui, trees):
+    share, local = trees
+    for rel in ("local_edit.yaml", "share_edit.yaml", "both_edit.yaml"):
+        put(share, rel, "base\n")
+        put(local, rel, "base\n")
+    manifest = gui.SyncManifest(str(share), str(local))
+    assert manifest.refresh()['counts']['in_sync'] == 3
+
+    # Edited on one side only: the baseline says which side moved, whatever the mtimes
+    put(local, "local_edit.yaml", "local\n", age_s=-50)
+    put(share, "share_edit.yaml", "share\n", age_s=-50)
+    # Edited on both sides: the share is the source of truth
+    put(share, "both_edit.yaml", "share\n", age_s=-50)
+    put(local, "both_edit.yaml", "local\n", age_s=50)
+    manifest.refresh()
+
+    assert statuses(manifest) == {
+        "local_edit.yaml": "local_modified",
+        "share_edit.yaml": "stale",
+        "both_edit.yaml": "stale",
+    }
+
+
+def test_refresh_only_rehashes_changed_files(gui, trees, hashed, tmp_path):
+    share, local = trees
+    for index in range(20):
+        put(share, f"device_{index}.yaml", f"id: {index}\n")
+        put(local, f"device_{index}.yaml", f"id: {index}\n")
+    manifest_file = tmp_path / "manifest.json"
+    manifest = gui.SyncManifest(str(share), str(local), manifest_file=manifest_file)
+    manifest.refresh()
+    assert len(hashed) == 40
+
+    hashed.clear()
+    assert manifest.refresh()['counts']['in_sync'] == 20
+    assert hashed == []
+
+    put(share, "device_3.yaml", "id: 33\n", age_s=10)
+    put(local, "new.yaml", "id: new\n")
+    manifest.refresh()
+    assert sorted(os.path.basename(path) for path in hashed) == ["device_3.yaml", "device_3.yaml"]
+    assert manifest.status_of("device_3.yaml") == "stale"
+    assert manifest.status_of("new.yaml") == "local_only"
+
+    # A reloaded manifest picks up where the last one left off
+    hashed.clear()
+    reloaded = gui.SyncManifest(str(share), str(local), manifest_file=manifest_file)
+    assert statuses(reloaded) == statuses(manifest)
+    reloaded.refresh()
+    assert hashed == []
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+BASE_NS = 1_700_000_000 * 10**9
+
+
+def put(root, rel, text, age_s=0):
+    """Write root/rel with an mtime age_s seconds after BASE_NS"""
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    os.utime(path, ns=(BASE_NS + age_s * 10**9, BASE_NS + age_s * 10**9))
+    return path
+
+
+def tree(root):
+    return {path.relative_to(root).as_posix(): path.read_text() for path in root.rglob("*") if path.is_file()}
+
+
+@pytest.fixture
+def trees(tmp_path):
+    share, local = tmp_path / "share", tmp_path / "local"
+    put(share, "kitchen.yaml", "name: kitchen v2\n", age_s=10)
+    put(local, "kitchen.yaml", "name: kitchen v1\n")
+    put(share, "garage.yaml", "name: garage\n")
+    put(local, "garage.yaml", "name: garage\n", age_s=10)
+    put(share, "fonts/roboto.ttf", "font\n")
+    put(share, "notes.log", "not synced\n")
+    return share, local
+
+
+def actions(plan):
+    return {op['path']: op['action'] for op in plan.operations}
+
+
+def test_plan_is_a_dry_run(gui, trees, tmp_path):
+    share, local = trees
+    before = tree(local)
+    plan = gui.plan_sync(str(share), str(local), str(tmp_path / "backups"))
+
+    assert actions(plan) == {"kitchen.yaml": "delta", "garage.yaml": "skip", "fonts/roboto.ttf": "copy"}
+    assert [op['path'] for op in plan.ops('backup')] == ["kitchen.yaml"]
+    assert plan.totals()['copy'] == {'count': 1, 'bytes': len("font\n")}
+    assert plan.transfer_bytes() == len("font\n") + len("name: kitchen v2\n")
+    assert set(plan.timings) == {'scan', 'compare'}
+    assert plan.metrics()['dry_run'] is True
+    assert tree(local) == before
+    assert not (tmp_path / "backups").exists()
+
+
+def test_executed_plan_leaves_nothing_to_do(gui, trees, tmp_path):
+    share, local = trees
+    plan = gui.plan_sync(str(share), str(local), str(tmp_path / "backups"))
+    synced = gui.execute_sync_plan(plan, max_workers=4)
+
+    assert sorted(synced) == ["fonts/roboto.ttf", "kitchen.yaml"]
+    assert tree(local) == {"kitchen.yaml": "name: kitchen v2\n", "garage.yaml": "name: garage\n",
+                           "fonts/roboto.ttf": "font\n"}
+    store = gui.get_backup_store(tmp_path / "backups")
+    assert [store.read(v['id']) for v in store.versions("kitchen.yaml")] == [b"name: kitchen v1\n"]
+    assert plan.metrics()['dry_run'] is False
+
+    again = gui.plan_sync(str(share), str(local))
+    assert set(actions(again).values()) == {"skip"}
+
+
+def test_rel_paths_limit_the_plan(gui, trees):
+    share, local = trees
+    plan = gui.plan_sync(str(share), str(local), rel_paths=["fonts/roboto.ttf"])
+    assert actions(plan) == {"fonts/roboto.ttf": "copy"}
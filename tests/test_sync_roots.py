@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from esphome_sync_helper import scan_sync_tree
+
+BASE_NS = 1_700_000_000 * 10**9
+
+
+def put(root, rel, text="x\n", age_s=0):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    os.utime(path, ns=(BASE_NS + age_s * 10**9, BASE_NS + age_s * 10**9))
+    return path
+
+
+@pytest.fixture
+def share(tmp_path):
+    root = tmp_path / "share"
+    for rel in ("kitchen.yaml", "packages/wifi.yaml", "packages/archive/old.yaml",
+                "archive/garage.yaml", "fonts/roboto.ttf", "images/logo.png", "notes.log",
+                ".esphome/build/kitchen.yaml"):
+        put(root, rel)
+    return root
+
+
+def test_exclude_hides_folders_and_their_contents(gui, share):
+    assert sorted(scan_sync_tree(str(share), gui.SYNC_PATTERNS, ("archive",))) == [
+        "fonts/roboto.ttf", "images/logo.png", "kitchen.yaml", "packages/wifi.yaml"]
+    assert sorted(scan_sync_tree(str(share), gui.SYNC_PATTERNS, ("packages/archive", "*.png"))) == [
+        "archive/garage.yaml", "fonts/roboto.ttf", "kitchen.yaml", "packages/wifi.yaml"]
+
+
+def test_include_patterns_replace_the_defaults(gui, share):
+    root = gui.SyncRoot("Packages", str(share), "", include="*.yaml; *.yml", exclude="archive")
+    assert root.include == ("*.yaml", "*.yml")
+    assert sorted(scan_sync_tree(str(share), root.patterns, root.exclude)) == ["kitchen.yaml", "packages/wifi.yaml"]
+    assert gui.SyncRoot("Primary", str(share), "").patterns == gui.SYNC_PATTERNS
+
+
+def test_helper_listings_are_filtered_like_a_scan(gui, share):
+    """A manifest from the sync helper goes through the same include/exclude rules as a local scan"""
+    listing = scan_sync_tree(str(share))
+    for patterns, exclude in ((gui.SYNC_PATTERNS, ()), (("*.yaml",), ("archive",)), (gui.SYNC_PATTERNS, ("fonts", "*.PNG"))):
+        assert gui.filter_sync_listing(listing, patterns, exclude) == scan_sync_tree(str(share), patterns, exclude)
+
+
+def test_filtered_root_plans_and_tracks_only_its_files(gui, share, tmp_path):
+    local = tmp_path / "local"
+    put(local, "archive/garage.yaml", "local\n")
+    root = gui.SyncRoot("Packages", str(share), str(local), include="*.yaml", exclude="archive")
+
+    plan = gui.plan_sync(root.network_path, root.local_path, patterns=root.patterns, exclude=root.exclude)
+    assert sorted(op['path'] for op in plan.operations) == ["kitchen.yaml", "packages/wifi.yaml"]
+
+    manifest = gui.SyncManifest(root.network_path, root.local_path, patterns=root.patterns, exclude=root.exclude)
+    manifest.refresh()
+    assert [rel for rel, _ in manifest.rows()] == ["kitchen.yaml", "packages/wifi.yaml"]
+    assert manifest.status_of("archive/garage.yaml") is None
+
+
+def test_root_key_changes_with_its_filters(gui, share, tmp_path):
+    plain = gui.SyncRoot("A", str(share), str(tmp_path / "local"))
+    filtered = gui.SyncRoot("B", str(share), str(tmp_path / "local"), exclude="archive")
+    assert plain.key == gui.SyncRoot("C", str(share), str(tmp_path / "local")).key
+    assert plain.key != filtered.key